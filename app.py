@@ -8,7 +8,7 @@
 #     add_message, get_conversation, clear_session,
 #     session_manager
 # )
-# from llm.llm_handler import query_groq_with_image_and_text
+# from llm.llm_handler import stream_query_with_image_and_text
 
 # # Helper to convert image to base64
 # def encode_image(img):
@@ -112,7 +112,6 @@
 # --------------------------------------------------------------
 # # Add this near the top
 import streamlit as st
-import base64
 import uuid
 from PIL import Image
 from io import BytesIO
@@ -121,23 +120,50 @@ from ses.session_manager import (
     add_message, get_conversation, clear_session,
     session_manager
 )
-from llm.llm_handler import query_groq_with_image_and_text
+from ses.image_store import image_store
+from llm.llm_handler import stream_query_with_image_and_text
 
-# Helper to convert image to base64
-def encode_image(img):
-    buffered = BytesIO()
-    img.save(buffered, format="JPEG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+# Seconds to wait for the prediction once the reply has finished streaming
+PREDICTION_TIMEOUT = 60
 
-# Helper to decode base64 to Image object
-def decode_image(base64_str):
-    return Image.open(BytesIO(base64.b64decode(base64_str)))
+
+def prediction_or_none(reply, timeout=None):
+    """The reply's prediction metadata, or None if it failed or isn't ready within `timeout` seconds."""
+    try:
+        return reply.metadata.result(timeout=timeout)
+    except Exception as e:
+        print(f"Error getting prediction: {str(e)}")
+        return None
+
+
+def render_prediction(slot, metadata, visible):
+    if not visible:
+        return
+    if metadata is None:
+        # The streamed reply stands on its own; only the prediction is missing
+        slot.info("🩺 Prediction unavailable for this message.")
+        return
+    with slot.container():
+        if metadata.get("predicted_disease"):
+            st.success(f"🩺 Possible Condition: **{metadata['predicted_disease']}**")
+        if metadata.get("image_description"):
+            with st.expander("📷 Image Analysis"):
+                st.write(metadata["image_description"])
+
+
+def chunks_with_prediction(reply, slot, visible, rendered):
+    """Pass reply chunks through to st.write_stream, rendering the prediction once it is ready."""
+    for chunk in reply:
+        if not rendered and reply.metadata.done():
+            render_prediction(slot, prediction_or_none(reply), visible)
+            rendered.append(True)
+        yield chunk
 
 # Initialize session state
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
     st.session_state.image_uploaded = False
-    st.session_state.base64_image = None
+    st.session_state.image_handle = None
 
 st.set_page_config(page_title="Medical Diagnosis Chatbot", layout="centered")
 st.title("🩺 Medical Diagnosis Chatbot")
@@ -151,15 +177,21 @@ with st.sidebar:
     if st.button("🔄 Reset Session"):
         clear_session(st.session_state.session_id)
         st.session_state.image_uploaded = False
-        st.session_state.base64_image = None
+        st.session_state.image_handle = None
         st.session_state.session_id = str(uuid.uuid4())
         st.rerun()
 
-# Show uploaded image if available
-if st.session_state.image_uploaded:
+# The server-side session may have expired (idle TTL / LRU cap) and released its image
+if st.session_state.image_handle and \
+        session_manager.get_context(st.session_state.session_id, "image_handle") != st.session_state.image_handle:
+    st.session_state.image_uploaded = False
+    st.session_state.image_handle = None
+
+# Show uploaded image if available (thumbnail is built once per image, not per rerun)
+if st.session_state.image_uploaded and st.session_state.image_handle in image_store:
     st.markdown("### 🖼️ Uploaded Image")
     st.image(
-        decode_image(st.session_state.base64_image),
+        image_store.display_image(st.session_state.image_handle),
         width=300,
         caption="Uploaded Medical Image"
     )
@@ -173,12 +205,14 @@ if not st.session_state.image_uploaded:
                 if image_file.size > 1_000_000:
                     st.error("❌ Image too large (max 1MB)")
                 else:
-                    org_img = Image.open(image_file)
-                    base64_img = encode_image(org_img)
-                    st.session_state.base64_image = base64_img
+                    image_bytes = image_file.getvalue()
+                    Image.open(BytesIO(image_bytes)).verify()  # reject corrupt uploads
+                    image_handle = image_store.put(image_bytes, image_file.type or "image/jpeg")
+                    st.session_state.image_handle = image_handle
                     st.session_state.image_uploaded = True
-                    session_manager.update_context(st.session_state.session_id, "image_uploaded", True)
-                    session_manager.update_context(st.session_state.session_id, "base64_image", base64_img)
+                    with session_manager.request(st.session_state.session_id):
+                        session_manager.update_context(st.session_state.session_id, "image_uploaded", True)
+                        session_manager.update_context(st.session_state.session_id, "image_handle", image_handle)
                     st.rerun()
             except Exception as e:
                 st.error(f"❌ Error processing image: {str(e)}")
@@ -192,32 +226,35 @@ for msg in conversation:
 # Chat input
 if prompt := st.chat_input("💬 Describe your symptoms or ask a medical question"):
     session_id = st.session_state.session_id
-    
-    add_message(session_id, "user", prompt)
-    with st.chat_message("user"):
-        st.markdown(prompt)
-    
-    base64_img = st.session_state.base64_image or session_manager.get_context(session_id, "base64_image")
-    org_img = decode_image(base64_img) if base64_img else None
 
-    try:
-        with st.spinner("🔍 Analyzing your symptoms..."):
-            response = query_groq_with_image_and_text(org_img, prompt, session_id)
-            
+    # Load the session once and save it once for this message
+    with session_manager.request(session_id):
+        add_message(session_id, "user", prompt)
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        image_handle = st.session_state.image_handle or session_manager.get_context(session_id, "image_handle")
+
+        try:
+            with st.spinner("🔍 Analyzing your symptoms..."):
+                reply = stream_query_with_image_and_text(image_handle, prompt, session_id)
+            show_prediction = len(get_conversation(session_id)) < 3
+
             with st.chat_message("assistant"):
-                if response.get("predicted_disease") and len(get_conversation(session_id)) < 3:
-                    st.success(f"🩺 Possible Condition: **{response['predicted_disease']}**")
-                
-                if response.get("image_description") and len(get_conversation(session_id)) < 3:
-                    with st.expander("📷 Image Analysis"):
-                        st.write(response["image_description"])
-                
-                st.markdown(response["treatment_info"])
-            
-            assistant_response = response["treatment_info"]
+                # The prediction lands above the reply as soon as it is ready,
+                # whether that is before, during or after the streamed text
+                prediction_slot = st.empty()
+                rendered = []
+                assistant_response = st.write_stream(
+                    chunks_with_prediction(reply, prediction_slot, show_prediction, rendered)
+                )
+                if not rendered:
+                    render_prediction(prediction_slot, prediction_or_none(reply, PREDICTION_TIMEOUT),
+                                      show_prediction)
+
             add_message(session_id, "assistant", assistant_response)
-    except Exception as e:
-        error_msg = f"❌ An error occurred: {str(e)}"
-        with st.chat_message("assistant"):
-            st.error(error_msg)
-        add_message(session_id, "assistant", error_msg)
+        except Exception as e:
+            error_msg = f"❌ An error occurred: {str(e)}"
+            with st.chat_message("assistant"):
+                st.error(error_msg)
+            add_message(session_id, "assistant", error_msg)
@@ -0,0 +1,185 @@
+"""
+Run a corpus of symptom descriptions (and optional images) through the diagnosis pipeline.
+
+    python batch_diagnosis.py notes.jsonl -o results.jsonl [--workers 8]
+    python batch_diagnosis.py notes.csv -o results.jsonl --text-field description --image-field photo
+    python batch_diagnosis.py notes.jsonl -o results.jsonl --backend stub --limit 100   # dry run, no API keys
+
+Input is JSONL (one object per line) or CSV with a header, read lazily.
+Each record needs a text field and may have an id (default: its record
+number) and an image path (relative to the input file). Records run
+through llm.llm_handler.diagnose, the same image analysis, symptom
+extraction, prediction and verification stages as the app, on
+`--workers` threads with at most `--max-in-flight` records read ahead.
+Threads rather than processes: the stages wait on the LLM APIs, and the
+per-provider limits in llm/resilience.py hold per process.
+
+One JSON line is appended to the output per record as soon as it
+finishes, so the output is also the checkpoint: running the same command
+again skips ids already in it (a line cut short by a crash is dropped).
+`--retry-errors` runs failed ids again; the last line for an id wins.
+`--restart` starts from an empty output. Nothing is written to the
+feedback log.
+"""
+import argparse
+import csv
+import json
+import mimetypes
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def read_records(path, fmt=None):
+    """Yield input records as dicts, one at a time. `fmt` is "jsonl" or "csv" (default: from the extension)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    stream = sys.stdin if path == "-" else open(path, newline="" if fmt == "csv" else None, encoding="utf-8")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_error": f"line {line_number}: invalid JSON ({e.msg})"}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_checkpoint(output_path, retry_errors=False):
+    """
+    Ids already written to `output_path` (without the failed ones if
+    `retry_errors`). A partial last line left by a crash is cut off.
+    """
+    done = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        lines = f.read().split(b"\n")
+        # Everything after the last newline is a line whose write was cut short
+        if lines[-1]:
+            print(f"Dropping a partial line at the end of {output_path}", file=sys.stderr)
+            f.truncate(f.tell() - len(lines[-1]))
+        for line in lines[:-1]:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            done[str(result.get("id"))] = result.get("error") is None
+    return {record_id for record_id, ok in done.items() if ok or not retry_errors}
+
+
+def diagnose_record(record_id, record, text_field="text", image_field="image", base_dir="."):
+    """One output row: the diagnosis of `record`, or its error."""
+    from llm.llm_handler import diagnose
+    from ses.image_store import image_store
+
+    start = time.perf_counter()
+    result = {"id": record_id}
+    handle = None
+    try:
+        if "_error" in record:
+            raise ValueError(record["_error"])
+        text = (record.get(text_field) or "").strip()
+        if not text:
+            raise ValueError(f"no {text_field!r} field")
+        image_path = (record.get(image_field) or "").strip()
+        if image_path:
+            image_path = os.path.join(base_dir, image_path)
+            with open(image_path, "rb") as f:
+                handle = image_store.put(f.read(), mimetypes.guess_type(image_path)[0] or "image/jpeg")
+        diagnosis = diagnose(text, handle)
+        timings = diagnosis.pop("timings")
+        result.update(diagnosis, critical_path=timings["critical_path"], error=None)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    finally:
+        if handle is not None:
+            image_store.release(handle)
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def run(input_path, output_path, workers=8, max_in_flight=None, fmt=None, id_field="id", text_field="text",
+        image_field="image", limit=None, retry_errors=False, restart=False, progress_every=100):
+    """Diagnose every record not yet in `output_path`. Returns counts of the run."""
+    max_in_flight = max_in_flight or 2 * workers
+    if restart and os.path.exists(output_path):
+        os.remove(output_path)
+    done = load_checkpoint(output_path, retry_errors)
+    base_dir = os.path.dirname(os.path.abspath(input_path)) if input_path != "-" else "."
+    counts = {"skipped": 0, "diagnosed": 0, "errors": 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+
+        def write(futures):
+            for future in futures:
+                result = future.result()
+                out.write(json.dumps(result, default=str) + "\n")
+                out.flush()
+                counts["errors" if result["error"] else "diagnosed"] += 1
+                finished = counts["diagnosed"] + counts["errors"]
+                if progress_every and finished % progress_every == 0:
+                    print(f"[batch] {finished} done, {counts['errors']} errors, "
+                          f"{finished / (time.perf_counter() - start):.1f}/s", file=sys.stderr)
+
+        pending = set()
+        seen = set()
+        for number, record in enumerate(read_records(input_path, fmt), 1):
+            if limit is not None and number > limit:
+                break
+            record_id = record.get(id_field)
+            record_id = str(number if record_id in (None, "") else record_id)
+            if record_id in done or record_id in seen:
+                counts["skipped"] += 1
+                continue
+            seen.add(record_id)
+            # Bounded read-ahead: wait for a slot before reading further
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+            pending.add(pool.submit(diagnose_record, record_id, record, text_field, image_field, base_dir))
+        write(pending)
+
+    counts["wall_s"] = time.perf_counter() - start
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="JSONL or CSV file, or - for JSONL on stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results, appended to and resumed from")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="input format (default: from the extension)")
+    parser.add_argument("--workers", type=int, default=8, help="records diagnosed at once")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="records read ahead (default: 2 x workers)")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--image-field", default="image", help="image path, relative to the input file")
+    parser.add_argument("--limit", type=int, default=None, help="only the first N input records")
+    parser.add_argument("--retry-errors", action="store_true", help="run ids whose last result was an error again")
+    parser.add_argument("--restart", action="store_true", help="discard the existing output first")
+    parser.add_argument("--backend", default=None, help="LLM backend, e.g. stub for a dry run without API keys")
+    parser.add_argument("--progress", type=int, default=100, help="report progress every N records (0: never)")
+    args = parser.parse_args()
+
+    if args.backend:
+        from llm.clients import use_backend
+
+        use_backend(args.backend)
+    counts = run(args.input, args.output, args.workers, args.max_in_flight, args.format, args.id_field,
+                 args.text_field, args.image_field, args.limit, args.retry_errors, args.restart, args.progress)
+    finished = counts["diagnosed"] + counts["errors"]
+    print(f"{finished} records in {counts['wall_s']:.1f}s ({counts['errors']} errors), "
+          f"{counts['skipped']} already in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Doctor search benchmark and parity check.
+
+Run from the repo root:
+    python -m benchmarks.doctor_search
+
+Runs every (disease, city) query over the full doctors_data.csv through the
+DoctorIndex and through a plain DataFrame scan, checks that both return the
+same rows, and reports build time and p50/p99 query latency for each.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from findDoc import DISEASE_SPECIALTIES, DOCTORS_PATH, DoctorIndex, specialties_for
+
+
+def _scan(df, disease, city):
+    mask = (df["City"].str.lower() == city.lower()) & df["Specialty"].isin(specialties_for(disease))
+    return np.flatnonzero(mask.to_numpy())
+
+
+def _percentiles(timings):
+    timings = np.asarray(timings)
+    return {
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+    }
+
+
+def run(path=DOCTORS_PATH):
+    start = time.perf_counter()
+    index = DoctorIndex.from_csv(path)
+    build_s = time.perf_counter() - start
+    df = pd.read_csv(path, dtype=str)
+
+    queries = [(disease, city) for disease in DISEASE_SPECIALTIES for city in index.cities()]
+    scan_times, index_times, frame_times = [], [], []
+    for disease, city in queries:
+        t0 = time.perf_counter()
+        expected = _scan(df, disease, city)
+        t1 = time.perf_counter()
+        rows = index.rows(city, specialties_for(disease))
+        t2 = time.perf_counter()
+        index.frame(rows)
+        t3 = time.perf_counter()
+        if not np.array_equal(rows, expected):
+            raise AssertionError(f"DoctorIndex disagrees with the scan for {disease!r} in {city!r}")
+        scan_times.append(t1 - t0)
+        index_times.append(t2 - t1)
+        frame_times.append(t3 - t1)
+
+    return {
+        "rows": index.n_rows,
+        "queries": len(queries),
+        "build_ms": build_s * 1000,
+        "scan": _percentiles(scan_times),
+        "index_rows": _percentiles(index_times),
+        "index_frame": _percentiles(frame_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", default=DOCTORS_PATH)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.path)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['rows']} doctors, {results['queries']} queries, index built in {results['build_ms']:.1f} ms")
+    for name in ("scan", "index_rows", "index_frame"):
+        r = results[name]
+        print(f"  {name:<12} p50 {r['p50_ms']:7.3f} ms   p99 {r['p99_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Flattened-forest inference benchmark and parity check.
+
+Run from the repo root after training:
+    python -m benchmarks.forest_inference
+
+Checks that FlatForest.predict_proba matches rf_model.predict_proba on the
+test set, then reports p50/p99 single-row latency for both paths.
+"""
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+
+from model.dataset import load_dataset
+from model.fast_forest import export_forest
+from model.model import MODEL_PATH
+
+TEST_PATH = "data/test_data.xlsx"
+
+
+def _latencies(predict_proba, X, n_calls):
+    timings = np.empty(n_calls)
+    for i in range(n_calls):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        predict_proba(row)
+        timings[i] = time.perf_counter() - start
+    return {
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+    }
+
+
+def run(n_calls=500):
+    rf_model = joblib.load(MODEL_PATH)
+    flat = export_forest(rf_model)
+    X, _, _ = load_dataset(TEST_PATH)
+    X = np.asarray(X)
+
+    max_diff = float(np.abs(flat.predict_proba(X) - rf_model.predict_proba(X)).max())
+    if max_diff > 1e-9:
+        raise AssertionError(f"FlatForest diverges from rf_model.predict_proba (max diff {max_diff})")
+
+    return {
+        "rows_checked": int(len(X)),
+        "max_abs_diff": max_diff,
+        "sklearn": _latencies(rf_model.predict_proba, X, n_calls),
+        "flat": _latencies(flat.predict_proba, X, n_calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.calls)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Parity: {results['rows_checked']} rows, max |diff| = {results['max_abs_diff']:.2e}")
+    for name in ("sklearn", "flat"):
+        r = results[name]
+        print(f"  {name:<8} p50 {r['p50_ms']:7.3f} ms   p99 {r['p99_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
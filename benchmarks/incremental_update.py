@@ -0,0 +1,94 @@
+"""
+Incremental update vs full retrain at growing training-set sizes.
+
+Run from the repo root:
+    python -m benchmarks.incremental_update [--sizes 2000 8000 32000] [--new-fraction 0.05]
+
+For each size the training rows are resampled to that many rows, a forest
+is fit on all but the last `--new-fraction` of them, and the remaining rows
+are then folded in two ways: a full retrain on everything, and
+model.incremental.warm_update (new rows plus a replay sample). Reports
+wall time and test accuracy of both.
+"""
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model.dataset import load_dataset
+from model.incremental import replay_sample, warm_update
+
+TRAIN_PATH = "data/train_data.xlsx"
+TEST_PATH = "data/test_data.xlsx"
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(sizes=(2000, 8000, 32000), new_fraction=0.05, n_estimators=200, n_trees=20, n_jobs=-1, seed=0):
+    X, y, _ = load_dataset(TRAIN_PATH)
+    X_test, y_test, _ = load_dataset(TEST_PATH)
+    X, X_test = np.asarray(X), np.asarray(X_test)
+    rng = np.random.default_rng(seed)
+
+    results = []
+    for size in sizes:
+        # Every class in the already-seen part, as in the app's appended feedback
+        rows = np.concatenate([np.unique(y, return_index=True)[1], rng.integers(0, len(y), size)])[:size]
+        n_seen = int(size * (1 - new_fraction))
+        X_all, y_all = X[rows], y[rows]
+
+        base = RandomForestClassifier(n_estimators=n_estimators, n_jobs=n_jobs, random_state=42)
+        base.fit(X_all[:n_seen], y_all[:n_seen])
+
+        full, full_s = _timed(lambda: RandomForestClassifier(
+            n_estimators=n_estimators, n_jobs=n_jobs, random_state=42).fit(X_all, y_all))
+
+        updated = copy.deepcopy(base)
+
+        def update():
+            replay = replay_sample(y_all[:n_seen], updated.classes_, seed=n_seen)
+            return warm_update(updated, X_all[n_seen:], y_all[n_seen:], X_all[replay], y_all[replay],
+                               n_trees=n_trees, replace_oldest=True)
+
+        _, update_s = _timed(update)
+        results.append({
+            "rows": size,
+            "new_rows": size - n_seen,
+            "full_retrain_s": full_s,
+            "update_s": update_s,
+            "speedup": full_s / update_s,
+            "full_accuracy": float((full.predict(X_test) == y_test).mean()),
+            "update_accuracy": float((updated.predict(X_test) == y_test).mean()),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 8000, 32000])
+    parser.add_argument("--new-fraction", type=float, default=0.05)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--new-trees", type=int, default=20)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.new_fraction, args.n_estimators, args.new_trees, args.n_jobs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'rows':>8} {'new':>6} {'retrain':>10} {'update':>10} {'speedup':>8} {'acc full/upd':>14}")
+    for r in results:
+        print(f"{r['rows']:>8} {r['new_rows']:>6} {r['full_retrain_s']:>9.2f}s {r['update_s']:>9.3f}s "
+              f"{r['speedup']:>7.1f}x {r['full_accuracy']:>6.3f}/{r['update_accuracy']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
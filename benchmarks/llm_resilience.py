@@ -0,0 +1,191 @@
+"""
+Retry, rate-limit and circuit-breaker behaviour of the Groq client against a local mock server.
+
+Run from the repo root (needs the groq package):
+    python -m benchmarks.llm_resilience [--calls 200] [--fail-rate 0.3] [--status 429]
+    python -m benchmarks.llm_resilience --outage      # every call fails: the breaker opens
+
+Starts an HTTP server that mimics Groq's chat completions endpoint,
+failing a share of requests with `--status` (and a Retry-After header for
+429s), points the real SDK at it through llm.clients, and fires
+`--calls` symptom-extraction calls from `--concurrency` threads. Reports
+how many succeeded, retries made, calls rejected by the open circuit,
+the highest concurrency the server saw, the request rate it saw and
+call latency.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class MockGroq:
+    """Chat-completions mock that fails a share of requests and tracks load."""
+
+    def __init__(self, fail_rate=0.3, status=429, latency=0.05, retry_after=0.1, seed=0):
+        self.fail_rate = fail_rate
+        self.status = status
+        self.latency = latency
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.first = None
+        self.last = None
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with mock._lock:
+                    mock.requests += 1
+                    mock.in_flight += 1
+                    mock.max_in_flight = max(mock.max_in_flight, mock.in_flight)
+                    now = time.monotonic()
+                    mock.first = mock.first or now
+                    mock.last = now
+                    fail = mock._rng.random() < mock.fail_rate
+                    if fail:
+                        mock.failed += 1
+                try:
+                    time.sleep(mock.latency)
+                    if fail:
+                        self._send(mock.status, {"error": {"message": "mock failure", "type": "mock"}},
+                                   {"retry-after": str(mock.retry_after)} if mock.status == 429 else {})
+                        return
+                    request = json.loads(body or b"{}")
+                    self._send(200, {
+                        "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                        "model": request.get("model", "mock"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": '{"present": ["itching"], "absent": []}'}}],
+                        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+                    })
+                finally:
+                    with mock._lock:
+                        mock.in_flight -= 1
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def run(calls=200, concurrency=16, fail_rate=0.3, status=429, latency=0.05, retry_after=0.1,
+        rate=None, max_concurrency=None, failure_threshold=None, reset_timeout=None):
+    mock = MockGroq(fail_rate, status, latency, retry_after)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), mock.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("GROQ_API_KEY", "mock-key")
+
+    from llm import resilience
+    from llm.clients import get_groq_client, use_backend
+
+    use_backend("live")
+    overrides = {k: v for k, v in {"rate": rate, "burst": rate, "max_concurrency": max_concurrency,
+                                     "failure_threshold": failure_threshold,
+                                     "reset_timeout": reset_timeout}.items() if v is not None}
+    policy = resilience.configure("groq", **overrides)
+    client = get_groq_client()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            client.chat.completions.create(
+                messages=[{"role": "user", "content": "itching and skin rash"}],
+                model="llama3-70b-8192", response_format={"type": "json_object"}, max_tokens=100,
+            )
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, type(e).__name__
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - start
+    server.shutdown()
+
+    errors = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    latencies = np.array([r[0] for r in results]) * 1000
+    server_span = (mock.last - mock.first) if mock.requests > 1 else 0
+    return {
+        "calls": calls,
+        "succeeded": sum(1 for _, error in results if error is None),
+        "errors": errors,
+        "policy": policy.stats(),
+        "server": {
+            "requests": mock.requests,
+            "failed": mock.failed,
+            "max_in_flight": mock.max_in_flight,
+            "requests_per_s": mock.requests / server_span if server_span else None,
+        },
+        "wall_s": wall,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="caller threads")
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="share of requests the server fails")
+    parser.add_argument("--status", type=int, default=429, help="HTTP status of failed requests")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--outage", action="store_true", help="fail every request (503)")
+    parser.add_argument("--rate", type=float, default=None, help="override the groq calls/second limit")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="override the groq concurrency limit")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    fail_rate, status = (1.0, 503) if args.outage else (args.fail_rate, args.status)
+    results = run(args.calls, args.concurrency, fail_rate, status, args.latency_ms / 1000, args.retry_after,
+                  args.rate, args.max_concurrency)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    policy, server = results["policy"], results["server"]
+    print(f"{results['succeeded']}/{results['calls']} calls succeeded in {results['wall_s']:.2f}s, "
+          f"errors {results['errors'] or 'none'}")
+    print(f"  retries {policy['retries']}, rejected by open circuit {policy['rejected']}, "
+          f"throttled {policy['throttled_s']:.2f}s, circuit {'open' if policy['circuit_open'] else 'closed'}")
+    rate = f"{server['requests_per_s']:.1f}/s" if server["requests_per_s"] else "n/a"
+    print(f"  server saw {server['requests']} requests ({server['failed']} failed), "
+          f"max {server['max_in_flight']} in flight, {rate}")
+    latency = results["latency_ms"]
+    print(f"  latency p50 {latency['p50']:.0f} ms  p95 {latency['p95']:.0f} ms  p99 {latency['p99']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Offline throughput benchmark of the full chat pipeline on stub LLM backends.
+
+Run from the repo root after training:
+    python -m benchmarks.pipeline [--sessions 64] [--concurrency 16] [--latency-ms 200] [--jitter-ms 50]
+    python -m benchmarks.pipeline --stream --json --output pipeline.json
+
+Gemini and Groq are replaced by llm.stub_backends (no keys, no network).
+Synthetic sessions, a share of them opening with an image, run
+`--messages` messages each through the handler and SessionManager the way
+app.py does, `--concurrency` sessions at a time. Reports throughput,
+p50/p95/p99 latency (overall and per message kind), errors and peak RSS.
+Replies are not written to the shared LLM cache, and feedback rows go to a
+temporary file. Anything the app prints while the benchmark runs goes to
+stderr, so stdout only carries the report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SYMPTOM_TEXTS = [
+    "I have itching, a skin rash and nodal skin eruptions on my arms",
+    "Since yesterday I have high fever, chills and a headache",
+    "My joints hurt and I feel fatigue and muscle weakness",
+    "I have stomach pain, acidity and vomiting after meals",
+    "Continuous sneezing, runny nose and congestion for three days",
+    "I feel breathlessness and chest pain when climbing stairs",
+]
+FOLLOW_UPS = [
+    "What should I eat?",
+    "Which medicine can I take for this?",
+    "How long will it take to recover?",
+    "Should I see a doctor?",
+]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _image_bytes(index):
+    from PIL import Image
+
+    rng = random.Random(index)
+    img = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+def _send(handler, image_handle, text, session_id, stream):
+    """One message as app.py sends it. Returns (latency_s, first_token_s)."""
+    from ses.session_manager import add_message, session_manager
+
+    start = time.perf_counter()
+    first_token = None
+    with session_manager.request(session_id):
+        add_message(session_id, "user", text)
+        if stream:
+            reply = handler.stream_query_with_image_and_text(image_handle, text, session_id)
+            for _ in reply:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+            reply.metadata.result()
+            answer = reply.text
+        else:
+            answer = handler.query_groq_with_image_and_text(image_handle, text, session_id)["treatment_info"]
+        add_message(session_id, "assistant", answer)
+    return time.perf_counter() - start, first_token
+
+
+def _run_session(handler, index, messages, with_image, stream):
+    from ses.image_store import image_store
+
+    session_id = f"bench-{uuid.uuid4().hex[:8]}"
+    image_handle = image_store.put(_image_bytes(index), "image/jpeg") if with_image else None
+    if image_handle:
+        from ses.session_manager import session_manager
+
+        with session_manager.request(session_id):
+            session_manager.update_context(session_id, "image_handle", image_handle)
+    samples = []
+    for turn in range(messages):
+        if turn == 0:
+            kind = "first_with_image" if with_image else "first_text_only"
+            text = f"{SYMPTOM_TEXTS[index % len(SYMPTOM_TEXTS)]} (patient {index})"
+        else:
+            kind = "follow_up"
+            text = f"{FOLLOW_UPS[turn % len(FOLLOW_UPS)]} (patient {index})"
+        try:
+            latency, first_token = _send(handler, image_handle, text, session_id, stream)
+            samples.append((kind, latency, first_token, None))
+        except Exception as e:
+            samples.append((kind, None, None, type(e).__name__))
+    return samples
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {
+        "count": int(len(values)),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def run(sessions=64, concurrency=16, messages=3, image_fraction=0.5, latency_ms=200, jitter_ms=50,
+        error_rate=0.0, stream=False, seed=0, rate_limit=True):
+    from llm import resilience
+    from llm.clients import use_backend
+    from llm.response_cache import response_cache
+    from model.feedback import feedback_log
+    from model.model import predict_disease
+
+    use_backend("stub", latency=latency_ms / 1000, jitter=jitter_ms / 1000, error_rate=error_rate, seed=seed)
+    for provider in resilience.PROVIDER_LIMITS:
+        # Fresh counters and circuit state; optionally without the calls/second limits
+        resilience.configure(provider, **({} if rate_limit else {"rate": 1e9, "burst": 1e9}))
+    response_cache.db_path = None
+    response_cache.memory.clear()
+    feedback_dir = tempfile.mkdtemp(prefix="ai4health-bench-")
+    feedback_log.path = os.path.join(feedback_dir, "feedback_log.csv")
+
+    from llm import llm_handler as handler
+
+    # Load the model and the symptom extractor before timing
+    predict_disease([0] * len(handler.get_all_symptoms()))
+    handler.get_symptom_extractor()
+    rss_before = _peak_rss_mb()
+
+    rng = random.Random(seed)
+    plan = [(i, rng.random() < image_fraction) for i in range(sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-session") as pool:
+        results = list(pool.map(lambda p: _run_session(handler, p[0], messages, p[1], stream), plan))
+    wall = time.perf_counter() - start
+    feedback_log.flush()
+
+    samples = [s for session in results for s in session]
+    ok = [s for s in samples if s[3] is None]
+    errors = {}
+    for _, _, _, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    by_kind = {}
+    for kind, latency, _, _ in ok:
+        by_kind.setdefault(kind, []).append(latency)
+
+    return {
+        "config": {
+            "sessions": sessions, "concurrency": concurrency, "messages": messages,
+            "image_fraction": image_fraction, "latency_ms": latency_ms, "jitter_ms": jitter_ms,
+            "error_rate": error_rate, "stream": stream, "seed": seed, "rate_limit": rate_limit,
+        },
+        "wall_s": wall,
+        "messages": len(samples),
+        "throughput_msg_s": len(ok) / wall,
+        "errors": errors,
+        "latency": _percentiles([s[1] for s in ok]),
+        "latency_by_kind": {kind: _percentiles(values) for kind, values in sorted(by_kind.items())},
+        "first_token": _percentiles([s[2] for s in ok if s[2] is not None]) if stream else None,
+        "llm_policies": {p: resilience.get_policy(p).stats() for p in resilience.PROVIDER_LIMITS},
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_before_mb": rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--messages", type=int, default=3, help="messages per session")
+    parser.add_argument("--image-fraction", type=float, default=0.5, help="share of sessions opening with an image")
+    parser.add_argument("--latency-ms", type=float, default=200, help="stub LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub LLM calls that fail")
+    parser.add_argument("--stream", action="store_true", help="use the streaming handler")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="lift the per-provider calls/second limits (concurrency limits stay)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Keep the app's own prints out of the report
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args.sessions, args.concurrency, args.messages, args.image_fraction, args.latency_ms,
+                      args.jitter_ms, args.error_rate, args.stream, args.seed, not args.no_rate_limit)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        if not args.output:
+            print(json.dumps(results, indent=2))
+        return
+    print(f"{results['messages']} messages in {results['wall_s']:.2f}s: "
+          f"{results['throughput_msg_s']:.1f} msg/s, errors {results['errors'] or 'none'}")
+    rows = [("all", results["latency"])] + list(results["latency_by_kind"].items())
+    if results["first_token"]:
+        rows.append(("first token", results["first_token"]))
+    for name, r in rows:
+        if r:
+            print(f"  {name:<18} n={r['count']:<5} p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                  f"p99 {r['p99_ms']:8.1f} ms")
+    for provider, stats in results["llm_policies"].items():
+        print(f"  {provider:<6} calls {stats['calls']}, retries {stats['retries']}, failures {stats['failures']}, "
+              f"rejected {stats['rejected']}, throttled {stats['throttled_s']:.1f}s")
+    if results["peak_rss_mb"] is not None:
+        print(f"  peak RSS {results['peak_rss_mb']:.0f} MB (after warm-up {results['rss_before_mb']:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Session backend round-trip check and latency benchmark.
+
+Run from the repo root:
+    python -m benchmarks.session_backends [--redis-url redis://...]
+
+Two SessionManager instances share one backend, standing in for two worker
+processes. Each simulated chat message is handled by alternating workers
+inside one request() scope; afterwards both workers must see the same
+history, context, image and chat-bot turns. Redis is exercised against a
+real server when --redis-url is given, otherwise against fakeredis if it
+is installed.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ses.backends import InProcessBackend, RedisBackend, SqliteBackend
+from ses.image_store import image_store
+from ses.session_manager import SessionManager
+
+
+class EchoBot:
+    """Chat-bot stand-in that keeps (role, text) turns like GeminiChatBot."""
+
+    def __init__(self, history=None):
+        self.history = list(history or [])
+
+    def send_message(self, prompt):
+        reply = f"echo: {prompt}"
+        self.history += [("user", prompt), ("model", reply)]
+        return reply
+
+    def to_state(self):
+        return {"history": self.history}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls([tuple(turn) for turn in state["history"]])
+
+
+def _chat(workers, session_id, n_messages, image):
+    timings = np.empty(n_messages)
+    for i in range(n_messages):
+        manager = workers[i % len(workers)]
+        start = time.perf_counter()
+        with manager.request(session_id):
+            if i == 0:
+                manager.update_context(session_id, "image_handle", image_store.put(image))
+                manager.update_context(session_id, "chat_bot", EchoBot())
+            manager.add_message(session_id, "user", f"message {i}")
+            reply = manager.get_context(session_id, "chat_bot").send_message(f"message {i}")
+            manager.add_message(session_id, "assistant", reply)
+            manager.update_context(session_id, "last_diagnosis", f"diagnosis {i}")
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def _check(workers, session_id, n_messages):
+    a, b = workers
+    conversation = a.get_conversation(session_id)
+    if conversation != b.get_conversation(session_id):
+        raise AssertionError("workers disagree on the conversation")
+    expected = min(2 * n_messages, a.max_history)
+    if len(conversation) != expected:
+        raise AssertionError(f"expected {expected} messages, got {len(conversation)}")
+    if a.get_context(session_id, "last_diagnosis") != f"diagnosis {n_messages - 1}":
+        raise AssertionError("last write was lost")
+    if len(b.get_context(session_id, "chat_bot").history) != 2 * n_messages:
+        raise AssertionError("chat-bot turns were lost")
+    handle = b.get_context(session_id, "image_handle")
+    if handle is None or handle not in image_store:
+        raise AssertionError("image did not follow the session")
+
+
+def run(backend, n_sessions=20, n_messages=6):
+    workers = [SessionManager(backend=backend), SessionManager(backend=backend)]
+    image = os.urandom(64 * 1024)
+    timings = []
+    for s in range(n_sessions):
+        session_id = f"bench-{s}"
+        timings.append(_chat(workers, session_id, n_messages, image))
+        _check(workers, session_id, n_messages)
+    timings = np.concatenate(timings)
+    return {
+        "requests": int(len(timings)),
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "backend": backend.stats(),
+        "worker": {k: v for k, v in workers[0].stats().items() if k != "images"},
+    }
+
+
+def _backends(redis_url):
+    yield "in-process", InProcessBackend()
+    yield "sqlite", SqliteBackend(os.path.join(tempfile.mkdtemp(), "sessions.sqlite3"))
+    if redis_url:
+        yield "redis", RedisBackend(redis_url, prefix="ai4health-bench:")
+        return
+    try:
+        import fakeredis
+    except ImportError:
+        print("Skipping redis: pass --redis-url or install fakeredis")
+        return
+    yield "fakeredis", RedisBackend(client=fakeredis.FakeRedis())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=6)
+    parser.add_argument("--redis-url")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = {name: run(backend, args.sessions, args.messages) for name, backend in _backends(args.redis_url)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, r in results.items():
+        print(f"{name:<11} {r['requests']} requests  p50 {r['p50_ms']:7.3f} ms   p99 {r['p99_ms']:7.3f} ms"
+              f"   pulls {r['worker']['backend_pulls']}  pushes {r['worker']['backend_pushes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark: import cost of the app modules in fresh interpreters.
+
+Run from the repo root:
+    python -m benchmarks.startup                 # current tree
+    python -m benchmarks.startup --ref baseline  # same measurement on another git revision
+
+Each target is imported in a new `python` process `--repeat` times and the
+median wall time is reported, plus the time of the first prediction.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "import model.model": "import model.model",
+    "import llm.llm_handler": "import llm.llm_handler",
+    "first predict_disease": (
+        "from model.model import predict_disease; "
+        "predict_disease([1, 1] + [0] * 130)"
+    ),
+}
+
+_TIMER = """
+import time
+_t = time.perf_counter()
+{code}
+print(time.perf_counter() - _t)
+"""
+
+
+def _measure(code, cwd, repeat):
+    timings = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _TIMER.format(code=code)],
+            cwd=cwd, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1]}
+        timings.append(float(proc.stdout.strip().splitlines()[-1]))
+    return {"median_s": statistics.median(timings), "min_s": min(timings)}
+
+
+def _checkout(ref):
+    """Export `ref` into a temp dir, reusing this tree's untracked model/data artifacts."""
+    tmp = tempfile.mkdtemp(prefix="startup-bench-")
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", tmp], input=archive.stdout, check=True)
+    for rel in ("model/rf_model.pkl", "model/rf_model.json", ".env"):
+        src = os.path.join(ROOT, rel)
+        if os.path.exists(src):
+            shutil.copy2(src, os.path.join(tmp, rel))
+    return tmp
+
+
+def run(ref=None, repeat=5):
+    cwd = _checkout(ref) if ref else ROOT
+    try:
+        return {name: _measure(code, cwd, repeat) for name, code in TARGETS.items()}
+    finally:
+        if ref:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ref", help="git revision to measure instead of the working tree")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.ref, args.repeat)
+    if args.json:
+        print(json.dumps({"ref": args.ref or "working-tree", "results": results}, indent=2))
+        return
+    print(f"Startup cost ({args.ref or 'working tree'}, median of {args.repeat} runs)")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"  {name:<28} failed: {result['error']}")
+        else:
+            print(f"  {name:<28} {result['median_s'] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
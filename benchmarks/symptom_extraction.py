@@ -0,0 +1,90 @@
+"""
+Symptom extraction benchmark: local extractor vs the Groq LLM.
+
+Run from the repo root:
+    python -m benchmarks.symptom_extraction          # local extractor only
+    python -m benchmarks.symptom_extraction --llm    # also call Groq (needs GROQ_API_KEY)
+    python -m benchmarks.symptom_extraction --corpus benchmarks/fixtures/symptom_heldout.jsonl
+
+Reports micro recall/precision against the labelled fixture corpus and
+per-text latency for each extractor. symptom_heldout.jsonl holds phrasings
+the synonym table was not written from, including broad words used in a
+non-symptom sense ("alcohol wipes", "a tearing pain").
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from llm.llm_handler import get_all_symptoms, get_symptom_extractor, get_symptoms_from_llm
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "symptom_corpus.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(extract, corpus):
+    true_positives = predicted = expected = 0
+    timings = []
+    low_confidence = 0
+    for case in corpus:
+        start = time.perf_counter()
+        found = extract(case["text"])
+        timings.append(time.perf_counter() - start)
+        if found is None:
+            low_confidence += 1
+            found = []
+        found, truth = set(found), set(case["present"])
+        true_positives += len(found & truth)
+        predicted += len(found)
+        expected += len(truth)
+    return {
+        "recall": true_positives / expected if expected else 0.0,
+        "precision": true_positives / predicted if predicted else 0.0,
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "failed_or_fallback": low_confidence,
+    }
+
+
+def run(use_llm=False, corpus_path=CORPUS_PATH):
+    corpus = load_corpus(corpus_path)
+    extractor = get_symptom_extractor()
+
+    def local(text):
+        result = extractor.extract(text)
+        return result.present if result.confident or result.present else None
+
+    results = {"cases": len(corpus), "symptoms": len(get_all_symptoms()), "local": evaluate(local, corpus)}
+    if use_llm:
+        results["llm"] = evaluate(get_symptoms_from_llm, corpus)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm", action="store_true", help="also benchmark the Groq extractor")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.llm, args.corpus)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['cases']} texts, {results['symptoms']} symptoms")
+    for name in ("local", "llm"):
+        if name in results:
+            r = results[name]
+            print(f"  {name:<6} recall {r['recall']:.2f}  precision {r['precision']:.2f}  "
+                  f"p50 {r['p50_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms  "
+                  f"no result {r['failed_or_fallback']}")
+
+
+if __name__ == "__main__":
+    main()
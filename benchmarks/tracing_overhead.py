@@ -0,0 +1,73 @@
+"""
+Per-call cost of the tracing layer, disabled and enabled.
+
+Run from the repo root:
+    python -m benchmarks.tracing_overhead [--calls 200000]
+
+Times a trivial function bare, under tracer.traced and tracer.span with
+tracing disabled, and with tracing enabled (in-memory metrics only, and
+with the JSONL sink).
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from llm.tracing import Tracer
+
+
+def _per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def _work():
+    return 1
+
+
+def _cases(tracer):
+    traced = tracer.traced("bench")(_work)
+
+    def with_span():
+        with tracer.span("bench") as span:
+            span.set(cache_hit=True)
+            return _work()
+
+    return traced, with_span
+
+
+def run(calls=200000):
+    results = {"bare_ns": _per_call_ns(_work, calls)}
+    traced, with_span = _cases(Tracer(enabled=False))
+    results["disabled_traced_ns"] = _per_call_ns(traced, calls)
+    results["disabled_span_ns"] = _per_call_ns(with_span, calls)
+
+    traced, with_span = _cases(Tracer(enabled=True))
+    results["enabled_traced_ns"] = _per_call_ns(traced, calls)
+    results["enabled_span_ns"] = _per_call_ns(with_span, calls)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        traced, _ = _cases(Tracer(enabled=True, jsonl_path=os.path.join(tmp, "traces.jsonl")))
+        results["enabled_jsonl_traced_ns"] = _per_call_ns(traced, calls // 10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    results = run(args.calls)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, ns in results.items():
+        print(f"  {name[:-3]:<24} {ns:9.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
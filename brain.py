@@ -1,46 +1,58 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-from PIL import Image
-import mimetypes
-import tkinter as tk
-from tkinter import filedialog
+import contextvars
 
-# Load environment variables
-load_dotenv()
+from llm.clients import get_generative_model
+from llm.context_window import estimate_tokens
+from llm.pipeline import executor
+from llm.response_cache import make_key, response_cache
+from llm.tracing import tracer
 
-# Configure the API key
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+VISION_MODEL = 'gemini-1.5-flash'
 
+def generate_from_image(prompt, image):
+    """Run one vision prompt, cached by (model, prompt, image content)."""
+    with tracer.span("gemini.vision", model=VISION_MODEL) as span:
+        called = []
+
+        def call():
+            called.append(True)
+            return get_generative_model(VISION_MODEL).generate_content([prompt, image]).text
+
+        reply = response_cache.get_or_call(make_key(VISION_MODEL, prompt, image), call)
+        span.set(cache_hit=not called, prompt_tokens=estimate_tokens(prompt) if called else 0,
+                 completion_tokens=estimate_tokens(reply) if called else 0)
+        return reply
+
+# First prompt for symptoms and characteristics
+SYMPTOMS_PROMPT = """Analyze this medical image thoroughly and provide:
+        1. Detailed description of all visible symptoms
+        2. Characteristics (color, texture, pattern, location)
+        
+        Be objective and factual. Focus only on what is visible in the image.(max limit 150 words)"""
+
+# Second prompt for possible conditions
+CONDITIONS_PROMPT = """Based on the visible symptoms in this medical image,
+        suggest 3-5 possible disease that could cause these symptoms. ( disease names only without any deatail or anu other messgae direct there names ) for ex. 1. Acne vulgaris' '2. Rosacea'  '3. Perioral dermatitis' """
+
+def describe_image(image):
+    """Detailed description of the visible symptoms and characteristics."""
+    return generate_from_image(SYMPTOMS_PROMPT, image)
+
+def suggest_conditions(image):
+    """Comma separated list of possible diseases, e.g. '1. Cataract, 2. Uveitis'."""
+    return generate_from_image(CONDITIONS_PROMPT, image).replace("\n", ", ")
+
+@tracer.traced("brain.analyze_medical_image")
 def analyze_medical_image(image_path: str) -> tuple[str, str]:
     """
     Analyze medical image and return two text outputs:
     1. Detailed description of symptoms and characteristics 
     2. Possible disease that could cause these symptoms  ( disease name only in this format for ex.['1. Cataract', '2. Corneal opacity', '3. Uveitis', '4. Glaucoma', '5.  Nuclear sclerosis'])
+    Both prompts run concurrently on the shared pipeline executor.
     """
     try:
-        # Initialize the model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # First prompt for symptoms and characteristics
-        symptoms_prompt = """Analyze this medical image thoroughly and provide:
-        1. Detailed description of all visible symptoms
-        2. Characteristics (color, texture, pattern, location)
-        
-        Be objective and factual. Focus only on what is visible in the image.(max limit 150 words)"""
-        
-        symptoms_response = model.generate_content([symptoms_prompt, image_path])
-        
-        # Second prompt for possible conditions
-        conditions_prompt = """Based on the visible symptoms in this medical image,
-        suggest 3-5 possible disease that could cause these symptoms. ( disease names only without any deatail or anu other messgae direct there names ) for ex. 1. Acne vulgaris' '2. Rosacea'  '3. Perioral dermatitis' """
-        
-        conditions_response = model.generate_content([conditions_prompt, image_path])
-        # Inside analyze_medical_image (end of function):
-        return (symptoms_response.text, conditions_response.text.replace("\n", ", "))
-
-        # return (symptoms_response.text, conditions_response.text)
+        conditions_future = executor.submit(contextvars.copy_context().run, suggest_conditions, image_path)
+        symptoms_response = describe_image(image_path)
+        return (symptoms_response, conditions_future.result())
     
     except Exception as e:
         return (f"Error analyzing image: {str(e)}", "")
-
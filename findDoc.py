@@ -0,0 +1,267 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model.disease_vocab import clean_name
+from model.fuzzy_index import FuzzyIndex, normalize
+
+DOCTORS_PATH = "doctors_data.csv"
+COLUMNS = ["Doctor Name", "Hospital Name", "Specialty", "City"]
+DEFAULT_SPECIALTY = "General Physician"
+# Cities listed as "did you mean" when none reaches fuzzy_index.MIN_SCORE
+SUGGESTION_SCORE = 0.2
+
+# Model classes (normalized, see _normalize) -> specialties to search, best first.
+# There is no ophthalmologist in doctors_data.csv, so eye conditions go to a GP.
+DISEASE_SPECIALTIES = {
+    "vertigo paroymsal positional vertigo": ["ENT Specialist", "Neurologist"],
+    "aids": ["General Physician"],
+    "acne": ["Dermatologist"],
+    "acne vulgaris": ["Dermatologist"],
+    "alcoholic hepatitis": ["Gastroenterologist"],
+    "allergy": ["General Physician", "Dermatologist"],
+    "arthritis": ["Orthopedic"],
+    "bronchial asthma": ["Pulmonologist"],
+    "cataract": ["General Physician"],
+    "cervical spondylosis": ["Orthopedic", "Neurologist"],
+    "chicken pox": ["Dermatologist", "General Physician"],
+    "chronic cholestasis": ["Gastroenterologist"],
+    "common cold": ["General Physician", "ENT Specialist"],
+    "conjunctivitis": ["General Physician"],
+    "dengue": ["General Physician"],
+    "dental caries": ["Dentist"],
+    "diabetes": ["Endocrinologist"],
+    "dimorphic hemmorhoids piles": ["Gastroenterologist"],
+    "drug reaction": ["General Physician", "Dermatologist"],
+    "fungal infection": ["Dermatologist"],
+    "gerd": ["Gastroenterologist"],
+    "gastroenteritis": ["Gastroenterologist"],
+    "heart attack": ["Cardiologist"],
+    "hepatitis a": ["Gastroenterologist"],
+    "hepatitis b": ["Gastroenterologist"],
+    "hepatitis c": ["Gastroenterologist"],
+    "hepatitis d": ["Gastroenterologist"],
+    "hepatitis e": ["Gastroenterologist"],
+    "herpes zoster ophthalmicus": ["Dermatologist", "General Physician"],
+    "hypertension": ["Cardiologist"],
+    "hyperthyroidism": ["Endocrinologist"],
+    "hypoglycemia": ["Endocrinologist"],
+    "hypothyroidism": ["Endocrinologist"],
+    "impetigo": ["Dermatologist"],
+    "jaundice": ["Gastroenterologist"],
+    "malaria": ["General Physician"],
+    "migraine": ["Neurologist"],
+    "osteoarthristis": ["Orthopedic"],
+    "paralysis brain hemorrhage": ["Neurologist"],
+    "peptic ulcer diseae": ["Gastroenterologist"],
+    "pneumonia": ["Pulmonologist"],
+    "psoriasis": ["Dermatologist"],
+    "tuberculosis": ["Pulmonologist"],
+    "typhoid": ["General Physician"],
+    "urinary tract infection": ["General Physician"],
+    "varicose veins": ["Cardiologist"],
+}
+
+# Old, local and common alternative names -> city as listed in doctors_data.csv
+CITY_ALIASES = {
+    "dilli": "Delhi",
+    "new delhi": "Delhi",
+    "bengaluru": "Bangalore",
+    "bombay": "Mumbai",
+    "calcutta": "Kolkata",
+    "madras": "Chennai",
+    "poona": "Pune",
+    "baroda": "Vadodara",
+    "mysuru": "Mysore",
+    "bezawada": "Vijayawada",
+    "gautam buddh nagar": "Noida",
+}
+
+SPECIALTY_ALIASES = {
+    "ent": "ENT Specialist",
+    "gp": "General Physician",
+    "physician": "General Physician",
+    "skin specialist": "Dermatologist",
+    "heart specialist": "Cardiologist",
+    "child specialist": "Pediatrician",
+    "orthopaedic": "Orthopedic",
+    "dental": "Dentist",
+}
+
+# Fallback for free-text diseases outside the model's classes: first keyword hit wins
+KEYWORD_SPECIALTIES = [
+    (("heart", "cardiac", "blood pressure", "artery"), "Cardiologist"),
+    (("skin", "rash", "eczema", "dermat"), "Dermatologist"),
+    (("lung", "asthma", "cough", "bronch", "respiratory"), "Pulmonologist"),
+    (("stomach", "liver", "hepat", "bowel", "gastr", "ulcer"), "Gastroenterologist"),
+    (("thyroid", "diabet", "hormone", "sugar"), "Endocrinologist"),
+    (("bone", "joint", "fracture", "spine", "arthr"), "Orthopedic"),
+    (("tooth", "teeth", "dental", "gum"), "Dentist"),
+    (("ear", "nose", "throat", "sinus", "tonsil"), "ENT Specialist"),
+    (("brain", "nerve", "headache", "seizure", "stroke", "neuro"), "Neurologist"),
+    (("cancer", "tumor", "tumour", "carcinoma", "lymphoma"), "Oncologist"),
+    (("depress", "anxiety", "mental", "psych", "insomnia"), "Psychiatrist"),
+    (("child", "infant", "baby"), "Pediatrician"),
+]
+
+def _normalize(text):
+    return normalize(clean_name(text))
+
+
+def _model_label(disease):
+    """Closest model disease label to a (possibly misspelled) disease name, or None."""
+    try:
+        from model.model import get_disease_index
+
+        return get_disease_index().best(disease)
+    except Exception as e:
+        print(f"Error matching disease label: {str(e)}")
+        return None
+
+
+def specialties_for(disease, specialty_index=None):
+    """
+    Specialties to search for a disease name: a model class (typos allowed),
+    a specialty typed directly, or free text matched by keyword.
+    """
+    disease = _normalize(disease)
+    specialties = DISEASE_SPECIALTIES.get(disease)
+    if specialties:
+        return specialties
+    label = _model_label(disease)
+    if label is not None and _normalize(label) in DISEASE_SPECIALTIES:
+        return DISEASE_SPECIALTIES[_normalize(label)]
+    if specialty_index is not None:
+        specialty = specialty_index.best(disease)
+        if specialty is not None:
+            return [specialty]
+    for keywords, specialty in KEYWORD_SPECIALTIES:
+        if any(keyword in disease for keyword in keywords):
+            return [specialty]
+    return [DEFAULT_SPECIALTY]
+
+
+class DoctorIndex:
+    """
+    doctors_data.csv held as dictionary-encoded columns (a small vocabulary
+    per column plus one integer code per row), with inverted indexes from
+    city, specialty and (city, specialty) to sorted row ids. A search
+    touches only the rows it returns.
+    """
+
+    def __init__(self, vocab, codes):
+        self.vocab = vocab    # column -> np.ndarray of distinct values
+        self.codes = codes    # column -> np.ndarray of codes, one per row
+        self.n_rows = len(codes[COLUMNS[0]])
+        self._lookup = {
+            column: {_normalize(value): code for code, value in enumerate(values)}
+            for column, values in vocab.items()
+        }
+        self.city_index = FuzzyIndex(vocab["City"], CITY_ALIASES)
+        self.specialty_index = FuzzyIndex(vocab["Specialty"], SPECIALTY_ALIASES)
+        self.city_rows = self._group(self.codes["City"])
+        n_specialties = len(vocab["Specialty"])
+        pair_codes = self.codes["City"].astype(np.int32) * n_specialties + self.codes["Specialty"]
+        self.pair_rows = self._group(pair_codes)
+        self.specialty_rows = self._group(self.codes["Specialty"])
+
+    @staticmethod
+    def _group(keys):
+        """{key: sorted row ids} in one argsort."""
+        order = np.argsort(keys, kind="stable").astype(np.int32)
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        return {int(sorted_keys[s]): order[s:e] for s, e in zip(starts, ends)}
+
+    @classmethod
+    def from_csv(cls, path=DOCTORS_PATH):
+        df = pd.read_csv(path, usecols=COLUMNS, dtype=str).fillna("")
+        vocab, codes = {}, {}
+        for column in COLUMNS:
+            column_codes, values = pd.factorize(df[column].str.strip(), sort=True)
+            dtype = np.uint8 if len(values) <= 0xFF else np.uint16 if len(values) <= 0xFFFF else np.uint32
+            vocab[column] = np.asarray(values, dtype=object)
+            codes[column] = column_codes.astype(dtype)
+        return cls(vocab, codes)
+
+    def code(self, column, value):
+        return self._lookup[column].get(_normalize(value))
+
+    def match_city(self, city):
+        """City as listed in the data for a possibly misspelled or aliased name, or None."""
+        return self.city_index.best(city)
+
+    def rows(self, city=None, specialties=None):
+        """Sorted row ids in `city` (None: any city), optionally restricted to `specialties`."""
+        empty = np.empty(0, dtype=np.int32)
+        city_code = None if city is None else self.code("City", city)
+        if city is not None and city_code is None:
+            return empty
+        if specialties is None:
+            return empty if city is None else self.city_rows.get(city_code, empty)
+        n_specialties = len(self.vocab["Specialty"])
+        parts = []
+        for specialty in specialties:
+            specialty_code = self.code("Specialty", specialty)
+            if specialty_code is None:
+                continue
+            if city_code is None:
+                parts.append(self.specialty_rows.get(specialty_code))
+            else:
+                parts.append(self.pair_rows.get(city_code * n_specialties + specialty_code))
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return empty
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def frame(self, rows):
+        """The given rows as a DataFrame with the CSV's columns."""
+        return pd.DataFrame(
+            {column: self.vocab[column][self.codes[column][rows]] for column in COLUMNS}
+        ).reset_index(drop=True)
+
+    def cities(self):
+        return list(self.vocab["City"])
+
+    def specialties(self):
+        return list(self.vocab["Specialty"])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_doctor_index():
+    """Process-wide DoctorIndex, built from doctors_data.csv on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DoctorIndex.from_csv(DOCTORS_PATH)
+    return _index
+
+
+def find_doctors(disease, city):
+    """
+    Doctors in `city` whose specialty treats `disease`, as a DataFrame, or
+    an error message string when there is nothing to show.
+    """
+    try:
+        index = get_doctor_index()
+    except Exception as e:
+        return f"Could not load doctor data: {str(e)}"
+
+    matched_city = index.match_city(city)
+    if matched_city is None:
+        suggestions = [name for name, _ in index.city_index.search(city, limit=3, min_score=SUGGESTION_SCORE)]
+        if suggestions:
+            return f"No doctors listed in '{city}'. Did you mean: {', '.join(suggestions)}?"
+        return f"No doctors listed in '{city}'. Available cities: {', '.join(index.cities())}"
+
+    specialties = specialties_for(disease, index.specialty_index)
+    rows = index.rows(matched_city, specialties)
+    if len(rows) == 0:
+        return f"No {' / '.join(specialties)} found in {matched_city}."
+    return index.frame(rows)
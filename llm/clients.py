@@ -0,0 +1,138 @@
+import importlib
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from llm.resilience import get_policy
+
+load_dotenv()
+
+_lock = threading.Lock()
+_genai = None
+_groq_client = None
+_generative_models = {}
+
+
+def _live_genai():
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+    return genai
+
+
+def _live_groq():
+    import httpx
+    from groq import Groq
+
+    # One pooled HTTP client for every Groq call; retries are done by ProviderPolicy.
+    # GROQ_BASE_URL (read by the SDK) can point it at a local mock server.
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=60),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    )
+    return Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0, http_client=http_client)
+
+
+# Backend name -> (genai factory, Groq client factory). A genai object only
+# needs GenerativeModel(model_name).generate_content(contents, stream=False);
+# a Groq client only chat.completions.create(...).
+_backends = {"live": (_live_genai, _live_groq)}
+# Backends that register themselves when their module is imported
+_builtin_modules = {"stub": "llm.stub_backends"}
+_backend = os.getenv("LLM_BACKEND", "live").lower()
+_options = {}
+
+
+def register_backend(name, genai_factory, groq_factory):
+    """Make a backend available to use_backend; factories are called with the use_backend options."""
+    _backends[name] = (genai_factory, groq_factory)
+
+
+def use_backend(name, **options):
+    """
+    Switch every client to backend `name` ("live", "stub", or a registered
+    one), e.g. use_backend("stub", latency=0.2, jitter=0.05). Clients are
+    created again on next use; chat bots created before keep their model.
+    """
+    global _backend, _options, _genai, _groq_client
+    _factories(name)
+    with _lock:
+        _backend, _options = name, options
+        _genai = None
+        _groq_client = None
+        _generative_models.clear()
+
+
+def _factories(name):
+    if name not in _backends and name in _builtin_modules:
+        importlib.import_module(_builtin_modules[name])
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend {name!r}; available: {', '.join(sorted(_backends))}")
+
+
+class _GuardedModel:
+    """A GenerativeModel whose calls go through the "gemini" ProviderPolicy."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        # For streams the policy covers the request; chunks are read by the caller
+        return get_policy("gemini").call(lambda: self._model.generate_content(contents, stream=stream, **kwargs))
+
+
+class _GuardedCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **kwargs):
+        return get_policy("groq").call(lambda: self._completions.create(**kwargs))
+
+
+class _GuardedChat:
+    def __init__(self, chat):
+        self.completions = _GuardedCompletions(chat.completions)
+
+
+class _GuardedGroq:
+    """A Groq client whose chat.completions.create calls go through the "groq" ProviderPolicy."""
+
+    def __init__(self, client):
+        self.client = client
+        self.chat = _GuardedChat(client.chat)
+
+
+def get_genai():
+    """Import and configure google.generativeai (or the selected backend) on first use."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                _genai = _factories(_backend)[0](**_options)
+    return _genai
+
+
+def get_groq_client():
+    """Return the process-wide (guarded) Groq client, creating it on first use."""
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                _groq_client = _GuardedGroq(_factories(_backend)[1](**_options))
+    return _groq_client
+
+
+def get_generative_model(model_name):
+    """
+    Shared GenerativeModel per model name (stateless, safe to reuse across
+    requests), with calls limited, retried and circuit-broken per provider.
+    """
+    model = _generative_models.get(model_name)
+    if model is None:
+        model = _GuardedModel(get_genai().GenerativeModel(model_name))
+        with _lock:
+            model = _generative_models.setdefault(model_name, model)
+    return model
@@ -0,0 +1,122 @@
+import re
+from collections import deque
+
+CHARS_PER_TOKEN = 4  # rough average for English text with Gemini/Llama tokenizers
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_MARKDOWN = re.compile(r"[*_#`>]+")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _first_sentence(text, max_chars):
+    text = " ".join(_MARKDOWN.sub("", text).split())
+    sentence = _SENTENCE_END.split(text, 1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rsplit(" ", 1)[0] + "…"
+    return sentence
+
+
+class ContextWindow:
+    """
+    What the chat model sees on each turn, capped at `max_prompt_tokens`.
+
+    The first exchange (the initial consultation and diagnosis) is pinned.
+    The most recent exchanges are sent verbatim; older ones are folded, one
+    at a time as they fall out of the budget, into a rolling summary of one
+    short line per exchange. The summary itself keeps only the newest lines
+    that fit in `max_summary_tokens`.
+    """
+
+    def __init__(self, max_prompt_tokens=3000, max_summary_tokens=400, max_pinned_tokens=1000,
+                 summary_line_chars=160):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.max_pinned_tokens = max_pinned_tokens
+        self.summary_line_chars = summary_line_chars
+        self.pinned = []          # [(role, text)] of the first exchange
+        self.summary = deque()    # one line per folded exchange, oldest first
+        self.recent = deque()     # [(user_text, model_text, note)] exchanges, oldest first
+        self.turns = 0
+        self.full_tokens = 0      # what the untrimmed history would cost
+        self.metrics = deque(maxlen=100)
+
+    def add_exchange(self, user_text, model_text, note=None):
+        """Record one turn. `note` is what the summary should quote for the user side (default: user_text)."""
+        self.turns += 1
+        self.full_tokens += estimate_tokens(user_text) + estimate_tokens(model_text)
+        if not self.pinned:
+            limit = self.max_pinned_tokens * CHARS_PER_TOKEN
+            self.pinned = [("user", user_text[:limit]), ("model", model_text[:limit])]
+        else:
+            self.recent.append((user_text, model_text, note or user_text))
+
+    def _fold_oldest(self):
+        _, model_text, note = self.recent.popleft()
+        half = self.summary_line_chars // 2
+        self.summary.append(f"- Patient: {_first_sentence(note, half)} / "
+                            f"Doctor: {_first_sentence(model_text, half)}")
+        while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > self.max_summary_tokens:
+            self.summary.popleft()
+
+    def _tokens(self, prompt):
+        texts = [text for _, text in self.pinned] + [text for turn in self.recent for text in turn[:2]]
+        return sum(map(estimate_tokens, texts)) + estimate_tokens("\n".join(self.summary)) + estimate_tokens(prompt)
+
+    def build(self, prompt):
+        """`contents` for generate_content: pinned turns, recent turns, then the new prompt."""
+        while self.recent and self._tokens(prompt) > self.max_prompt_tokens:
+            self._fold_oldest()
+
+        full_tokens = self.full_tokens + estimate_tokens(prompt)
+        contents = [{"role": role, "parts": [text]} for role, text in self.pinned]
+        for user_text, model_text, _ in self.recent:
+            contents.append({"role": "user", "parts": [user_text]})
+            contents.append({"role": "model", "parts": [model_text]})
+        if self.summary:
+            prompt = "Summary of the earlier conversation:\n" + "\n".join(self.summary) + "\n\n" + prompt
+        contents.append({"role": "user", "parts": [prompt]})
+
+        prompt_tokens = sum(estimate_tokens(c["parts"][0]) for c in contents)
+        self.metrics.append({
+            "turn": self.turns + 1,
+            "prompt_tokens": prompt_tokens,
+            "full_history_tokens": full_tokens,
+            "saved_tokens": max(0, full_tokens - prompt_tokens),
+            "recent_exchanges": len(self.recent),
+            "summary_lines": len(self.summary),
+        })
+        return contents
+
+    def turn_texts(self):
+        """(role, text) pairs currently kept verbatim."""
+        turns = list(self.pinned)
+        for user_text, model_text, _ in self.recent:
+            turns += [("user", user_text), ("model", model_text)]
+        return turns
+
+    def approx_bytes(self):
+        return sum(len(text) for _, text in self.turn_texts()) + sum(map(len, self.summary))
+
+    def shrink_to(self, max_bytes):
+        """Fold old exchanges into the summary until the window holds at most `max_bytes`."""
+        while self.recent and self.approx_bytes() > max_bytes:
+            self._fold_oldest()
+
+    def to_state(self):
+        return {
+            "pinned": self.pinned,
+            "summary": list(self.summary),
+            "recent": list(self.recent),
+            "turns": self.turns,
+            "full_tokens": self.full_tokens,
+        }
+
+    def load_state(self, state):
+        self.pinned = [tuple(turn) for turn in state["pinned"]]
+        self.summary = deque(state["summary"])
+        self.recent = deque(tuple(turn) for turn in state["recent"])
+        self.turns = state["turns"]
+        self.full_tokens = state["full_tokens"]
@@ -1,71 +1,146 @@
-import os
+import contextvars
 import json
-import base64
-import difflib
-import requests
-from openpyxl import load_workbook
-import google.generativeai as genai
-from model.model import predict_disease
-from dotenv import load_dotenv
+import time
+from model.model import get_disease_vocabulary, predict_disease_top_k, predictor
+from model.disease_vocab import clean_name, parse_disease_list
+from model.fuzzy_index import MIN_SCORE
+from model.feedback import record_feedback
+from model.prediction_cache import LRUCache
+from llm.clients import get_generative_model, get_groq_client
+from llm.response_cache import make_key, response_cache
+from llm.symptom_extractor import SymptomExtractor
+from llm.context_window import ContextWindow, estimate_tokens
 from ses.session_manager import session_manager
-from brain import analyze_medical_image
-from groq import Groq
+from ses.image_store import image_store
+from llm.pipeline import PipelineTimer, StageTimeout, coordinator
+from llm.resilience import get_policy
+from llm.tracing import NOOP_SPAN, tracer
+from brain import describe_image, suggest_conditions
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash")
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 MODEL_TEXT = "llama3-70b-8192"
 
+# Model candidates weighed against the image's conditions: the top
+# PREDICTION_TOP_K labels down to MIN_CANDIDATE_PROBABILITY, fused with
+# the image's ranking by 1 / (RANK_FUSION_K + rank) per ranking
+PREDICTION_TOP_K = 5
+MIN_CANDIDATE_PROBABILITY = 0.001
+RANK_FUSION_K = 2
+
+# (model candidates, disease_list, cutoff) -> verified result
+verification_cache = LRUCache(maxsize=4096, ttl=3600)
+_symptom_extractor = None
+
+# Cache counters, read when metrics are scraped
+tracer.add_collector("llm_cache", response_cache.stats)
+tracer.add_collector("prediction_cache", lambda: predictor.cache.stats())
+tracer.add_collector("verification_cache", verification_cache.stats)
+tracer.add_collector("llm_gemini", lambda: get_policy("gemini").stats())
+tracer.add_collector("llm_groq", lambda: get_policy("groq").stats())
+
 class GeminiChatBot:
-    def __init__(self, model_name="gemini-1.5-flash"):
-        self.model = genai.GenerativeModel(model_name=model_name)
-        self.chat = self.model.start_chat(history=[])
+    """
+    Multi-turn Gemini chat whose history is managed locally: each turn is a
+    single generate_content call on the bounded ContextWindow (pinned first
+    exchange, rolling summary, recent turns) instead of start_chat's
+    ever-growing history.
+    """
+
+    def __init__(self, model_name="gemini-1.5-flash", max_prompt_tokens=3000):
+        self.model_name = model_name
+        self.model = get_generative_model(model_name)
+        self.context = ContextWindow(max_prompt_tokens=max_prompt_tokens)
+
+    def send_message(self, prompt: str, user_text: str = None) -> str:
+        """Reply to `prompt`; `user_text` (the patient's own words) is what the rolling summary keeps."""
+        with tracer.span("gemini.send_message", model=self.model_name) as span:
+            contents = self.context.build(prompt)
+            # Same reply for the same prompt on the same context: reruns and
+            # double submits are served from the cache or share one call
+            key = make_key(self.model_name, prompt, context=json.dumps(contents))
+            called = []
 
-    def send_message(self, prompt: str) -> str:
-        response = self.chat.send_message(prompt)
-        return response.text
+            def call():
+                called.append(True)
+                return self.model.generate_content(contents).text
+
+            reply = response_cache.get_or_call(key, call)
+            self.context.add_exchange(prompt, reply, note=user_text)
+            self._trace_tokens(span, reply, cache_hit=not called)
+            return reply
+
+    def _trace_tokens(self, span, reply, cache_hit):
+        if span is NOOP_SPAN:
+            return
+        metrics = self.prompt_metrics() or {}
+        span.set(cache_hit=cache_hit, prompt_tokens=0 if cache_hit else metrics.get("prompt_tokens", 0),
+                 completion_tokens=0 if cache_hit else estimate_tokens(reply))
+
+    def stream_message(self, prompt: str, user_text: str = None, span=NOOP_SPAN):
+        """
+        Like send_message, but yields the reply in chunks as Gemini produces
+        them. Token counts and cache use are recorded on `span`.
+        """
+        contents = self.context.build(prompt)
+        key = make_key(self.model_name, prompt, context=json.dumps(contents))
+        reply = response_cache.get(key)
+        cached = reply is not None
+        if not cached:
+            parts = []
+            for chunk in self.model.generate_content(contents, stream=True):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+            reply = "".join(parts)
+            response_cache.put(key, reply)
+        else:
+            yield reply
+        # Only a fully delivered reply becomes part of the conversation
+        self.context.add_exchange(prompt, reply, note=user_text)
+        self._trace_tokens(span, reply, cache_hit=cached)
 
     def get_history(self):
-        return self.chat.history
+        return self.context.turn_texts()
 
-    def reset_chat(self):
-        self.chat = self.model.start_chat(history=[])
+    def prompt_metrics(self):
+        """Token counts of the latest prompt vs. sending the whole history."""
+        return self.context.metrics[-1] if self.context.metrics else None
+
+    def to_state(self):
+        """Plain-data form for session backends."""
+        return {"model_name": self.model_name, "context": self.context.to_state()}
 
-def clean_disease_name(disease):
-    if ". " in disease:
-        return disease.split(". ", 1)[1]
-    return disease
+    @classmethod
+    def from_state(cls, state):
+        bot = cls(state["model_name"])
+        bot.context.load_state(state["context"])
+        return bot
 
+    def approx_bytes(self):
+        """Text held in the chat context (used by the session byte budget)."""
+        return self.context.approx_bytes()
 
-def query_groq_with_image_and_text(base64_image, user_text="Hii Doctor", session_id=None):
+    def trim_history(self, max_bytes):
+        """Fold the oldest turns into the summary until the context fits `max_bytes`."""
+        self.context.shrink_to(max_bytes)
+
+    def reset_chat(self):
+        self.context = ContextWindow(max_prompt_tokens=self.context.max_prompt_tokens)
+
+def feedback_label(disease):
+    """Training label for a diagnosis: the model label it resolves to, else its cleaned name."""
+    name = clean_name(disease)
     try:
-        # Initialize chat bot if not exists
-        if not session_manager.get_context(session_id, 'chat_bot'):
-            session_manager.update_context(session_id, 'chat_bot', GeminiChatBot())
-
-        chat_bot = session_manager.get_context(session_id, 'chat_bot')
-        image_description = session_manager.get_context(session_id, 'image_description')
-        list_of_disease = session_manager.get_context(session_id, 'image_disease_list')
-
-        # First-time image analysis
-        if not image_description and base64_image:
-            image_description, raw_disease_list = analyze_medical_image(base64_image)
-            list_of_disease = [d.strip() for d in raw_disease_list.split(",") if d.strip()]
-            # print(f"{list_of_disease}\n")
-            session_manager.update_context(session_id, 'image_description', image_description)
-            session_manager.update_context(session_id, 'image_disease_list', list_of_disease)
-
-        # Get conversation history for context
-        conversation_history = session_manager.get_conversation(session_id)
-        is_first_message = len(conversation_history) < 2
-        
-        # Prepare prompt based on context
-        if is_first_message:
-            # For initial message, provide full analysis
-            if image_description:
-                prompt = f"""Medical Consultation:
+        return get_disease_vocabulary().canonical(disease) or name
+    except Exception as e:
+        print(f"Error resolving disease label: {str(e)}")
+        return name
+
+
+def build_prompt(user_text, image_description, is_first_message, last_diagnosis):
+    if is_first_message:
+        # For initial message, provide full analysis
+        if image_description:
+            return f"""Medical Consultation:
 Patient presents with eye condition. Image analysis shows: {image_description}
 
 Patient's initial query: {user_text}
@@ -73,72 +148,379 @@ Patient's initial query: {user_text}
 Please provide:
 1. Possible conditions (be concise)
 2. Key questions to help diagnose ( around 2-4)"""
-            else:
-                prompt = f"""Medical Consultation:
+        return f"""Medical Consultation:
 Patient's initial query: {user_text}
 
 Please provide:
 1. Possible conditions based on description
 2. Key questions to help diagnose"""
-        else:
-            # For follow-ups, be concise and focused on the question
-            prompt = f"""Follow-up Question Context:
-Previous diagnosis consideration: {session_manager.get_context(session_id, 'last_diagnosis')}
+    # For follow-ups, be concise and focused on the question
+    return f"""Follow-up Question Context:
+Previous diagnosis consideration: {last_diagnosis}
 Current patient question: {user_text}
 
 Please provide a concise, direct answer to the patient's specific question without repeating previous information.
 Assume youeself a qualified to give medical advice for disease , medicine , diet and etc."""
 
-        # Get response from chat bot
-        treatment_info = chat_bot.send_message(prompt)
-
-        # Only predict disease on first message
-        if is_first_message:
-            combined_text = f"VISUAL SYMPTOMS: {image_description}\nPATIENT DESCRIPTION: {user_text}" if image_description else user_text
-            symptom_array = get_symptom_array_from_text(combined_text)
-            predicted = predict_disease(symptom_array)
-            print(symptom_array)
-            # print(f"{predicted}\n")
-            final_disease = verify_predicted_disease(predicted, list_of_disease or [])
-            # print(f"{final_disease}\n")
-            if isinstance(final_disease, list):
-                symptom_array_to_add = symptom_array + [clean_disease_name(final_disease[0])]
-            else:
-                symptom_array_to_add = symptom_array + [clean_disease_name(final_disease)]
-            workbook = load_workbook("data/train_data.xlsx")
-            sheet = workbook.active
-            sheet.append(symptom_array_to_add)
-            workbook.save("data/train_data.xlsx")
-
-            # print(list_of_disease)
-            # print(final_disease)
-            session_manager.update_context(session_id, 'last_diagnosis', final_disease)
-        else:
-            final_disease = session_manager.get_context(session_id, 'last_diagnosis') or "Unknown Condition"
-        return {
-                "predicted_disease": final_disease if is_first_message else None,  # Only show on first message
-                "treatment_info": treatment_info,
-                "image_description": image_description if is_first_message else None  # Only show on first message
-            }
+
+class _Turn:
+    """State shared by the chat and diagnosis halves of one message."""
+
+    def __init__(self, chat_bot, prompt, image_description, is_first_message, conditions_future, image_deps):
+        self.chat_bot = chat_bot
+        self.prompt = prompt
+        self.image_description = image_description
+        self.is_first_message = is_first_message
+        self.conditions_future = conditions_future
+        self.image_deps = image_deps
+
+
+def _start_turn(image, user_text, session_id, timer):
+    """Load the session, run first-time image analysis and build the chat prompt."""
+    # Initialize chat bot if not exists
+    if not session_manager.get_context(session_id, 'chat_bot'):
+        session_manager.update_context(session_id, 'chat_bot', GeminiChatBot())
+
+    chat_bot = session_manager.get_context(session_id, 'chat_bot')
+    image_description = session_manager.get_context(session_id, 'image_description')
+
+    # Get conversation history for context
+    conversation_history = session_manager.get_conversation(session_id)
+    is_first_message = len(conversation_history) < 2
+
+    # First-time image analysis: both vision prompts in parallel
+    analyze_image = bool(not image_description and image)
+    conditions_future = None
+    if analyze_image:
+        image_description, conditions_future = _analyze_image(image, timer)
+        session_manager.update_context(session_id, 'image_description', image_description)
+
+    # The chat reply and symptom extraction only need the image description
+    prompt = build_prompt(user_text, image_description, is_first_message,
+                          session_manager.get_context(session_id, 'last_diagnosis'))
+    return _Turn(chat_bot, prompt, image_description, is_first_message, conditions_future,
+                 ("image_symptoms",) if analyze_image else ())
+
+
+def _analyze_image(image, timer):
+    """Start both vision prompts and wait for the description. Returns (description, conditions future)."""
+    image_input = image_store.model_input(image) if isinstance(image, str) else image
+    symptoms_future = timer.submit("image_symptoms", describe_image, image_input)
+    conditions_future = timer.submit("image_conditions", suggest_conditions, image_input)
+    try:
+        image_description = timer.wait(symptoms_future, "image_symptoms")
+    except Exception as e:
+        print(f"Error analyzing image: {str(e)}")
+        image_description = None
+    return image_description, conditions_future
+
+
+def _image_disease_list(conditions_future, timer):
+    try:
+        raw_disease_list = timer.wait(conditions_future, "image_conditions")
+    except Exception as e:
+        print(f"Error analyzing image: {str(e)}")
+        raw_disease_list = ""
+    return parse_disease_list(raw_disease_list)
+
+
+def _extract_and_predict(user_text, image_description, timer, depends_on=()):
+    """Symptom vector for the message (and image description) and the model's top-k [(label, probability)]."""
+    combined_text = f"VISUAL SYMPTOMS: {image_description}\nPATIENT DESCRIPTION: {user_text}" if image_description else user_text
+    extraction_future = timer.submit("symptom_extraction", get_symptom_array_from_text, combined_text,
+                                     depends_on=depends_on)
+    try:
+        symptom_array = timer.wait(extraction_future, "symptom_extraction")
+    except StageTimeout:
+        symptom_array = get_symptom_extractor().extract(combined_text).vector
+    predicted = timer.run("predict", predict_disease_top_k, symptom_array, PREDICTION_TOP_K,
+                          depends_on=("symptom_extraction",))
+    return symptom_array, predicted
+
+
+def _diagnose(turn, user_text, session_id, timer):
+    """Symptom extraction -> prediction -> verification against the image's conditions."""
+    if turn.is_first_message:
+        symptom_array, predicted = _extract_and_predict(user_text, turn.image_description, timer, turn.image_deps)
+
+    list_of_disease = session_manager.get_context(session_id, 'image_disease_list')
+    if turn.conditions_future is not None:
+        list_of_disease = _image_disease_list(turn.conditions_future, timer)
+        session_manager.update_context(session_id, 'image_disease_list', list_of_disease)
+
+    # Only predict disease on first message
+    if not turn.is_first_message:
+        return session_manager.get_context(session_id, 'last_diagnosis') or "Unknown Condition"
+    final_disease = timer.run("verify", verify_predicted_disease, predicted, list_of_disease or [],
+                              depends_on=("predict", "image_conditions" if turn.conditions_future else None))
+    with tracer.span("feedback_write"):
+        record_feedback(symptom_array, feedback_label(final_disease[0] if isinstance(final_disease, list) else final_disease))
+    session_manager.update_context(session_id, 'last_diagnosis', final_disease)
+    return final_disease
+
+
+def query_groq_with_image_and_text(image, user_text="Hii Doctor", session_id=None):
+    """
+    Answer one chat message. On the first message the independent stages
+    fan out on the pipeline executor:
+
+        image_symptoms ─┬─> chat
+                        └─> symptom_extraction ─> predict ─┐
+        image_conditions ──────────────────────────────────┴─> verify
+
+    A timed-out image stage is treated as "no image analysis"; a timed-out
+    symptom extraction falls back to the local extractor. Stage timings and
+    the critical path are returned under "timings", and the chat prompt's
+    size against the untrimmed history under "prompt_metrics".
+
+    `image` is an ses.image_store handle (or any image the vision model
+    accepts, e.g. a PIL image); it is only resolved to bytes if the image
+    still needs to be analyzed.
+    """
+    try:
+        # One backend read and one write for the whole message
+        with tracer.span("diagnosis"), session_manager.request(session_id):
+            timer = PipelineTimer()
+            turn = _start_turn(image, user_text, session_id, timer)
+            chat_future = timer.submit("chat", turn.chat_bot.send_message, turn.prompt, user_text,
+                                       depends_on=turn.image_deps)
+            final_disease = _diagnose(turn, user_text, session_id, timer)
+
+            # Get response from chat bot
+            treatment_info = timer.wait(chat_future, "chat")
+            return {
+                    "predicted_disease": final_disease if turn.is_first_message else None,  # Only show on first message
+                    "treatment_info": treatment_info,
+                    "image_description": turn.image_description if turn.is_first_message else None,  # Only show on first message
+                    "timings": timer.report(),
+                    "prompt_metrics": turn.chat_bot.prompt_metrics(),
+                }
         
     except Exception as e:
-        raise Exception(f"Error in query_groq_with_image_and_text: {str(e)}")
+        raise Exception(f"Error in query_groq_with_image_and_text: {str(e)}") from e
+
+
+def diagnose(user_text, image=None):
+    """
+    Diagnosis of one description without a session or chat reply (batch
+    runs): the image, symptom extraction, predict and verify stages of a
+    first message in query_groq_with_image_and_text. Nothing is written to
+    the feedback log.
+    """
+    with tracer.span("batch_diagnosis"):
+        timer = PipelineTimer()
+        image_description, conditions_future = _analyze_image(image, timer) if image is not None else (None, None)
+        symptom_array, predicted = _extract_and_predict(user_text, image_description, timer,
+                                                        ("image_symptoms",) if image is not None else ())
+        list_of_disease = _image_disease_list(conditions_future, timer) if conditions_future is not None else []
+        final_disease = timer.run("verify", verify_predicted_disease, predicted, list_of_disease,
+                                  depends_on=("predict", "image_conditions" if conditions_future else None))
+        return {
+            "predicted_disease": final_disease,
+            "model_top_k": predicted,
+            "symptoms": [name for name, present in zip(get_all_symptoms(), symptom_array) if present],
+            "image_description": image_description,
+            "image_conditions": list_of_disease,
+            "timings": timer.report(),
+        }
+
+
+class StreamingReply:
+    """
+    Iterate for the chat reply's text chunks as they arrive; `metadata` is a
+    future for the prediction ({"predicted_disease", "image_description"})
+    that resolves independently of the reply. `text` holds what has been
+    streamed so far.
+    """
+
+    def __init__(self, chunks, metadata, chat_bot, timer):
+        self._chunks = chunks
+        self.metadata = metadata
+        self.text = ""
+        self._chat_bot = chat_bot
+        self._timer = timer
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self.text += chunk
+            yield chunk
+
+    def timings(self):
+        return self._timer.report()
+
+    def prompt_metrics(self):
+        return self._chat_bot.prompt_metrics()
+
+
+def _stream_chat(turn, user_text, session_id, timer, parent_span):
+    start = time.perf_counter()
+    first_token_ms = None
+    status = "error"
+    # Runs wherever the reply is consumed, so the span is parented explicitly
+    span = tracer.span("chat", parent=parent_span)
+    error = None
+    try:
+        with session_manager.request(session_id):
+            for chunk in turn.chat_bot.stream_message(turn.prompt, user_text, span):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - timer.t0) * 1000
+                yield chunk
+            status = "ok"
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        timer.record("chat", start, time.perf_counter(), turn.image_deps, status, first_token_ms=first_token_ms)
+        span.set(first_token_ms=first_token_ms)
+        span.finish(error)
+
+
+def _stream_metadata(turn, user_text, session_id, timer):
+    with session_manager.request(session_id):
+        final_disease = _diagnose(turn, user_text, session_id, timer)
+    return {
+        "predicted_disease": final_disease if turn.is_first_message else None,  # Only show on first message
+        "image_description": turn.image_description if turn.is_first_message else None,
+    }
+
+
+def stream_query_with_image_and_text(image, user_text="Hii Doctor", session_id=None):
+    """
+    Streaming variant of query_groq_with_image_and_text. Returns once the
+    image (if any) is analyzed; the reply then streams from the returned
+    StreamingReply while the prediction runs in the background and arrives
+    on its `metadata` future, so neither waits for the other.
+    """
+    try:
+        timer = PipelineTimer()
+        # The span covers the synchronous start; the chat and prediction
+        # spans that follow share its trace
+        with tracer.span("diagnosis_start") as root, session_manager.request(session_id):
+            turn = _start_turn(image, user_text, session_id, timer)
+            metadata = coordinator.submit(contextvars.copy_context().run, _stream_metadata,
+                                          turn, user_text, session_id, timer)
+        chunks = _stream_chat(turn, user_text, session_id, timer, root)
+        return StreamingReply(chunks, metadata, turn.chat_bot, timer)
+    except Exception as e:
+        raise Exception(f"Error in stream_query_with_image_and_text: {str(e)}") from e
 
 
-def verify_predicted_disease(predicted, disease_list, cutoff=0.4):
+def verify_predicted_disease(predicted, disease_list, cutoff=MIN_SCORE):
+    """
+    Check the model's prediction against the conditions suggested from the
+    image. `predicted` is a label or the model's [(label, probability)]
+    ranking from predict_disease_top_k. Returns a label when the two agree,
+    otherwise up to three names from their fused ranking.
+    """
+    candidates = ((predicted, 1.0),) if isinstance(predicted, str) else \
+        tuple((str(label), float(p)) for label, p in predicted)
+    candidates = _canonical_candidates(candidates)
     if not disease_list:
-        return predicted
+        return candidates[0][0]
+
+    key = (candidates, tuple(disease_list), cutoff)
+    result = verification_cache.get(key)
+    if result is None:
+        result = _verify_predicted_disease(candidates, disease_list, cutoff)
+        verification_cache.put(key, result)
+    # Callers store the result in the session; don't hand out the cached list
+    return list(result) if isinstance(result, list) else result
+
+
+def _canonical_candidates(candidates):
+    """
+    The model's ranking with noisy training labels mapped to the label they
+    stand for (DiseaseVocabulary.label_of), probabilities of labels that
+    merge summed, best first.
+    """
+    try:
+        vocabulary = get_disease_vocabulary()
+    except Exception as e:
+        print(f"Error loading disease labels: {str(e)}")
+        return tuple((label, round(p, 4)) for label, p in candidates)
+    merged = {}
+    for label, p in candidates:
+        label = vocabulary.label_of(label)
+        merged[label] = merged.get(label, 0.0) + p
+    return tuple((label, round(p, 4)) for label, p in sorted(merged.items(), key=lambda item: -item[1]))
 
-    # Try fuzzy matching using difflib
-    matches = difflib.get_close_matches(predicted, disease_list, n=3, cutoff=cutoff)
-    if matches:
-        # If any reasonably close match exists, consider it a valid match
+
+def _verify_predicted_disease(candidates, disease_list, cutoff):
+    # One vectorized scoring pass of the image's conditions against the
+    # model's vocabulary; agreement with the predicted label confirms it
+    predicted = candidates[0][0]
+    names = parse_disease_list(disease_list)
+    if not names:
+        # Nothing usable from the image: the prediction stands
+        return predicted
+    try:
+        confirmed, matches = get_disease_vocabulary().reconcile(predicted, names, min_score=cutoff)
+    except Exception as e:
+        print(f"Error matching disease labels: {str(e)}")
+        # Without label matching, fall back to the image's top 3
+        return names[:3]
+    if confirmed:
         return predicted
-    else:
-        # Return top 3 most similar diseases from list
-        return matches if matches else disease_list[:3]
+    return fuse_rankings(candidates, matches)
+
+
+def fuse_rankings(candidates, matches, limit=3):
+    """
+    Reciprocal rank fusion of the model's ranking ([(label, probability)])
+    and the image's (reconcile matches: [(name, label or None, score)]).
+    Each condition scores 1 / (RANK_FUSION_K + rank) in every ranking it
+    appears in, image names counting for the label they resolve to. If
+    the best condition is in both rankings its label is returned; else the
+    best `limit` names, the model's first on ties.
+    """
+    scores, sources, names = {}, {}, {}
+
+    def add(key, name, source, rank):
+        if source in sources.setdefault(key, set()):
+            return
+        scores[key] = scores.get(key, 0.0) + 1.0 / (RANK_FUSION_K + rank)
+        sources[key].add(source)
+        names.setdefault(key, name)
+
+    model_ranking = [label for label, p in candidates if p >= MIN_CANDIDATE_PROBABILITY] or [candidates[0][0]]
+    for rank, label in enumerate(model_ranking, 1):
+        add(label, label, "model", rank)
+    for rank, (name, label, _) in enumerate(matches, 1):
+        add(label or clean_name(name).lower(), label or name, "image", rank)
+
+    ranked = sorted(scores, key=lambda key: -scores[key])
+    if len(sources[ranked[0]]) == 2:
+        return names[ranked[0]]
+    return [names[key] for key in ranked[:limit]]
+
+
+def get_symptom_extractor():
+    global _symptom_extractor
+    if _symptom_extractor is None:
+        _symptom_extractor = SymptomExtractor(get_all_symptoms())
+    return _symptom_extractor
 
 def get_symptom_array_from_text(combined_text):
+    """
+    Binary symptom vector for the text. The local extractor is the primary
+    path; the LLM is only asked when the local match is low-confidence, and
+    its answer is merged with (never replaces) what was matched locally.
+    """
+    with tracer.span("get_symptom_array_from_text") as span:
+        local = get_symptom_extractor().extract(combined_text)
+        span.set(confident=local.confident, local_symptoms=len(local.present))
+        if local.confident:
+            return local.vector
+
+        llm_present = get_symptoms_from_llm(combined_text)
+        span.set(llm_used=llm_present is not None)
+        if llm_present is None:
+            return local.vector
+        present = (set(llm_present) | set(local.present)) - set(local.negated)
+        return [1 if symptom in present else 0 for symptom in get_all_symptoms()]
+
+def get_symptoms_from_llm(combined_text):
+    """Ask the Groq model for present symptoms. Returns a list of names, or None on failure."""
     symptoms_list = get_all_symptoms()
     prompt = f"""
 Analyze this medical description and return a JSON response with present and absent symptoms:
@@ -154,8 +536,11 @@ Return ONLY JSON format with two arrays:
   "absent": ["symptom3", "symptom4"]
 }}
 """
-    try:
-        response = client.chat.completions.create(
+    called = []
+
+    def call():
+        called.append(True)
+        response = get_groq_client().chat.completions.create(
             messages=[
                 {"role": "system", "content": "You are a medical symptom analyzer. Return only JSON."},
                 {"role": "user", "content": prompt}
@@ -165,11 +550,20 @@ Return ONLY JSON format with two arrays:
             response_format={"type": "json_object"},
             max_tokens=1000
         )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
         symptom_data = json.loads(response.choices[0].message.content)
-        return [1 if symptom in symptom_data.get("present", []) else 0 for symptom in symptoms_list]
+        return [symptom for symptom in symptom_data.get("present", []) if symptom in symptoms_list]
+
+    try:
+        with tracer.span("groq.symptoms", model=MODEL_TEXT) as span:
+            present = response_cache.get_or_call(make_key(MODEL_TEXT, prompt), call)
+            span.set(cache_hit=not called)
+            return present
     except Exception as e:
         print(f"Error in symptom extraction: {str(e)}")
-        return [0] * len(symptoms_list)
+        return None
 
 def get_all_symptoms():
     """Return the complete list of symptoms in the correct order"""
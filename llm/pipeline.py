@@ -0,0 +1,106 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from llm.tracing import tracer
+
+# Seconds to wait for each stage before degrading (see query_groq_with_image_and_text)
+STAGE_TIMEOUTS = {
+    "image_symptoms": 45,
+    "image_conditions": 45,
+    "chat": 90,
+    "symptom_extraction": 30,
+}
+
+# Shared by all sessions; stages are only ever awaited from the request
+# thread or the coordinator pool, never from inside this pool, so a full
+# pool cannot deadlock.
+executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="diagnosis")
+
+# Background tasks that wait on stages (e.g. the prediction metadata of a
+# streamed reply) run here instead of holding a stage worker.
+coordinator = ThreadPoolExecutor(max_workers=8, thread_name_prefix="diagnosis-wait")
+
+
+class StageTimeout(Exception):
+    pass
+
+
+class PipelineTimer:
+    """
+    Records when each stage of one request started and finished, plus the
+    stages it waited for, so the critical path can be reported afterwards.
+    Each stage run through the timer is also a tracing span.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def run(self, name, fn, *args, depends_on=()):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            with tracer.span(name):
+                return fn(*args)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(name, start, time.perf_counter(), depends_on, status)
+
+    def record(self, name, start, end, depends_on=(), status="ok", **extra):
+        """Record a stage timed by the caller (perf_counter timestamps)."""
+        with self._lock:
+            self.stages[name] = {
+                "start_ms": (start - self.t0) * 1000,
+                "end_ms": (end - self.t0) * 1000,
+                "duration_ms": (end - start) * 1000,
+                "depends_on": [d for d in depends_on if d],
+                "status": status,
+                **extra,
+            }
+
+    def submit(self, name, fn, *args, depends_on=()):
+        # Run in a copy of the caller's context so the stage's span joins the request's trace
+        return executor.submit(contextvars.copy_context().run, self.run, name, fn, *args, depends_on=depends_on)
+
+    def wait(self, future, name):
+        """Result of a submitted stage, or StageTimeout after STAGE_TIMEOUTS[name] seconds."""
+        try:
+            return future.result(timeout=STAGE_TIMEOUTS.get(name))
+        except FutureTimeoutError:
+            with self._lock:
+                self.stages.setdefault(name, {
+                    "start_ms": None,
+                    "end_ms": (time.perf_counter() - self.t0) * 1000,
+                    "duration_ms": None,
+                    "depends_on": [],
+                    "status": "timeout",
+                })
+            error = StageTimeout(f"{name} timed out after {STAGE_TIMEOUTS.get(name)}s")
+            tracer.record_error(name, error)
+            raise error
+
+    def critical_path(self):
+        """Stages on the longest dependency chain, ending with the last stage to finish."""
+        with self._lock:
+            stages = dict(self.stages)
+        if not stages:
+            return []
+        path = []
+        name = max(stages, key=lambda n: stages[n]["end_ms"])
+        while name is not None:
+            path.append(name)
+            deps = [d for d in stages[name]["depends_on"] if d in stages]
+            name = max(deps, key=lambda n: stages[n]["end_ms"]) if deps else None
+        return path[::-1]
+
+    def report(self):
+        return {
+            "total_ms": (time.perf_counter() - self.t0) * 1000,
+            "critical_path": self.critical_path(),
+            "stages": dict(self.stages),
+        }
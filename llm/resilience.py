@@ -0,0 +1,233 @@
+import random
+import threading
+import time
+
+# Calls in flight to all LLM providers together
+GLOBAL_MAX_CONCURRENCY = 32
+
+# Per provider: concurrent calls, sustained calls/second and burst size
+PROVIDER_LIMITS = {
+    "gemini": {"max_concurrency": 16, "rate": 20.0, "burst": 40},
+    "groq": {"max_concurrency": 8, "rate": 10.0, "burst": 20},
+}
+
+# Retries with full-jitter exponential backoff; no retry is started that
+# would end after `max_elapsed` seconds (stages time out, see STAGE_TIMEOUTS)
+RETRY = {"max_retries": 3, "base_delay": 0.5, "max_delay": 8.0, "max_elapsed": 20.0}
+
+# Consecutive failed calls that open the circuit, and seconds before a probe
+BREAKER = {"failure_threshold": 5, "reset_timeout": 30.0}
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests",
+}
+
+
+class CircuitOpen(Exception):
+    """The provider failed repeatedly; calls fail fast until the breaker's probe succeeds."""
+
+
+def _status(error):
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error):
+    """Rate limits, server errors, timeouts and dropped connections; not bad requests or auth."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`rate` calls per second on average, up to `burst` at once."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After `failure_threshold` consecutive failures it
+    opens and rejects calls for `reset_timeout` seconds, then lets a single
+    probe through (half-open); the probe's outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == "open":
+                return
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_global_slots = threading.BoundedSemaphore(GLOBAL_MAX_CONCURRENCY)
+
+
+class ProviderPolicy:
+    """
+    How calls to one provider are made: at most `max_concurrency` at once
+    (and GLOBAL_MAX_CONCURRENCY across providers), paced by a token bucket,
+    retried with jittered exponential backoff on retryable errors, and
+    rejected with CircuitOpen while the provider keeps failing so callers
+    fall back (local symptom extraction, no image analysis) immediately.
+    """
+
+    def __init__(self, name, max_concurrency=8, rate=10.0, burst=20, max_retries=3, base_delay=0.5,
+                 max_delay=8.0, max_elapsed=20.0, failure_threshold=5, reset_timeout=30.0, seed=None):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+                         "rejected": 0, "throttled_s": 0.0}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def backoff(self, attempt, error=None):
+        """Delay before retry `attempt` (1-based): full jitter, or the server's Retry-After."""
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        with self._lock:
+            return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _attempt(self, fn):
+        # Wait for the rate limit before taking a slot, so slots only cover calls in flight
+        self._count("throttled_s", self.bucket.acquire())
+        with self._slots, _global_slots:
+            self._count("attempts")
+            return fn()
+
+    def call(self, fn):
+        """Run fn() under this provider's limits, retries and circuit breaker."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpen(f"{self.name} circuit open after repeated failures")
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(fn)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; the request itself was wrong
+                    self.breaker.record_success()
+                    raise
+                attempt += 1
+                delay = self.backoff(attempt, e)
+                # Stop retrying once other calls have opened the circuit
+                if (attempt > self.max_retries or time.monotonic() - start + delay > self.max_elapsed
+                        or self.breaker.state == "open"):
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["circuit_open"] = int(self.breaker.state != "closed")
+        return stats
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name):
+    """The process-wide ProviderPolicy for `name` ("gemini", "groq"), built from the settings above."""
+    policy = _policies.get(name)
+    if policy is None:
+        with _policies_lock:
+            policy = _policies.get(name)
+            if policy is None:
+                policy = _policies[name] = ProviderPolicy(name, **PROVIDER_LIMITS.get(name, {}), **RETRY, **BREAKER)
+    return policy
+
+
+def configure(name, **settings):
+    """Replace `name`'s policy, overriding any of the default settings (e.g. rate=100)."""
+    merged = {**PROVIDER_LIMITS.get(name, {}), **RETRY, **BREAKER, **settings}
+    with _policies_lock:
+        _policies[name] = policy = ProviderPolicy(name, **merged)
+    return policy
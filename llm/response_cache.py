@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from model.prediction_cache import LRUCache
+
+# Replies (and so the patient text they quote) are stored here in plain text;
+# set LLM_CACHE_PATH to move the file, or to an empty string to keep them in memory only
+CACHE_DB_PATH = os.getenv("LLM_CACHE_PATH", "data/cache/llm_responses.sqlite3")
+# Rows kept on disk at most; the oldest go first
+CACHE_MAX_ROWS = 50_000
+# Expired and surplus rows are deleted when the file is opened and every N writes
+PURGE_EVERY = 256
+_MISSING = object()
+
+
+def hash_image(image):
+    """Stable content hash for raw bytes, a {"data": bytes} blob or a PIL image."""
+    if image is None:
+        return ""
+    if isinstance(image, dict):
+        image = image["data"]
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_key(model, prompt, image=None, context=""):
+    """Content address of one model call: model, prompt, image and any extra context."""
+    digest = hashlib.sha256()
+    for part in (model, prompt, hash_image(image), context):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses with single-flight coalescing.
+
+    Lookups go to an in-memory LRU first, then to a sqlite table (WAL mode,
+    shared by every worker process). On a miss only one caller per key runs
+    the backend call; concurrent callers with the same key wait for it and
+    share the result. Failed calls are never cached.
+
+    Rows older than `ttl` and all but the newest `max_rows` are deleted from
+    the sqlite file when it is opened and every `PURGE_EVERY` writes.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, maxsize=1024, ttl=24 * 3600, max_rows=CACHE_MAX_ROWS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._opened = False
+        self._writes = 0
+        self.disk_hits = 0
+        self.purged = 0
+        self.coalesced = 0
+        self.calls = 0
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._local.conn = conn
+            with self._lock:
+                first, self._opened = not self._opened, True
+            if first:
+                self.purge()
+        return conn
+
+    def purge(self):
+        """Delete expired rows and all but the newest `max_rows`. Returns the number deleted."""
+        if not self.db_path:
+            return 0
+        try:
+            with self._db() as conn:
+                deleted = 0
+                if self.ttl is not None:
+                    deleted += conn.execute(
+                        "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+                    ).rowcount
+                if self.max_rows is not None:
+                    deleted += conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                        (self.max_rows,),
+                    ).rowcount
+        except sqlite3.Error as e:
+            print(f"Error purging LLM cache: {str(e)}")
+            return 0
+        self.purged += deleted
+        return deleted
+
+    def get(self, key):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not self.db_path:
+            return None
+        try:
+            row = self._db().execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading LLM cache: {str(e)}")
+            return None
+        if row is None or (self.ttl is not None and row[1] + self.ttl < time.time()):
+            return None
+        value = json.loads(row[0])
+        self.disk_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if not self.db_path:
+            return
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing LLM cache: {str(e)}")
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PURGE_EVERY == 0
+        if due:
+            self.purge()
+
+    def get_or_call(self, key, call):
+        """Return the cached value for `key`, or run `call()` once and cache its result."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            self.calls += 1
+            inflight.value = call()
+            if inflight.value is not None:
+                self.put(key, inflight.value)
+            return inflight.value
+        except BaseException as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.done.set()
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats.update(disk_hits=self.disk_hits, purged=self.purged, coalesced=self.coalesced, backend_calls=self.calls)
+        return stats
+
+
+# Singleton instance used across the app
+response_cache = ResponseCache()
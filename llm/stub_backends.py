@@ -0,0 +1,146 @@
+"""
+Local stand-ins for Gemini and Groq with configurable latency, jitter and
+failure rate, for benchmarks and offline runs (LLM_BACKEND=stub, or
+llm.clients.use_backend("stub", latency=..., jitter=...)). Replies are
+canned but shaped like the real ones, so the whole pipeline runs.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from llm.clients import register_backend
+
+# (image description, suggested conditions) picked per image content
+_IMAGE_FINDINGS = [
+    ("Red, inflamed papules and pustules on the cheeks with mild itching and skin rash.",
+     "1. Acne vulgaris\n2. Rosacea\n3. Perioral dermatitis"),
+    ("Cloudy, opaque lens in the left eye with redness of eyes and blurred and distorted vision.",
+     "1. Cataract\n2. Corneal opacity\n3. Uveitis"),
+    ("Circular scaly patches with raised edges, itching and skin rash on the forearm.",
+     "1. Fungal infection\n2. Psoriasis\n3. Eczema"),
+    ("Yellowish skin and yellowing of eyes; the patient looks fatigued.",
+     "1. Jaundice\n2. Hepatitis B\n3. Alcoholic hepatitis"),
+]
+
+_CHAT_REPLY = (
+    "Based on what you describe, rest, stay hydrated and keep the affected area clean. "
+    "Avoid self-medicating with antibiotics; an over-the-counter antihistamine may ease itching. "
+    "If symptoms worsen or a high fever develops, please see a doctor in person."
+)
+
+
+class StubBackendError(Exception):
+    """Injected failure; looks like a 503 to the retry policy."""
+
+    status_code = 503
+
+
+class _Latency:
+    """Sleeps latency +- jitter seconds per call and fails a fraction of calls."""
+
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, fraction=1.0):
+        with self._lock:
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(max(0.0, delay) * fraction)
+        if fail:
+            raise StubBackendError("stub backend: injected failure")
+
+
+class _Text:
+    def __init__(self, text):
+        self.text = text
+
+
+def _content_hash(part):
+    if isinstance(part, dict):
+        part = part.get("data", b"")
+    if isinstance(part, str):
+        part = part.encode("utf-8")
+    if not isinstance(part, (bytes, bytearray)):
+        part = repr(part).encode("utf-8")
+    return int(hashlib.sha256(part).hexdigest()[:8], 16)
+
+
+class StubGenerativeModel:
+    def __init__(self, model_name, latency):
+        self.model_name = model_name
+        self._latency = latency
+
+    def _reply(self, contents):
+        if isinstance(contents, list) and len(contents) == 2 and isinstance(contents[0], str):
+            # Vision call: [prompt, image]
+            description, conditions = _IMAGE_FINDINGS[_content_hash(contents[1]) % len(_IMAGE_FINDINGS)]
+            return conditions if "possible disease" in contents[0] else description
+        return _CHAT_REPLY
+
+    def generate_content(self, contents, stream=False):
+        reply = self._reply(contents)
+        if not stream:
+            self._latency.wait()
+            return _Text(reply)
+        # Like the real API the request is made here: half the latency
+        # before the first chunk, the rest spread over the others
+        self._latency.wait(0.5)
+        return self._stream(reply)
+
+    def _stream(self, reply):
+        words = reply.split(" ")
+        chunks = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+        for i, chunk in enumerate(chunks):
+            if i:
+                self._latency.wait(0.5 / max(len(chunks) - 1, 1))
+            yield _Text(chunk)
+
+
+class StubGenAI:
+    """Stands in for the google.generativeai module."""
+
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, seed=None):
+        self._latency = _Latency(latency, jitter, error_rate, seed)
+
+    def GenerativeModel(self, model_name="gemini-1.5-flash", **kwargs):
+        return StubGenerativeModel(model_name, self._latency)
+
+
+class _Namespace:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class _StubCompletions:
+    def __init__(self, latency):
+        self._latency = latency
+
+    def create(self, messages, model=None, **kwargs):
+        prompt = messages[-1]["content"]
+        description, _, available = prompt.partition("Available symptoms")
+        description = description.lower()
+        names = re.findall(r'"([a-z_]+)"', available)
+        present = [name for name in names if name.replace("_", " ") in description]
+        content = json.dumps({"present": present, "absent": []})
+        self._latency.wait()
+        return _Namespace(
+            choices=[_Namespace(message=_Namespace(content=content))],
+            usage=_Namespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4),
+        )
+
+
+class StubGroq:
+    """Stands in for groq.Groq: chat.completions.create only."""
+
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, seed=None):
+        self.chat = _Namespace(completions=_StubCompletions(_Latency(latency, jitter, error_rate, seed)))
+
+
+register_backend("stub", StubGenAI, StubGroq)
@@ -0,0 +1,312 @@
+import re
+
+# Lay phrases for each symptom, on top of the symptom name itself. A single
+# word only where it can't mean anything else in a patient's message; broad
+# words ("alcohol", "pus", "stiffness") need the words that make them a
+# symptom ("drink alcohol", "pus filled", "morning stiffness"). Checked on
+# benchmarks/fixtures/symptom_heldout.jsonl, phrasings not used to write this.
+SYNONYMS = {
+    "itching": ["itchy", "itch", "pruritus", "scratching skin", "keep scratching skin"],
+    "skin_rash": ["rash", "hives", "rash on skin"],
+    "nodal_skin_eruptions": ["skin eruptions", "bumps on skin", "skin bumps"],
+    "continuous_sneezing": ["sneezing", "sneeze", "keep sneezing"],
+    "shivering": ["shiver", "shaking with cold", "trembling with cold", "teeth chattering"],
+    "chills": ["feeling chilly", "feel chilly", "feeling cold"],
+    "joint_pain": ["joints hurt", "aching joints", "joint ache", "arthralgia"],
+    "stomach_pain": ["stomach ache", "stomachache", "tummy ache", "stomach cramps", "stomach hurts"],
+    "acidity": ["heartburn", "acid reflux"],
+    "ulcers_on_tongue": ["tongue ulcers", "mouth ulcers", "sores on tongue"],
+    "muscle_wasting": ["muscle loss"],
+    "vomiting": ["vomit", "vomited", "throwing up", "threw up", "puking"],
+    "burning_micturition": [
+        "burning urination", "burning when urinating", "burning while urinating",
+        "burning when i pee", "painful urination",
+    ],
+    "fatigue": ["tired", "tiredness", "exhausted", "exhaustion", "fatigued", "worn out"],
+    "weight_gain": ["gained weight", "gaining weight"],
+    "anxiety": ["anxious", "nervous"],
+    "cold_hands_and_feets": ["cold hands", "cold feet", "cold hands and feet"],
+    "mood_swings": ["moody"],
+    "weight_loss": ["lost weight", "losing weight"],
+    "restlessness": ["restless"],
+    "lethargy": ["lethargic", "sluggish", "no energy"],
+    "patches_in_throat": ["white patches in throat", "throat patches"],
+    "irregular_sugar_level": ["irregular sugar", "blood sugar fluctuates", "unstable blood sugar"],
+    "cough": ["coughing"],
+    "high_fever": ["fever", "high temperature", "febrile", "burning up"],
+    "sunken_eyes": [],
+    "breathlessness": [
+        "breathless", "shortness of breath", "short of breath", "difficulty breathing",
+        "trouble breathing", "can't breathe", "hard to breathe",
+    ],
+    "sweating": ["sweat", "sweaty", "sweats", "night sweats"],
+    "dehydration": ["dehydrated"],
+    "indigestion": ["dyspepsia"],
+    "headache": ["head ache", "head hurts", "head pain", "pounding head"],
+    "yellowish_skin": ["yellow skin", "skin turned yellow", "skin is yellow"],
+    "dark_urine": ["dark pee", "dark coloured urine", "dark colored urine", "brown urine"],
+    "nausea": ["nauseous", "nauseated", "queasy", "feel like vomiting", "feel like throwing up"],
+    "loss_of_appetite": [
+        "no appetite", "not hungry", "lost appetite", "poor appetite", "don't feel like eating",
+    ],
+    "pain_behind_the_eyes": ["pain behind eyes", "eyes hurt behind"],
+    "back_pain": ["backache", "back ache", "back hurts", "lower back pain"],
+    "constipation": ["constipated"],
+    "abdominal_pain": ["abdomen pain", "pain in abdomen", "abdominal cramps", "abdomen hurts"],
+    "diarrhoea": ["diarrhea", "loose stools", "loose motions", "watery stools"],
+    "mild_fever": ["low grade fever", "slight fever", "low fever", "mild temperature"],
+    "yellow_urine": [],
+    "yellowing_of_eyes": ["yellow eyes", "yellowing eyes", "eyes are yellow", "eyes turned yellow"],
+    "acute_liver_failure": ["liver failure"],
+    "fluid_overload": ["fluid retention"],
+    "swelling_of_stomach": ["swollen stomach", "stomach swelling", "bloated stomach"],
+    "swelled_lymph_nodes": ["swollen lymph nodes", "swollen glands", "enlarged lymph nodes"],
+    "malaise": ["feel unwell", "feeling unwell", "generally unwell"],
+    "blurred_and_distorted_vision": [
+        "blurred vision", "blurry vision", "distorted vision", "vision is blurry", "blurring of vision",
+    ],
+    "phlegm": ["cough up mucus", "coughing up mucus", "mucus in chest", "mucus in throat"],
+    "throat_irritation": ["irritated throat", "scratchy throat", "sore throat", "throat is sore"],
+    "redness_of_eyes": [
+        "red eyes", "eye redness", "redness in eyes", "redness of eye", "bloodshot eyes", "eyes are red",
+        "redness of the conjunctiva", "conjunctival redness",
+    ],
+    "sinus_pressure": ["sinus pain"],
+    "runny_nose": ["running nose", "nose is running"],
+    "congestion": ["congested", "stuffy nose", "blocked nose"],
+    "chest_pain": ["pain in chest", "chest hurts", "chest tightness", "tight chest"],
+    "weakness_in_limbs": ["weak limbs", "weak arms", "weak legs"],
+    "fast_heart_rate": [
+        "racing heart", "heart racing", "heart is racing", "rapid heartbeat", "fast heartbeat",
+        "tachycardia",
+    ],
+    "pain_during_bowel_movements": ["painful bowel movements", "pain when passing stool"],
+    "pain_in_anal_region": ["anal pain", "pain around anus"],
+    "bloody_stool": ["blood in stool", "blood in stools"],
+    "irritation_in_anus": ["anal itching", "itchy anus"],
+    "neck_pain": ["neck hurts", "sore neck"],
+    "dizziness": ["dizzy", "lightheaded", "light headed"],
+    "cramps": ["cramping"],
+    "bruising": ["bruises", "bruise easily"],
+    "obesity": ["obese", "overweight"],
+    "swollen_legs": ["leg swelling", "swelling in legs"],
+    "swollen_blood_vessels": ["swollen veins"],
+    "puffy_face_and_eyes": ["puffy face", "puffy eyes", "swollen face"],
+    "enlarged_thyroid": ["goitre", "goiter"],
+    "brittle_nails": ["nails are brittle"],
+    "swollen_extremeties": ["swollen extremities", "swollen hands", "swollen feet"],
+    "excessive_hunger": ["always hungry", "constantly hungry"],
+    "extra_marital_contacts": ["unprotected sex"],
+    "drying_and_tingling_lips": ["dry lips", "tingling lips"],
+    "slurred_speech": ["slurring"],
+    "knee_pain": ["knee hurts", "knees hurt", "sore knee"],
+    "hip_joint_pain": ["hip pain"],
+    "muscle_weakness": ["weak muscles"],
+    "stiff_neck": ["neck stiffness", "neck is stiff"],
+    "swelling_joints": ["swollen joints", "joint swelling"],
+    "movement_stiffness": [
+        "stiff joints", "joints are stiff", "stiff when moving", "stiffness when moving", "morning stiffness",
+        "stiffness in morning", "stiff in morning",
+    ],
+    "spinning_movements": ["room spinning", "room is spinning", "spinning sensation"],
+    "loss_of_balance": ["lose balance", "losing balance", "off balance"],
+    "unsteadiness": ["unsteady", "wobbly on feet", "unsteady on feet"],
+    "weakness_of_one_body_side": ["weakness on one side", "one side of body weak"],
+    "loss_of_smell": ["can't smell", "cannot smell", "lost sense of smell"],
+    "bladder_discomfort": ["bladder pain"],
+    "foul_smell_of_urine": ["foul smelling urine", "smelly urine", "urine smells"],
+    "continuous_feel_of_urine": ["constant urge to urinate", "constant urge to pee", "always need to pee"],
+    "passage_of_gases": ["passing gas", "flatulence", "gassy"],
+    "internal_itching": [],
+    "toxic_look_(typhos)": ["toxic look"],
+    "depression": ["depressed"],
+    "irritability": ["irritable"],
+    "muscle_pain": ["muscle ache", "muscles ache", "body ache", "body aches", "myalgia", "sore muscles"],
+    "altered_sensorium": [
+        "disoriented", "mental confusion", "confused and disoriented", "feel confused", "feeling confused",
+        "confused state", "altered consciousness",
+    ],
+    "red_spots_over_body": ["red spots", "red spots on body"],
+    "belly_pain": ["belly ache", "bellyache"],
+    "abnormal_menstruation": ["irregular periods", "abnormal periods", "heavy periods"],
+    "dischromic_patches": ["discolored patches", "discoloured patches", "skin discoloration"],
+    "watering_from_eyes": [
+        "watery eyes", "watering eyes", "eyes watering", "eyes are watery", "teary eyes", "eyes tearing",
+        "tearing eyes", "eyes keep tearing",
+    ],
+    "increased_appetite": [],
+    "polyuria": ["frequent urination", "urinating frequently", "peeing a lot"],
+    "family_history": [],
+    "mucoid_sputum": [],
+    "rusty_sputum": [],
+    "lack_of_concentration": [
+        "can't concentrate", "cannot concentrate", "trouble concentrating", "poor concentration",
+    ],
+    "visual_disturbances": ["vision problems", "seeing spots"],
+    "receiving_blood_transfusion": ["blood transfusion"],
+    "receiving_unsterile_injections": ["unsterile injections", "shared needles"],
+    "coma": ["unconscious"],
+    "stomach_bleeding": [],
+    "distention_of_abdomen": ["abdominal distention", "distended abdomen", "bloated abdomen", "bloating"],
+    "history_of_alcohol_consumption": [
+        "drink alcohol", "drinking alcohol", "alcohol every day", "alcohol abuse", "heavy drinking",
+        "heavy drinker", "drink heavily", "drink too much", "drink lot of alcohol",
+    ],
+    "blood_in_sputum": ["coughing blood", "coughing up blood", "bloody sputum"],
+    "prominent_veins_on_calf": ["prominent veins", "bulging veins"],
+    "palpitations": ["heart pounding", "pounding heart", "heart fluttering"],
+    "painful_walking": ["hurts to walk", "pain when walking", "pain while walking"],
+    "pus_filled_pimples": ["pimples with pus", "pimples filled with pus", "pustules", "pus pimples"],
+    "blackheads": [],
+    "scurring": ["acne scars", "pimple scars", "acne scarring", "scarring from acne", "leaving scars"],
+    "skin_peeling": ["peeling skin", "flaky skin", "skin flaking"],
+    "silver_like_dusting": ["silvery scales", "silvery patches"],
+    "small_dents_in_nails": ["dents in nails", "pitted nails", "nail pitting"],
+    "inflammatory_nails": ["inflamed nails", "nail inflammation"],
+    "blister": [],
+    "red_sore_around_nose": ["sore around nose", "sores around nose"],
+    "yellow_crust_ooze": [
+        "yellow crust", "yellow crusts", "crusty sores", "honey colored crust", "oozing yellow", "oozing sores",
+        "sores oozing",
+    ],
+}
+
+# Symptom columns that duplicate another column and are never extracted
+SKIP_SYMPTOMS = {"fluid_overload.1"}
+
+NEGATION_CUES = {
+    "no", "not", "without", "denies", "denied", "deny", "never", "neither", "nor", "negative",
+    "don't", "doesn't", "didn't", "haven't", "hasn't", "hadn't", "isn't", "wasn't", "aren't",
+    "dont", "doesnt", "didnt", "havent", "hasnt",
+}
+# End a negation scope: "no fever but a bad cough"
+SCOPE_TERMINATORS = {"but", "however", "although", "though", "except", "yet", "apart"}
+# Start a new statement once the negated symptom was seen: "no fever, i have cough"
+SCOPE_RESETS = {"i", "have", "has", "had", "feel", "feeling", "got", "am", "is", "experiencing"}
+# Dropped on both sides so "pain in my chest" matches "pain in chest"
+FILLER_WORDS = {
+    "a", "an", "the", "my", "his", "her", "their", "your", "our", "some",
+    "very", "really", "quite", "so", "bad", "severe", "terrible",
+}
+MAX_NEGATION_SCOPE = 6
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.,;:!?\n]")
+_PUNCTUATION = set(".,;:!?\n")
+
+
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _tokenize(text):
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower().replace("’", "'")):
+        if token in FILLER_WORDS:
+            continue
+        tokens.append(token if token in _PUNCTUATION or token in NEGATION_CUES else _stem(token))
+    return tokens
+
+
+class ExtractionResult:
+    def __init__(self, vector, present, negated, coverage, confident):
+        self.vector = vector          # 0/1 list in symptom order
+        self.present = present        # symptom names found and not negated
+        self.negated = negated        # symptom names found inside a negation scope
+        self.coverage = coverage      # share of substantive clauses with at least one match
+        self.confident = confident
+
+
+class SymptomExtractor:
+    """
+    Deterministic symptom extraction over a precompiled token trie.
+
+    Every symptom name and its lay synonyms are tokenized once into a trie;
+    `extract` walks the text once, taking the longest phrase match at each
+    position, and drops matches that fall inside a negation scope
+    ("no fever", "doesn't have chills or a cough").
+    """
+
+    def __init__(self, symptoms, synonyms=SYNONYMS, min_coverage=0.5, min_clause_tokens=3):
+        self.symptoms = list(symptoms)
+        self.min_coverage = min_coverage
+        self.min_clause_tokens = min_clause_tokens
+        self._trie = {}
+        for index, symptom in enumerate(self.symptoms):
+            if symptom in SKIP_SYMPTOMS:
+                continue
+            name = re.sub(r"\(.*?\)", " ", symptom).replace("_", " ")
+            for phrase in [name] + synonyms.get(symptom, []):
+                self._add_phrase(_tokenize(phrase), index)
+
+    def _add_phrase(self, tokens, index):
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(None, set()).add(index)
+
+    def _longest_match(self, tokens, start):
+        node = self._trie
+        match, end = None, start
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if None in node:
+                match, end = node[None], position + 1
+        return match, end
+
+    def extract(self, text):
+        tokens = _tokenize(text or "")
+        present, negated = set(), set()
+        clauses_total = clauses_matched = 0
+        clause_length, clause_has_match = 0, False
+        negation_left = 0
+        negation_used = False
+
+        position = 0
+        while position <= len(tokens):
+            token = tokens[position] if position < len(tokens) else "."
+            if token in _PUNCTUATION or token in SCOPE_TERMINATORS:
+                if clause_length >= self.min_clause_tokens:
+                    clauses_total += 1
+                    clauses_matched += clause_has_match
+                clause_length, clause_has_match = 0, False
+                negation_left = 0
+                position += 1
+                continue
+
+            match, end = self._longest_match(tokens, position)
+            if match:
+                (negated if negation_left > 0 else present).update(match)
+                negation_used = negation_used or negation_left > 0
+                clause_has_match = True
+                clause_length += end - position
+                negation_left = max(0, negation_left - (end - position))
+                position = end
+                continue
+
+            if token in NEGATION_CUES:
+                negation_left, negation_used = MAX_NEGATION_SCOPE, False
+            elif token in SCOPE_RESETS and negation_used:
+                negation_left = 0
+            elif negation_left:
+                negation_left -= 1
+            clause_length += 1
+            position += 1
+
+        present -= negated
+        coverage = clauses_matched / clauses_total if clauses_total else 0.0
+        names = [self.symptoms[i] for i in sorted(present)]
+        return ExtractionResult(
+            vector=[1 if i in present else 0 for i in range(len(self.symptoms))],
+            present=names,
+            negated=[self.symptoms[i] for i in sorted(negated)],
+            coverage=coverage,
+            confident=bool(names) and coverage >= self.min_coverage,
+        )
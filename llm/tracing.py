@@ -0,0 +1,276 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JSONL_PATH = "data/cache/traces.jsonl"
+METRICS_PORT = 9464
+
+_current = contextvars.ContextVar("ai4health_span", default=None)
+
+
+class _NoopSpan:
+    """Returned by a disabled tracer: every method does nothing."""
+
+    def set(self, **attrs):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed operation. Used as a context manager it becomes the parent
+    of spans opened inside it (also in executor threads, see
+    PipelineTimer.submit); otherwise call finish() when done.
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start", "attrs", "_token", "_done")
+
+    def __init__(self, tracer, name, parent, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.perf_counter()
+        self.attrs = attrs
+        self._token = None
+        self._done = False
+
+    def set(self, **attrs):
+        """Attach attributes, e.g. prompt_tokens=..., cache_hit=True."""
+        self.attrs.update(attrs)
+
+    def finish(self, error=None):
+        if not self._done:
+            self._done = True
+            self.tracer._finish(self, time.perf_counter(), error)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.finish(exc)
+        return False
+
+
+class _SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.errors = {}
+        self.tokens = {}
+        self.cache_hits = 0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    """
+    Spans and aggregated metrics for the diagnosis pipeline.
+
+    Each finished span updates in-memory counters (duration histogram,
+    errors by exception class, token counts, cache hits) exposed as
+    Prometheus text by metrics_text(), and is optionally appended to a
+    JSONL file. A disabled tracer hands out a shared no-op span, so
+    instrumented code costs one attribute check per call.
+    """
+
+    def __init__(self, enabled=False, jsonl_path=None):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self._stats = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._sink = None
+        self._server = None
+
+    def span(self, name, parent=None, **attrs):
+        """A new span, child of `parent` or of the span currently open in this context."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, parent if parent is not None else _current.get(), attrs)
+
+    def traced(self, name):
+        """Decorator: run the function inside a span called `name`."""
+        def decorate(fn):
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            wrapper.__wrapped__ = fn
+            return wrapper
+        return decorate
+
+    def record_error(self, name, error):
+        """Count a failure of `name` that has no span of its own (e.g. a stage that was given up on)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _SpanStats()
+            error_class = type(error).__name__
+            stats.errors[error_class] = stats.errors.get(error_class, 0) + 1
+
+    def add_collector(self, name, stats):
+        """Export `stats()` (a dict of numbers, e.g. a cache's stats) as gauges at scrape time."""
+        self._collectors[name] = stats
+
+    def _finish(self, span, end, error):
+        duration = end - span.start
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = self._stats[span.name] = _SpanStats()
+            stats.count += 1
+            stats.total += duration
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            if error is not None:
+                error_class = type(error).__name__
+                stats.errors[error_class] = stats.errors.get(error_class, 0) + 1
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if span.attrs.get(kind):
+                    stats.tokens[kind] = stats.tokens.get(kind, 0) + span.attrs[kind]
+            if span.attrs.get("cache_hit"):
+                stats.cache_hits += 1
+        if self.jsonl_path:
+            self._write({
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "start": time.time() - (time.perf_counter() - span.start),
+                "duration_ms": duration * 1000,
+                "error": type(error).__name__ if error is not None else None,
+                "attrs": span.attrs,
+            })
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock:
+                if self._sink is None:
+                    os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                    self._sink = open(self.jsonl_path, "a", buffering=1)
+                self._sink.write(line)
+        except OSError as e:
+            print(f"Error writing trace: {str(e)}")
+
+    def metrics_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stats = {name: (s.count, s.total, list(s.buckets), dict(s.errors), dict(s.tokens), s.cache_hits)
+                     for name, s in self._stats.items()}
+        lines = [
+            "# HELP ai4health_span_duration_seconds Duration of traced pipeline operations.",
+            "# TYPE ai4health_span_duration_seconds histogram",
+        ]
+        for name, (count, total, buckets, _, _, _) in stats.items():
+            label = f'span="{_escape(name)}"'
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'ai4health_span_duration_seconds_bucket{{{label},le="{bound}"}} {n}')
+            lines.append(f'ai4health_span_duration_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"ai4health_span_duration_seconds_sum{{{label}}} {total}")
+            lines.append(f"ai4health_span_duration_seconds_count{{{label}}} {count}")
+        lines += ["# HELP ai4health_span_errors_total Failed operations by exception class.",
+                  "# TYPE ai4health_span_errors_total counter"]
+        for name, (_, _, _, errors, _, _) in stats.items():
+            for error_class, n in errors.items():
+                lines.append(f'ai4health_span_errors_total{{span="{_escape(name)}",error="{error_class}"}} {n}')
+        lines += ["# HELP ai4health_tokens_total Estimated LLM tokens sent and received.",
+                  "# TYPE ai4health_tokens_total counter"]
+        for name, (_, _, _, _, tokens, _) in stats.items():
+            for kind, n in tokens.items():
+                lines.append(f'ai4health_tokens_total{{span="{_escape(name)}",kind="{kind[:-7]}"}} {n}')
+        lines += ["# HELP ai4health_span_cache_hits_total Operations answered from a cache.",
+                  "# TYPE ai4health_span_cache_hits_total counter"]
+        for name, (_, _, _, _, _, hits) in stats.items():
+            lines.append(f'ai4health_span_cache_hits_total{{span="{_escape(name)}"}} {hits}')
+        for collector, collect in list(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Error collecting {collector} metrics: {str(e)}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    metric = f"ai4health_{collector}_{key}"
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=METRICS_PORT, host="0.0.0.0"):
+        """Serve metrics_text() at http://host:port/metrics from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.metrics_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # Another worker process already serves this port
+            print(f"Error starting metrics endpoint on port {port}: {str(e)}")
+            return None
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return self._server
+
+
+def tracer_from_env():
+    """
+    Tracer configured by TRACING: unset/off (disabled), "jsonl",
+    "prometheus" or "jsonl,prometheus". TRACING_JSONL_PATH and
+    TRACING_PORT override the defaults.
+    """
+    modes = {m.strip() for m in os.getenv("TRACING", "").lower().split(",") if m.strip()} - {"off"}
+    if not modes:
+        return Tracer(enabled=False)
+    tracer = Tracer(
+        enabled=True,
+        jsonl_path=os.getenv("TRACING_JSONL_PATH", JSONL_PATH) if "jsonl" in modes else None,
+    )
+    if "prometheus" in modes:
+        tracer.serve(int(os.getenv("TRACING_PORT", METRICS_PORT)))
+    return tracer
+
+
+# Singleton instance used across the app
+tracer = tracer_from_env()
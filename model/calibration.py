@@ -0,0 +1,73 @@
+import numpy as np
+
+# Forest probabilities are often exactly 0; clip before taking logs
+EPS = 1e-6
+
+# Search range for the temperature (below 1 sharpens, above 1 flattens)
+TEMPERATURE_BOUNDS = (0.05, 20.0)
+
+
+def apply_temperature(probabilities, temperature=1.0):
+    """
+    Rescale class probabilities (rows sum to 1) by a temperature:
+    p ** (1 / T), renormalized. Monotone per row, so the argmax and the
+    ranking of classes never change.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    if temperature == 1.0:
+        return probabilities
+    logits = np.log(np.clip(probabilities, EPS, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def log_loss(probabilities, y_index):
+    """Mean negative log-likelihood of the true classes (indices into the columns)."""
+    picked = np.asarray(probabilities)[np.arange(len(y_index)), y_index]
+    return float(-np.log(np.clip(picked, EPS, 1.0)).mean())
+
+
+def expected_calibration_error(probabilities, y_index, n_bins=10):
+    """Gap between top-class confidence and accuracy, averaged over confidence bins."""
+    probabilities = np.asarray(probabilities)
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == y_index
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    ece = 0.0
+    for b in np.unique(bins):
+        in_bin = bins == b
+        ece += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return float(ece)
+
+
+def fit_temperature(probabilities, y_index, bounds=TEMPERATURE_BOUNDS):
+    """Temperature minimizing the log loss of held-out probabilities."""
+    from scipy.optimize import minimize_scalar
+
+    result = minimize_scalar(
+        lambda log_t: log_loss(apply_temperature(probabilities, np.exp(log_t)), y_index),
+        bounds=np.log(bounds), method="bounded",
+    )
+    return float(np.exp(result.x))
+
+
+def out_of_fold_proba(params, X, y, folds, classes, n_jobs=-1):
+    """
+    Probabilities for the rows of each fold from a forest trained on the
+    other folds (see model.search.cached_folds), columns in `classes`
+    order. Rows outside every fold are left out. Returns (rows, probabilities).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = np.asarray(X), np.asarray(y)
+    rows = np.concatenate([test for _, test in folds])
+    probabilities = np.zeros((len(rows), len(classes)))
+    column_of = {c: i for i, c in enumerate(classes)}
+    offset = 0
+    for train, test in folds:
+        model = RandomForestClassifier(n_jobs=n_jobs, **params).fit(X[train], y[train])
+        columns = [column_of[c] for c in model.classes_]
+        probabilities[offset:offset + len(test), columns] = model.predict_proba(X[test])
+        offset += len(test)
+    return rows, probabilities
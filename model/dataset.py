@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Paths
+BIN_DIR = "data/bin"
+LABEL_COLUMN = "prognosis"
+FORMAT_VERSION = 2
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_hash(X, y):
+    """SHA-256 of a loaded feature matrix and its labels (what a model was actually trained on)."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.uint8).tobytes())
+    digest.update("\0".join(map(str, y)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _source_stamp(source_path):
+    st = os.stat(source_path)
+    return {"path": source_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": file_hash(source_path)}
+
+
+def _write_schema(path, schema):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f)
+    os.replace(tmp_path, path)
+
+
+def _paths(source_path, bin_dir):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    base = os.path.join(bin_dir, name)
+    return {
+        "features": f"{base}.features.npy",
+        "labels": f"{base}.labels.npy",
+        "schema": f"{base}.schema.json",
+    }
+
+
+def read_table(source_path):
+    """A training table as a DataFrame: CSV by extension, otherwise an Excel workbook."""
+    import pandas as pd
+
+    if source_path.endswith(".csv"):
+        return pd.read_csv(source_path)
+    return pd.read_excel(source_path)
+
+
+def build_dataset(source_path, bin_dir=BIN_DIR):
+    """
+    Convert a training table (xlsx or csv) into the binary format:
+    a uint8 feature matrix and an int16 label-code array saved as .npy,
+    plus a JSON schema sidecar with feature order, class list and the
+    source file stamp used for staleness checks.
+    """
+    df = read_table(source_path)
+    stamp = _source_stamp(source_path)
+    feature_columns = df.columns.drop(LABEL_COLUMN).tolist()
+
+    features = df[feature_columns].to_numpy()
+    if not np.isin(features, (0, 1)).all():
+        raise ValueError(f"{source_path}: feature values must be 0 or 1")
+    classes, codes = np.unique(df[LABEL_COLUMN].astype(str).to_numpy(), return_inverse=True)
+
+    schema = {
+        "format_version": FORMAT_VERSION,
+        "source": stamp,
+        "n_rows": int(len(df)),
+        "feature_columns": feature_columns,
+        "classes": classes.tolist(),
+    }
+
+    paths = _paths(source_path, bin_dir)
+    os.makedirs(bin_dir, exist_ok=True)
+    # Write arrays first and the schema last, each via rename, so readers
+    # never see a schema that points at half-written arrays.
+    for key, array in (("features", features.astype(np.uint8)), ("labels", codes.astype(np.int16))):
+        tmp_path = f"{paths[key]}.tmp.npy"
+        np.save(tmp_path, array)
+        os.replace(tmp_path, paths[key])
+    _write_schema(paths["schema"], schema)
+    return schema
+
+
+def is_stale(source_path, bin_dir=BIN_DIR):
+    """
+    True if the binary copy is missing or was built from different content.
+    An unchanged size and mtime is trusted; otherwise the file is hashed, and
+    a copy (or re-save) with identical content just gets its stamp refreshed.
+    """
+    paths = _paths(source_path, bin_dir)
+    try:
+        with open(paths["schema"]) as f:
+            schema = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return True
+    if schema.get("format_version") != FORMAT_VERSION:
+        return True
+    st = os.stat(source_path)
+    if schema["source"].get("size") == st.st_size and schema["source"].get("mtime_ns") == st.st_mtime_ns:
+        return False
+    stamp = _source_stamp(source_path)
+    if schema["source"].get("sha256") != stamp["sha256"]:
+        return True
+    schema["source"] = stamp
+    _write_schema(paths["schema"], schema)
+    return False
+
+
+def load_schema(source_path, bin_dir=BIN_DIR):
+    """Return the schema sidecar for `source_path`, rebuilding it if stale."""
+    if is_stale(source_path, bin_dir):
+        return build_dataset(source_path, bin_dir)
+    with open(_paths(source_path, bin_dir)["schema"]) as f:
+        return json.load(f)
+
+
+def load_dataset(source_path, bin_dir=BIN_DIR):
+    """
+    Load a training table through its binary copy.
+    Returns:
+        (X, y, schema): X is a read-only memory-mapped uint8 matrix,
+        y the label strings, schema the sidecar dict.
+    """
+    schema = load_schema(source_path, bin_dir)
+    paths = _paths(source_path, bin_dir)
+    X = np.load(paths["features"], mmap_mode="r")
+    codes = np.load(paths["labels"], mmap_mode="r")
+    y = np.asarray(schema["classes"], dtype=object)[codes]
+    return X, y, schema
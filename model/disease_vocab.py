@@ -0,0 +1,177 @@
+import re
+
+import numpy as np
+
+from model.fuzzy_index import MIN_SCORE, FuzzyIndex, normalize
+
+# Everyday and alternative names -> model label (as in rf_model.classes_, stripped)
+DISEASE_ALIASES = {
+    "vertigo": "(vertigo) Paroymsal  Positional Vertigo",
+    "bppv": "(vertigo) Paroymsal  Positional Vertigo",
+    "benign paroxysmal positional vertigo": "(vertigo) Paroymsal  Positional Vertigo",
+    "hiv": "AIDS",
+    "pimples": "Acne",
+    "cervical spondylitis": "Cervical spondylosis",
+    "chickenpox": "Chicken pox",
+    "varicella": "Chicken pox",
+    "cholestasis": "Chronic cholestasis",
+    "cold": "Common Cold",
+    "pink eye": "Conjunctivitis",
+    "dengue fever": "Dengue",
+    "tooth decay": "Dental caries",
+    "cavities": "Dental caries",
+    "diabetes mellitus": "Diabetes",
+    "piles": "Dimorphic hemmorhoids(piles)",
+    "hemorrhoids": "Dimorphic hemmorhoids(piles)",
+    "haemorrhoids": "Dimorphic hemmorhoids(piles)",
+    "allergic drug reaction": "Drug Reaction",
+    "ringworm": "Fungal infection",
+    "tinea": "Fungal infection",
+    "acid reflux": "GERD",
+    "gastroesophageal reflux disease": "GERD",
+    "stomach flu": "Gastroenteritis",
+    "myocardial infarction": "Heart attack",
+    "shingles": "Herpes zoster ophthalmicus",
+    "herpes zoster": "Herpes zoster ophthalmicus",
+    "high blood pressure": "Hypertension",
+    "overactive thyroid": "Hyperthyroidism",
+    "low blood sugar": "Hypoglycemia",
+    "underactive thyroid": "Hypothyroidism",
+    "osteoarthritis": "Osteoarthristis",
+    "stroke": "Paralysis (brain hemorrhage)",
+    "brain hemorrhage": "Paralysis (brain hemorrhage)",
+    "peptic ulcer disease": "Peptic ulcer diseae",
+    "stomach ulcer": "Peptic ulcer diseae",
+    "tb": "Tuberculosis",
+    "typhoid fever": "Typhoid",
+    "uti": "Urinary tract infection",
+    "bladder infection": "Urinary tract infection",
+    "hepatitis a": "hepatitis A",
+}
+
+# Labels that are really another label (noise in the training data)
+LABEL_CANONICAL = {
+    "Based on the image showing what appears to be a cataract": "Cataract",
+}
+
+# Splits a raw model answer into items: newlines, semicolons, commas outside
+# parentheses, 'quoted' 'items', and "1. a 2. b" run together on one line
+_ITEM_SPLIT = re.compile(r"\n|;|,(?![^()]*\))|(?<=['\"])\s+(?=['\"])|\s+(?=\d{1,2}[.)]\s)")
+_ITEM_PREFIX = re.compile(r"^\s*(?:[-*•]+|\(?\d{1,2}[.)])\s*")
+_ITEM_DETAIL = re.compile(r"\s+(?:-|–|—)\s+.*$|:\s+.*$")
+_MARKUP = re.compile(r"[*_`\"']+")
+
+
+def clean_name(text):
+    """A disease name without list numbering, bullets, markdown, quotes or trailing detail."""
+    text = _ITEM_PREFIX.sub("", _MARKUP.sub("", str(text)))
+    text = _ITEM_DETAIL.sub("", text)
+    return " ".join(text.split()).strip(" .,:")
+
+
+def parse_disease_list(raw):
+    """
+    Disease names from a model's free-text answer ("1. Cataract\n2. Uveitis",
+    "'1. Acne vulgaris' '2. Rosacea'", "Cataract, Glaucoma", ...) or an
+    already split list. Header lines ("Possible conditions:") and duplicates
+    are dropped.
+    """
+    items = _ITEM_SPLIT.split(raw) if isinstance(raw, str) else list(raw)
+    names, seen = [], set()
+    for item in items:
+        item = str(item)
+        if item.strip().endswith(":"):
+            continue
+        name = clean_name(item)
+        key = normalize(name)
+        if key and key not in seen:
+            seen.add(key)
+            names.append(name)
+    return names
+
+
+class DiseaseVocabulary:
+    """
+    Canonical disease names built once from the model's labels.
+
+    Matching goes through `index`, a FuzzyIndex over the labels and their
+    aliases (the same trigram engine, Dice score and MIN_SCORE threshold
+    as doctor search's city and specialty lookups). On top of it this adds
+    cleaning of free-text names, noisy training labels that stand for
+    another label, and batch reconciliation against a prediction.
+    """
+
+    def __init__(self, labels, aliases=DISEASE_ALIASES, canonical=LABEL_CANONICAL):
+        stripped = {label.strip(): label for label in labels}
+        self.labels = [label for key, label in stripped.items() if canonical.get(key) not in stripped]
+        label_of_key = {label.strip(): label for label in self.labels}
+        # Training labels that stand for another one resolve to it
+        self._label_of = {label: label_of_key[canonical[label.strip()]]
+                          for label in labels if canonical.get(label.strip()) in label_of_key}
+        self._label_of.update({label: label for label in self.labels})
+
+        names = {clean_name(label): label for label in self.labels}
+        names.update({alias: label_of_key[name.strip()] for alias, name in aliases.items()
+                      if name.strip() in label_of_key})
+        names.update({clean_name(label): label_of_key[name] for label, name in canonical.items()
+                      if name in label_of_key})
+        self.index = FuzzyIndex(self.labels, names)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def label_of(self, label):
+        """Canonical label for one of the model's own labels."""
+        return self._label_of.get(label, label)
+
+    def scores(self, names):
+        """(len(names), len(labels)) similarity scores; 1.0 for exact or alias matches."""
+        return self.index.scores([clean_name(name) for name in names])
+
+    def match(self, names, limit=3, min_score=MIN_SCORE):
+        """For each name, [(label, score)] best first."""
+        if not names:
+            return []
+        scores = self.scores(names)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :limit]
+        return [
+            [(self.labels[j], float(scores[i, j])) for j in order[i] if scores[i, j] >= min_score]
+            for i in range(len(names))
+        ]
+
+    def canonical(self, name, min_score=MIN_SCORE):
+        """Canonical label for one of the model's labels or a free-text name, or None."""
+        if name in self._label_of:
+            return self._label_of[name]
+        return self.resolve(name, min_score)
+
+    def resolve(self, name, min_score=MIN_SCORE):
+        """The label `name` refers to, or None."""
+        matches = self.match([name], limit=1, min_score=min_score)[0]
+        return matches[0][0] if matches else None
+
+    def reconcile(self, predicted, names, min_score=MIN_SCORE):
+        """
+        Compare a predicted label with free-text names, all in one scoring
+        pass. Returns (confirmed, matches) where matches is
+        [(name, label or None, score)] in input order. The prediction is
+        confirmed if a name scores `min_score` against its label.
+        """
+        if not names:
+            return False, []
+        target = self.label_of(predicted)
+        if target not in self._label_of:
+            target = self.resolve(predicted) or predicted
+        scores = self.scores(names)
+        best = scores.argmax(axis=1)
+        target_id = self.labels.index(target) if target in self._label_of else None
+
+        matches = []
+        confirmed = False
+        for i, name in enumerate(names):
+            score = float(scores[i, best[i]])
+            label = self.labels[best[i]] if score >= min_score else None
+            matches.append((name, label, score))
+            if target_id is not None and scores[i, target_id] >= min_score:
+                confirmed = True
+        return confirmed, matches
@@ -0,0 +1,132 @@
+import hashlib
+
+import numpy as np
+
+FLAT_MODEL_PATH = "model/rf_model.flat.npz"
+
+
+class FlatForest:
+    """
+    A trained RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees share one node table; `roots` holds the index of each tree's
+    root. Leaves point to themselves, so every tree can be advanced one
+    level per step without tracking which ones are already finished.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes, fingerprint=""):
+        self.feature = feature        # (n_nodes,) int32, 0 for leaves
+        self.threshold = threshold    # (n_nodes,) float64, +inf for leaves
+        self.children = children      # (n_nodes, 2) int32, [left, right]
+        self.value = value            # (n_nodes, n_classes) float64, per-tree class fractions
+        self.roots = roots            # (n_trees,) int32
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        # forest_fingerprint of the sklearn forest this was flattened from
+        self.fingerprint = str(fingerprint)
+        # Binary features split at thresholds in [0, 1): the feature value is the child index
+        internal = threshold != np.inf
+        self.binary = bool(((threshold[internal] >= 0) & (threshold[internal] < 1)).all())
+        self._children_flat = children.reshape(-1)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows = len(X)
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        if self.binary:
+            X = X.astype(np.intp, copy=False)
+        for depth in range(self.max_depth):
+            feature_values = X[rows, self.feature[nodes]]
+            if self.binary:
+                go_right = feature_values
+            else:
+                go_right = feature_values > self.threshold[nodes]
+            next_nodes = self._children_flat[2 * nodes + go_right]
+            if depth % 8 == 7 and (next_nodes == nodes).all():
+                break
+            nodes = next_nodes
+        return nodes
+
+    def predict_proba(self, X, chunk_size=256):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        out = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            out[start:start + chunk_size] = self.value[leaves].mean(axis=1)
+        return out
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, path=FLAT_MODEL_PATH):
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, children=self.children,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            classes=np.asarray(self.classes_).astype(str), fingerprint=self.fingerprint,
+        )
+
+    @classmethod
+    def load(cls, path=FLAT_MODEL_PATH):
+        with np.load(path) as data:
+            return cls(
+                data["feature"], data["threshold"], data["children"], data["value"],
+                data["roots"], data["max_depth"], data["classes"],
+                data["fingerprint"] if "fingerprint" in data.files else "",
+            )
+
+
+def forest_fingerprint(rf_model):
+    """
+    Digest of a fitted forest's classes, per-tree node counts and split
+    thresholds: enough to tell whether a saved FlatForest was flattened
+    from this forest, without flattening it again.
+    """
+    digest = hashlib.sha256(np.asarray(rf_model.classes_).astype(str).tobytes())
+    digest.update(np.asarray([e.tree_.node_count for e in rf_model.estimators_], dtype=np.int64).tobytes())
+    for estimator in rf_model.estimators_:
+        digest.update(estimator.tree_.threshold.tobytes())
+    return digest.hexdigest()
+
+
+def export_forest(rf_model):
+    """Flatten a fitted single-output RandomForestClassifier into a FlatForest."""
+    if getattr(rf_model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be flattened")
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(offset, offset + n, dtype=np.int32)
+
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+        value = tree.value[:, 0, :].astype(np.float64)
+        value /= value.sum(axis=1, keepdims=True)
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(np.stack([left, right], axis=1).astype(np.int32))
+        values.append(value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return FlatForest(
+        np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+        np.concatenate(values), np.asarray(roots, dtype=np.int32), max_depth,
+        np.asarray(rf_model.classes_), forest_fingerprint(rf_model),
+    )
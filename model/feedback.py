@@ -0,0 +1,277 @@
+import atexit
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+# Paths
+TRAIN_PATH = "data/train_data.xlsx"
+FEEDBACK_LOG_PATH = "data/feedback_log.csv"
+FEEDBACK_ARCHIVE_DIR = "data/feedback_archive"
+# Single-file archive written by earlier versions; becomes the first segment
+LEGACY_ARCHIVE_PATH = "data/feedback_archive.csv"
+# Compacted tables are written here as <source name>.compacted.csv
+COMPACTED_DIR = "data"
+
+
+def _lock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _open_log_locked(path):
+    """
+    Open `path` for appending and take an exclusive lock on it.
+    Retries if the file was rotated by compaction between open and lock,
+    so rows are never appended to a segment that is already being folded.
+    """
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _lock(fd)
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+class FeedbackLog:
+    """
+    Buffered, append-only sink for labelled symptom vectors.
+
+    `record` only appends to an in-memory buffer; a background thread
+    flushes the buffer to a headerless CSV log every `flush_interval`
+    seconds (or as soon as `max_buffer` rows are waiting). Each flush is a
+    single locked append, so several processes can share the same log.
+    """
+
+    def __init__(self, path=FEEDBACK_LOG_PATH, flush_interval=2.0, max_buffer=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def record(self, symptom_array, disease):
+        """Queue one row: the binary symptom vector followed by its label."""
+        row = [int(x) for x in symptom_array] + [str(disease)]
+        with self._lock:
+            self._buffer.append(row)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="feedback-log", daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.max_buffer:
+                self._wakeup.set()
+
+    def flush(self):
+        """Write all buffered rows to the log. Returns the number of rows written."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        data = out.getvalue().encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = _open_log_locked(self.path)
+            try:
+                _write_all(fd, data)
+            finally:
+                os.close(fd)
+        except OSError:
+            # Keep the rows for the next attempt instead of dropping them
+            with self._lock:
+                self._buffer[:0] = rows
+            raise
+        return len(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def close(self):
+        """Stop the background thread and flush whatever is left."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing feedback log: {str(e)}")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _archive_segments(archive_dir):
+    """Archived feedback segments, oldest first."""
+    try:
+        names = sorted(n for n in os.listdir(archive_dir) if n.endswith(".csv"))
+    except FileNotFoundError:
+        return []
+    return names
+
+
+def _archive(segment_path, archive_dir):
+    """Move a rotated log segment into the archive (one rename, so it is never archived twice)."""
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"{time.time_ns():020d}-{os.getpid()}.csv"
+    os.replace(segment_path, os.path.join(archive_dir, name))
+
+
+def compacted_path(train_path, compacted_dir=COMPACTED_DIR):
+    """Where the compacted table for the training table `train_path` is written."""
+    name = os.path.splitext(os.path.basename(train_path))[0]
+    return os.path.join(compacted_dir, f"{name}.compacted.csv")
+
+
+def _source_stamp(train_path):
+    from model.dataset import file_hash
+
+    return {"path": os.path.abspath(train_path), "size": os.path.getsize(train_path),
+            "sha256": file_hash(train_path)}
+
+
+def _rebuild_compacted(train_path, archive_dir, segments, out_path):
+    """
+    Write workbook rows + archived feedback rows to `out_path` (via a temp
+    file and rename). Feedback rows identical to an earlier row, features
+    and label, are dropped; earlier rows never change, so the table only
+    grows at the end as segments are added.
+    """
+    import pandas as pd
+
+    from model.dataset import read_table
+
+    train_df = read_table(train_path)
+    frames = [train_df]
+    for name in segments:
+        path = os.path.join(archive_dir, name)
+        if not os.path.getsize(path):
+            continue
+        feedback_df = pd.read_csv(path, header=None)
+        if feedback_df.shape[1] != train_df.shape[1]:
+            raise ValueError(
+                f"Feedback rows in {path} have {feedback_df.shape[1]} columns, expected {train_df.shape[1]}"
+            )
+        feedback_df.columns = train_df.columns
+        frames.append(feedback_df)
+    table = pd.concat(frames, ignore_index=True)
+    table[table.columns[-1]] = table[table.columns[-1]].astype(str)
+    is_feedback = np.arange(len(table)) >= len(train_df)
+    duplicates = table.duplicated() & is_feedback
+    table = table[~duplicates]
+
+    tmp_path = f"{out_path}.tmp"
+    table.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+    return int(is_feedback.sum() - duplicates.sum()), int(duplicates.sum())
+
+
+def compact_feedback(train_path=TRAIN_PATH, log_path=FEEDBACK_LOG_PATH,
+                     archive_dir=FEEDBACK_ARCHIVE_DIR, out_path=None):
+    """
+    Fold the live feedback log into a single CSV training table.
+
+    The live log is rotated out and moved into the archive directory as a
+    new segment. The table (workbook rows + every archived segment, with
+    repeated feedback rows dropped) is rewritten and replaced whenever its
+    manifest shows the training table (by path, size and content hash) or
+    the segments changed. Every step is a rename or a rebuild from the
+    archive, so a compaction interrupted at any point is finished by the
+    next one without duplicating rows. `train_path` may be a workbook or a
+    CSV; `out_path` defaults to compacted_path(train_path).
+    Returns `out_path`.
+    """
+    out_path = out_path or compacted_path(train_path)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    lock_fd = os.open(f"{out_path}.lock", os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        _lock(lock_fd)
+
+        if os.path.exists(LEGACY_ARCHIVE_PATH) and archive_dir == FEEDBACK_ARCHIVE_DIR:
+            os.makedirs(archive_dir, exist_ok=True)
+            os.replace(LEGACY_ARCHIVE_PATH, os.path.join(archive_dir, f"{0:020d}-legacy.csv"))
+        # A segment left behind by an interrupted compaction goes first
+        pending_path = f"{log_path}.compacting"
+        if os.path.exists(pending_path):
+            _archive(pending_path, archive_dir)
+        # Rotate the live log; writers that opened it before the rename
+        # notice the inode change and reopen a fresh log
+        if os.path.exists(log_path):
+            os.replace(log_path, pending_path)
+            fd = os.open(pending_path, os.O_RDONLY)
+            try:
+                _lock(fd)  # wait for an in-flight append to finish
+            finally:
+                os.close(fd)
+            _archive(pending_path, archive_dir)
+
+        segments = _archive_segments(archive_dir)
+        manifest_path = f"{out_path}.json"
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        source = _source_stamp(train_path)
+        fresh = (
+            os.path.exists(out_path)
+            and manifest.get("source") == source
+            and manifest.get("segments") == segments
+            and manifest.get("out_size") == os.path.getsize(out_path)
+        )
+        if not fresh:
+            added, dropped = _rebuild_compacted(train_path, archive_dir, segments, out_path)
+            _write_json(manifest_path, {
+                "source": source,
+                "segments": segments,
+                "out_size": os.path.getsize(out_path),
+                "feedback_rows": added,
+                "duplicates_dropped": dropped,
+            })
+    finally:
+        os.close(lock_fd)
+    return out_path
+
+
+# Singleton instance used across the app
+feedback_log = FeedbackLog()
+atexit.register(feedback_log.close)
+
+
+def record_feedback(symptom_array, disease):
+    feedback_log.record(symptom_array, disease)
@@ -0,0 +1,91 @@
+import re
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Dice score at which a query is taken to name a string (a city, specialty or
+# disease label); search() can list looser candidates, e.g. as suggestions
+MIN_SCORE = 0.45
+
+
+def normalize(text):
+    """Lowercase, punctuation to spaces, whitespace collapsed."""
+    return " ".join(_NON_ALNUM.sub(" ", str(text).lower()).split())
+
+
+def trigrams(text):
+    """Distinct character trigrams of the normalized text, padded so short words still match."""
+    text = f"  {normalize(text)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant lookup over a small set of names (cities, specialties,
+    disease labels).
+
+    Every name, and every alias pointing at one, is broken into character
+    trigrams kept in an inverted index (trigram -> ids of the strings that
+    contain it). A query only visits the postings of its own trigrams, and
+    candidates are ranked by the Dice coefficient of the two trigram sets.
+    """
+
+    def __init__(self, names, aliases=None):
+        self.names = list(dict.fromkeys(names))
+        strings, targets = [], []
+        for i, name in enumerate(self.names):
+            strings.append(name)
+            targets.append(i)
+        for alias, name in (aliases or {}).items():
+            if name in self.names:
+                strings.append(alias)
+                targets.append(self.names.index(name))
+
+        self._targets = np.asarray(targets, dtype=np.int32)
+        self._exact = {}
+        postings = {}
+        sizes = []
+        for string_id, string in enumerate(strings):
+            self._exact.setdefault(normalize(string), targets[string_id])
+            grams = trigrams(string)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(string_id)
+        self._sizes = np.asarray(sizes, dtype=np.float64)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _scores(self, query):
+        """Score of `query` against every name, the best over its aliases."""
+        scores = np.zeros(len(self.names))
+        grams = trigrams(query)
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self._sizes))
+            # Best string per name (a name and its aliases compete for the same slot)
+            np.maximum.at(scores, self._targets, 2.0 * shared / (len(grams) + self._sizes))
+        exact = self._exact.get(normalize(query))
+        if exact is not None:
+            scores[exact] = 1.0
+        return scores
+
+    def scores(self, queries):
+        """(len(queries), len(names)) scores; 1.0 for an exact (normalized) match."""
+        if not queries:
+            return np.zeros((0, len(self.names)))
+        return np.stack([self._scores(query) for query in queries])
+
+    def search(self, query, limit=5, min_score=MIN_SCORE):
+        """[(name, score)] best first; score is 1.0 for an exact (normalized) match."""
+        scores = self._scores(query)
+        candidates = np.flatnonzero(scores >= min_score)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return [(self.names[i], float(scores[i])) for i in order]
+
+    def best(self, query, min_score=MIN_SCORE):
+        """The single best name for `query`, or None if nothing scores `min_score`."""
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0][0] if matches else None
@@ -0,0 +1,66 @@
+import numpy as np
+
+from model.dataset import dataset_hash
+
+
+class FullRetrainRequired(Exception):
+    """The new data can't be folded into the existing forest; run a full retrain."""
+
+
+def new_rows_since(metadata, X, y):
+    """
+    Index of the first row the model has not seen, checked against the
+    training-data hash in its metadata. The compacted training table only
+    ever grows by appending feedback rows, so the model's data must be an
+    exact prefix of the current table.
+    """
+    n_seen = metadata.get("n_train")
+    expected = metadata.get("data_hash", {}).get("train")
+    if n_seen is None or expected is None:
+        raise FullRetrainRequired("Model metadata has no training-data hash")
+    if n_seen > len(y) or dataset_hash(X[:n_seen], y[:n_seen]) != expected:
+        raise FullRetrainRequired("Training data changed beyond appended rows")
+    return n_seen
+
+
+def replay_sample(y, classes, per_class=5, seed=0):
+    """
+    Row ids of a small stratified sample: up to `per_class` rows of every
+    class. Fitting new trees on new rows plus this sample keeps every
+    class present, so the forest's class order (and its old trees) stay valid.
+    """
+    rng = np.random.default_rng(seed)
+    ids = []
+    for label in classes:
+        rows = np.flatnonzero(y == label)
+        if len(rows) == 0:
+            raise FullRetrainRequired(f"No rows left for class {label!r}")
+        ids.append(rng.choice(rows, size=min(per_class, len(rows)), replace=False))
+    return np.sort(np.concatenate(ids))
+
+
+def warm_update(model, X_new, y_new, X_replay, y_replay, n_trees=20, replace_oldest=False):
+    """
+    Grow a fitted RandomForestClassifier by `n_trees` trees fit on the new
+    rows plus a replay sample, using warm_start. With replace_oldest the
+    `n_trees` oldest trees are dropped first, so the forest keeps its size
+    and slides its window towards recent data. The model is modified in
+    place and returned.
+    """
+    classes = model.classes_
+    unknown = np.setdiff1d(np.unique(np.asarray(y_new, dtype=object).astype(str)), classes.astype(str))
+    if len(unknown):
+        raise FullRetrainRequired(f"New labels not in the model: {', '.join(unknown)}")
+
+    X_fit = np.vstack([np.asarray(X_replay), np.asarray(X_new)])
+    y_fit = np.concatenate([np.asarray(y_replay, dtype=object), np.asarray(y_new, dtype=object)])
+    if replace_oldest:
+        model.estimators_ = model.estimators_[n_trees:]
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    try:
+        model.fit(X_fit, y_fit)
+    finally:
+        model.set_params(warm_start=False)
+    if not np.array_equal(model.classes_, classes):
+        raise FullRetrainRequired("Class order changed during the update")
+    return model
@@ -1,19 +1,321 @@
-import joblib
+import itertools
+import json
 import os
+import threading
+import time
+
 import numpy as np
-import pandas as pd
 
-# Load model and training data
+from model.calibration import apply_temperature
+from model.prediction_cache import PredictionCache
+
+# Model artifacts (the feature schema is written next to the model by train_model.py)
 CURRENT_DIR = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(CURRENT_DIR, "rf_model.pkl")
+SCHEMA_PATH = os.path.join(CURRENT_DIR, "rf_model.json")
+FLAT_MODEL_PATH = os.path.join(CURRENT_DIR, "rf_model.flat.npz")
 DATA_PATH = "data/train_data.xlsx"
 
-try:
-    rf_model = joblib.load(MODEL_PATH)
-    train_df = pd.read_excel(DATA_PATH)
-    FEATURE_COLUMNS = train_df.drop(columns=["prognosis"]).columns.tolist()
-except Exception as e:
-    raise ImportError(f"Failed to load model or data: {str(e)}")
+
+# Distinguishes states built from the same file (e.g. swapped in after an update)
+_generations = itertools.count()
+
+
+class ModelState:
+    """Everything loaded from one version of rf_model.pkl, swapped as a unit."""
+
+    def __init__(self, model, feature_columns, flat_forest, file_version, temperature=1.0):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.flat_forest = flat_forest
+        # What was on disk when this state was built (compared by reload_if_changed)
+        self.file_version = file_version
+        # Unique per state; prediction cache entries belong to one version
+        self.version = (file_version, next(_generations))
+        # Probability calibration fitted by train_model.py --calibrate (1.0: none)
+        self.temperature = temperature
+
+
+class Predictor:
+    """
+    Random Forest disease predictor.
+    Nothing is read from disk until the first prediction; the model and
+    its feature order are then loaded once per process, and reloaded when
+    rf_model.pkl changes on disk (checked at most every `check_interval`
+    seconds). Single-row class probabilities are memoized per model
+    version, so predict and predict_top_k share one forest pass.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, schema_path=SCHEMA_PATH, flat_model_path=FLAT_MODEL_PATH,
+                 check_interval=2.0, cache_size=4096, cache_ttl=3600):
+        self.model_path = model_path
+        self.schema_path = schema_path
+        self.flat_model_path = flat_model_path
+        self.check_interval = check_interval
+        self.cache = PredictionCache(maxsize=cache_size, ttl=cache_ttl)
+        self._state = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._schema = (None, None)
+
+    def _file_version(self):
+        st = os.stat(self.model_path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load_state(self):
+        try:
+            import joblib
+
+            version = self._file_version()
+            model = joblib.load(self.model_path)
+            return ModelState(model, self._load_feature_columns(model), self._load_flat_forest(model), version,
+                              self._load_temperature())
+        except Exception as e:
+            raise RuntimeError(f"Failed to load model or data: {str(e)}")
+
+    def load(self):
+        """Return the current ModelState, loading or reloading it if needed."""
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._load_state()
+                    self._next_check = time.monotonic() + self.check_interval
+                return self._state
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._state
+
+    def reload_if_changed(self):
+        """Reload the model if rf_model.pkl changed on disk. Returns True if it did."""
+        self._next_check = time.monotonic() + self.check_interval
+        try:
+            version = self._file_version()
+        except OSError:
+            return False
+        if self._state is not None and version == self._state.file_version:
+            return False
+        with self._lock:
+            if self._state is not None and version == self._state.file_version:
+                return False
+            try:
+                self._state = self._load_state()
+            except RuntimeError as e:
+                # Keep serving the previous model (e.g. the file is mid-write)
+                print(f"Error reloading model: {str(e)}")
+                return False
+        return True
+
+    def swap(self, model, feature_columns=None):
+        """
+        Serve `model` from now on, e.g. one just updated and saved in this
+        process, without waiting for the file check. In-flight predictions
+        finish on the state they started with; cached predictions of the
+        previous state are dropped even if the file on disk is unchanged.
+        """
+        from model.fast_forest import export_forest
+
+        if feature_columns is None:
+            feature_columns = self._load_feature_columns(model)
+        try:
+            version = self._file_version()
+        except OSError:
+            version = ("swapped", id(model))
+        state = ModelState(model, feature_columns, export_forest(model), version, self._load_temperature())
+        with self._lock:
+            self._state = state
+            self._next_check = time.monotonic() + self.check_interval
+
+    @property
+    def model(self):
+        return self.load().model
+
+    @property
+    def feature_columns(self):
+        return self.load().feature_columns
+
+    def class_labels(self):
+        """
+        Disease labels the model predicts. Read from the schema sidecar when
+        the model itself isn't loaded yet, so label lookups (e.g. doctor
+        search) don't pay for loading the forest.
+        """
+        if self._state is None:
+            classes = (self._read_schema() or {}).get("classes")
+            if classes:
+                return classes
+        return [str(c) for c in self.load().flat_forest.classes_]
+
+    def _read_schema(self):
+        """The parsed schema sidecar (None if missing), re-read only when the file changes."""
+        try:
+            st = os.stat(self.schema_path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached_key, schema = self._schema
+        if cached_key != key:
+            with open(self.schema_path) as f:
+                schema = json.load(f)
+            self._schema = (key, schema)
+        return schema
+
+    def _load_feature_columns(self, model):
+        schema = self._read_schema()
+        if schema is not None:
+            return schema["feature_columns"]
+        if hasattr(model, "feature_names_in_"):
+            return model.feature_names_in_.tolist()
+        # Model trained before the schema sidecar existed
+        from model.dataset import load_schema
+
+        return load_schema(DATA_PATH)["feature_columns"]
+
+    def _load_temperature(self):
+        schema = self._read_schema() or {}
+        return float(schema.get("calibration", {}).get("temperature", 1.0))
+
+    def _load_flat_forest(self, model):
+        from model.fast_forest import FlatForest, export_forest, forest_fingerprint
+
+        # File times don't prove the two files match (copied trees, a save
+        # that failed after the pkl); the fingerprint of the forest does
+        if os.path.exists(self.flat_model_path):
+            flat_forest = FlatForest.load(self.flat_model_path)
+            if flat_forest.fingerprint == forest_fingerprint(model):
+                return flat_forest
+            print(f"{self.flat_model_path} was built from another model; flattening {self.model_path} again")
+        return export_forest(model)
+
+    @staticmethod
+    def _as_matrix(rows, n_features, packed=False):
+        """Validate a batch in one NumPy pass and return it as a (n_rows, n_features) matrix."""
+        matrix = np.asarray(rows)
+        if packed:
+            if matrix.dtype != np.uint8:
+                raise ValueError("Packed input must be a uint8 bit matrix")
+            matrix = np.unpackbits(matrix, axis=-1, count=n_features)
+        if matrix.ndim != 2 or matrix.shape[1] != n_features:
+            raise ValueError(f"Expected {n_features} features per row, got shape {matrix.shape}")
+        # Unpacked bits are 0/1 by construction
+        if not packed and not ((matrix == 0) | (matrix == 1)).all():
+            raise ValueError("All values must be 0 or 1")
+        return matrix
+
+    def _row_proba(self, symptom_array):
+        """(state, calibrated class probabilities) for one symptom vector."""
+        if not isinstance(symptom_array, (list, np.ndarray)):
+            raise ValueError("Input must be a list or numpy array")
+
+        state = self.load()
+        if len(symptom_array) != len(state.feature_columns):
+            raise ValueError(f"Expected {len(state.feature_columns)} features, got {len(symptom_array)}")
+
+        input_array = self._as_matrix([symptom_array], len(state.feature_columns))
+        return state, self.cache.get_or_compute(input_array[0], state.version,
+                                                lambda: self._predict_row(state, input_array))
+
+    def predict(self, symptom_array):
+        state, probabilities = self._row_proba(symptom_array)
+        return state.model.classes_[probabilities.argmax()]
+
+    def predict_top_k(self, symptom_array, k=3):
+        """The `k` most likely labels for one symptom vector, as [(label, probability)], best first."""
+        state, probabilities = self._row_proba(symptom_array)
+        top = np.argsort(-probabilities, kind="stable")[:k]
+        return [(str(state.model.classes_[i]), float(probabilities[i])) for i in top]
+
+    @staticmethod
+    def _predict_row(state, input_array):
+        try:
+            # Single rows go through the flattened forest: same probabilities
+            # as rf_model.predict_proba without sklearn's per-call overhead
+            probabilities = state.flat_forest.predict_proba(input_array)
+            return apply_temperature(probabilities[0], state.temperature)
+        except Exception as e:
+            raise Exception(f"Prediction failed: {str(e)}")
+
+    def predict_proba_batch(self, rows, packed=False, chunk_size=1024, n_jobs=1):
+        """Calibrated class probabilities for every row, evaluated in chunks of `chunk_size` rows."""
+        return self._predict_proba_chunks(self.load(), rows, packed, chunk_size, n_jobs)
+
+    @classmethod
+    def _predict_proba_chunks(cls, state, rows, packed, chunk_size, n_jobs):
+        matrix = cls._as_matrix(rows, len(state.feature_columns), packed=packed)
+        chunks = [matrix[i:i + chunk_size] for i in range(0, len(matrix), chunk_size)]
+        if not chunks:
+            return np.empty((0, len(state.model.classes_)))
+        try:
+            if n_jobs == 1 or len(chunks) == 1:
+                parts = [state.model.predict_proba(chunk) for chunk in chunks]
+            else:
+                from joblib import Parallel, delayed
+
+                # Tree traversal releases the GIL, so threads avoid copying the forest
+                parts = Parallel(n_jobs=n_jobs, prefer="threads")(
+                    delayed(state.model.predict_proba)(chunk) for chunk in chunks
+                )
+        except Exception as e:
+            raise Exception(f"Prediction failed: {str(e)}")
+        return apply_temperature(np.vstack(parts), state.temperature)
+
+    def predict_batch(self, rows, top_k=3, packed=False, chunk_size=1024, n_jobs=1):
+        state = self.load()
+        probabilities = self._predict_proba_chunks(state, rows, packed, chunk_size, n_jobs)
+        classes = state.model.classes_
+        top_k = min(top_k, len(classes))
+        # argpartition + sort of k columns instead of a full argsort per row
+        top = np.argpartition(-probabilities, top_k - 1, axis=1)[:, :top_k]
+        top_probs = np.take_along_axis(probabilities, top, axis=1)
+        order = np.argsort(-top_probs, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+        labels = classes[probabilities.argmax(axis=1)]
+        return labels, classes[top], top_probs
+
+
+# Singleton instance used across the app
+predictor = Predictor()
+
+
+def __getattr__(name):
+    # Legacy module attributes, resolved lazily
+    if name == "rf_model":
+        return predictor.model
+    if name == "FEATURE_COLUMNS":
+        return predictor.feature_columns
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_disease_vocabulary():
+    """
+    DiseaseVocabulary over the model's labels, shared by doctor search and
+    prediction verification. Rebuilt when a reloaded model has new labels.
+    """
+    global _vocabulary
+    from model.disease_vocab import DiseaseVocabulary
+
+    labels = tuple(predictor.class_labels())
+    current = _vocabulary
+    if current is None or current[0] != labels:
+        with _vocabulary_lock:
+            if _vocabulary is None or _vocabulary[0] != labels:
+                _vocabulary = (labels, DiseaseVocabulary(labels))
+            current = _vocabulary
+    return current[1]
+
+
+def get_disease_index():
+    """
+    FuzzyIndex over the model's disease labels and their aliases, shared by
+    doctor search and prediction verification (the disease vocabulary's index).
+    """
+    return get_disease_vocabulary().index
+
 
 def predict_disease(symptom_array):
     """
@@ -23,18 +325,34 @@ def predict_disease(symptom_array):
     Returns:
         str: Predicted disease
     """
-    if not isinstance(symptom_array, (list, np.ndarray)):
-        raise ValueError("Input must be a list or numpy array")
-    
-    if len(symptom_array) != len(FEATURE_COLUMNS):
-        raise ValueError(f"Expected {len(FEATURE_COLUMNS)} features, got {len(symptom_array)}")
-    
-    if not all(x in [0, 1] for x in symptom_array):
-        raise ValueError("All values must be 0 or 1")
-    
-    try:
-        input_array = np.array(symptom_array).reshape(1, -1)
-        prediction = rf_model.predict(input_array)
-        return prediction[0]
-    except Exception as e:
-        raise Exception(f"Prediction failed: {str(e)}")
\ No newline at end of file
+    return predictor.predict(symptom_array)
+
+
+def predict_disease_top_k(symptom_array, k=3):
+    """
+    Most likely diseases for a binary symptom array, from one
+    predict_proba pass (calibrated if the model was trained with
+    --calibrate)
+    Args:
+        symptom_array: List of 0s and 1s corresponding to symptoms
+        k: Number of diseases to return
+    Returns:
+        list: [(disease, probability)], most likely first
+    """
+    return predictor.predict_top_k(symptom_array, k)
+
+
+def predict_disease_batch(symptom_matrix, top_k=3, packed=False, chunk_size=1024, n_jobs=1):
+    """
+    Predict diseases for many symptom vectors at once
+    Args:
+        symptom_matrix: 2-D array or list of lists of 0s and 1s, or a
+            np.packbits(..., axis=1) bit matrix when packed=True
+        top_k: Number of most likely classes to return per row
+        chunk_size: Rows per predict_proba call
+        n_jobs: Chunks evaluated in parallel (-1 for all cores)
+    Returns:
+        (labels, top_classes, top_probabilities): arrays of shape (n,), (n, k), (n, k)
+    """
+    return predictor.predict_batch(symptom_matrix, top_k=top_k, packed=packed,
+                                   chunk_size=chunk_size, n_jobs=n_jobs)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional per-entry TTL.
+    Keeps hit/miss/eviction/expiry counters for monitoring.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def pack_symptoms(symptom_array):
+    """Cache key for a 0/1 symptom vector: its bits packed into bytes."""
+    return np.packbits(np.asarray(symptom_array, dtype=np.uint8)).tobytes()
+
+
+class PredictionCache(LRUCache):
+    """
+    LRU/TTL cache of predictions keyed by packed symptom vector.
+    Entries belong to one model version; looking up with a different
+    version (the model file changed on disk) drops everything first.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.version = None
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    if self._data:
+                        self.invalidations += 1
+                    self._data.clear()
+                    self.version = version
+
+    def get_or_compute(self, symptom_array, version, compute):
+        self._check_version(version)
+        key = pack_symptoms(symptom_array)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if version == self.version:
+                self.put(key, value)
+        return value
+
+    def stats(self):
+        stats = super().stats()
+        stats["invalidations"] = self.invalidations
+        return stats
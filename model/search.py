@@ -0,0 +1,144 @@
+import itertools
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from model.fast_forest import export_forest
+
+CACHE_DIR = "data/cache"
+
+DEFAULT_GRID = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [None, 12, 24],
+    "min_samples_leaf": [1, 2, 4],
+}
+
+# Higher is better for the first, lower for the rest
+OBJECTIVES = [("f1_weighted", 1), ("model_bytes", -1), ("load_ms", -1), ("predict_p50_ms", -1)]
+
+
+def grid_configs(grid=DEFAULT_GRID):
+    """Every combination of the grid's values, as parameter dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def cached_folds(y, data_hash, n_splits=3, seed=42, cache_dir=CACHE_DIR):
+    """
+    Stratified (train, test) row ids, computed once per training-data hash
+    and stored under data/cache so every config and every later search
+    scores on the same splits.
+    """
+    path = os.path.join(cache_dir, f"folds-{data_hash[:16]}-{n_splits}-{seed}.npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            fold_of = cached["fold_of"]
+    else:
+        # Classes with fewer rows than folds can't be stratified; keep them in training
+        fold_of = np.full(len(y), -1, dtype=np.int8)
+        labels, counts = np.unique(y, return_counts=True)
+        eligible = np.flatnonzero(np.isin(y, labels[counts >= n_splits]))
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+        for fold, (_, test) in enumerate(splitter.split(eligible, y[eligible])):
+            fold_of[eligible[test]] = fold
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path[:-4]}.tmp.npz"
+        np.savez(tmp_path, fold_of=fold_of)
+        os.replace(tmp_path, path)
+    return [(np.flatnonzero(fold_of != fold), np.flatnonzero(fold_of == fold)) for fold in range(n_splits)]
+
+
+def _score_fold(params, X, y, train, test, seed):
+    model = RandomForestClassifier(n_jobs=1, random_state=seed, **params).fit(X[train], y[train])
+    preds = model.predict(X[test])
+    return accuracy_score(y[test], preds), f1_score(y[test], preds, average="weighted")
+
+
+def _latencies_ms(predict_proba, X, n_calls):
+    timings = np.empty(n_calls)
+    for i in range(n_calls):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        predict_proba(row)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def footprint(model, X_sample, n_calls=200, n_loads=3):
+    """What serving the model costs: pickled size, load time and single-row latency (flat forest path)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        model_bytes = os.path.getsize(path)
+        load_times = []
+        for _ in range(n_loads):
+            start = time.perf_counter()
+            joblib.load(path)
+            load_times.append(time.perf_counter() - start)
+
+        flat = export_forest(model)
+        flat_path = os.path.join(tmp, "model.flat.npz")
+        flat.save(flat_path)
+        flat_bytes = os.path.getsize(flat_path)
+    p50, p99 = _latencies_ms(flat.predict_proba, X_sample, n_calls)
+    return {
+        "model_bytes": model_bytes,
+        "flat_bytes": flat_bytes,
+        "load_ms": float(np.median(load_times) * 1000),
+        "predict_p50_ms": float(p50),
+        "predict_p99_ms": float(p99),
+        "n_nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+    }
+
+
+def pareto_front(results, objectives=OBJECTIVES):
+    """Indexes of results no other result beats on every objective (and strictly on one)."""
+    points = np.array([[sign * r[key] for key, sign in objectives] for r in results])
+    front = []
+    for i, point in enumerate(points):
+        dominated = ((points >= point).all(axis=1) & (points > point).any(axis=1)).any()
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def search(X, y, data_hash, grid=DEFAULT_GRID, n_splits=3, n_jobs=-1, seed=42, n_calls=200):
+    """
+    Cross-validate every grid config on cached folds (all (config, fold)
+    fits run in parallel, one core each), then refit each config on all rows
+    and measure its footprint one at a time so timings don't compete.
+    Returns one result dict per config, Pareto-optimal ones flagged.
+    """
+    X = np.asarray(X)
+    configs = grid_configs(grid)
+    folds = cached_folds(y, data_hash, n_splits, seed)
+    scores = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_score_fold)(params, X, y, train, test, seed)
+        for params in configs for train, test in folds
+    )
+
+    results = []
+    for i, params in enumerate(configs):
+        fold_scores = np.array(scores[i * n_splits:(i + 1) * n_splits])
+        start = time.perf_counter()
+        model = RandomForestClassifier(n_jobs=n_jobs, random_state=seed, **params).fit(X, y)
+        fit_s = time.perf_counter() - start
+        results.append({
+            "params": params,
+            "accuracy": float(fold_scores[:, 0].mean()),
+            "f1_weighted": float(fold_scores[:, 1].mean()),
+            "f1_std": float(fold_scores[:, 1].std()),
+            "fit_s": fit_s,
+            **footprint(model, X, n_calls),
+        })
+
+    front = set(pareto_front(results))
+    for i, result in enumerate(results):
+        result["pareto"] = i in front
+    return results
@@ -1,3 +1,48 @@
+"""
+Train the disease Random Forest and write it next to its metadata.
+
+Run from the repo root:
+    python model/train_model.py [--n-jobs -1] [--n-estimators 200] [--max-depth 12] [--min-samples-leaf 2] [--no-plots]
+    python model/train_model.py --feedback --update [--new-trees 20] [--replace-oldest]
+    python model/train_model.py --search [--grid-trees 25 50 100 200] [--folds 3]
+    python model/train_model.py --calibrate [--calibration-folds 3]
+
+--feedback adds the rows recorded by the chat path (labels checked only
+by the LLM, repeated rows dropped) to the workbook rows; without it only
+the workbook is used. Review data/feedback_archive/ before opting in.
+
+--update folds rows appended since the last run (feedback) into the saved
+forest by growing a few trees instead of retraining; a running app picks
+the new model up when rf_model.pkl changes.
+
+--search cross-validates a grid of tree count / depth / leaf size and
+reports each config's F1 next to its pickled size, load time and
+single-row latency (model/reports/search.json and search.csv), marking
+the Pareto-optimal ones. It does not write a model; train the chosen
+config with --n-estimators, --max-depth and --min-samples-leaf.
+
+--calibrate fits a temperature for the forest's class probabilities on
+out-of-fold predictions of the training rows and saves it in the
+metadata; the app applies it to the top-k probabilities it reports.
+--update keeps the saved temperature.
+
+Outputs (all written atomically):
+    model/rf_model.pkl         the fitted RandomForestClassifier
+    model/rf_model.json        metadata: feature order, classes, data hashes,
+                               parameters, metrics, calibration and stage timings
+    model/rf_model.flat.npz    flattened forest for fast inference
+    model/reports/             metrics.json, classification_report.txt,
+                               confusion_matrix.csv and PNG plots
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import (
@@ -5,54 +50,76 @@ from sklearn.metrics import (
     classification_report,
     f1_score,
     confusion_matrix,
-    ConfusionMatrixDisplay,
 )
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
-import os
+
+# Run as a script (`python model/train_model.py`), sys.path[0] is model/, where
+# model.py would shadow the package; importers keep their own sys.path
+if __name__ == "__main__":
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+from model.calibration import apply_temperature, expected_calibration_error, fit_temperature, log_loss, out_of_fold_proba
+from model.dataset import dataset_hash, load_dataset
+from model.fast_forest import export_forest
+from model.feedback import compact_feedback
+from model.incremental import FullRetrainRequired, new_rows_since, replay_sample, warm_update
+from model.search import DEFAULT_GRID, cached_folds, search
 
 # Paths
 TRAIN_PATH = "data/train_data.xlsx"
 TEST_PATH = "data/test_data.xlsx"
 MODEL_OUTPUT_PATH = "model/rf_model.pkl"
+FLAT_MODEL_OUTPUT_PATH = "model/rf_model.flat.npz"
+SCHEMA_OUTPUT_PATH = "model/rf_model.json"
+REPORTS_DIR = "model/reports"
+METADATA_VERSION = 1
 
-def load_data():
-    train_df = pd.read_excel(TRAIN_PATH)
-    test_df = pd.read_excel(TEST_PATH)
-    return train_df, test_df
 
-def train_and_save_model():
-    train_df, test_df = load_data()
+def load_data(train_path=TRAIN_PATH, test_path=TEST_PATH, include_feedback=False):
+    # Workbook rows (plus, if asked, the feedback rows recorded by the chat
+    # path), read through the memory-mapped binary copy (rebuilt only when
+    # the source content changes)
+    if include_feedback:
+        train_path = compact_feedback(train_path=train_path)
+    train = load_dataset(train_path)
+    test = load_dataset(test_path)
+    return train, test
 
-    # Features and target
-    X_train = train_df.drop(columns=["prognosis"])
-    y_train = train_df["prognosis"]
 
-    X_test = test_df.drop(columns=["prognosis"])
-    y_test = test_df["prognosis"]
+def _atomic_write(path, write):
+    """Call write(tmp_path), then move the result over `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    # Train model
-    model = RandomForestClassifier(n_estimators=200, random_state=42)
-    model.fit(X_train, y_train)
 
-    # Predictions
-    preds = model.predict(X_test)
+def _write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+    _atomic_write(path, write)
 
-    # Metrics
-    acc = accuracy_score(y_test, preds)
-    f1 = f1_score(y_test, preds, average="weighted")
-    report = classification_report(y_test, preds)
-    cm = confusion_matrix(y_test, preds, labels=model.classes_)
-    
-    print(f"\n✅ Accuracy: {acc:.4f}")
-    print(f"✅ F1 Score (weighted): {f1:.4f}")
-    print("\n📊 Classification Report:\n", report)
-    print("📉 Confusion Matrix:\n", cm)
 
-    # Save model
-    joblib.dump(model, MODEL_OUTPUT_PATH)
-    print(f"\n✅ Model saved to {MODEL_OUTPUT_PATH}")
+def save_reports(reports_dir, model, feature_columns, metrics, report, cm, plots=True):
+    """Metrics, report and confusion matrix as files, plus PNG plots (no windows)."""
+    os.makedirs(reports_dir, exist_ok=True)
+    _write_json(os.path.join(reports_dir, "metrics.json"), metrics)
+    with open(os.path.join(reports_dir, "classification_report.txt"), "w") as f:
+        f.write(report)
+    pd.DataFrame(cm, index=model.classes_, columns=model.classes_).to_csv(
+        os.path.join(reports_dir, "confusion_matrix.csv"))
+    if not plots:
+        return
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.metrics import ConfusionMatrixDisplay
 
     # Confusion Matrix Plot (Fix label overlap + blank issue)
     fig, ax = plt.subplots(figsize=(14, 12))
@@ -60,19 +127,328 @@ def train_and_save_model():
     disp.plot(ax=ax, cmap="Blues", colorbar=False, xticks_rotation=45)
     plt.title("Confusion Matrix")
     plt.tight_layout()
-    plt.show()
+    fig.savefig(os.path.join(reports_dir, "confusion_matrix.png"), dpi=120)
+    plt.close(fig)
 
     # Plot Feature Importances
-    feature_importances = pd.Series(model.feature_importances_, index=X_train.columns)
+    feature_importances = pd.Series(model.feature_importances_, index=feature_columns)
     top_features = feature_importances.sort_values(ascending=False).head(15)
 
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=top_features.values, y=top_features.index, palette="viridis")
+    fig = plt.figure(figsize=(10, 6))
+    sns.barplot(x=top_features.values, y=top_features.index, hue=top_features.index, palette="viridis", legend=False)
     plt.title("Top 15 Feature Importances")
     plt.xlabel("Importance")
     plt.ylabel("Features")
     plt.tight_layout()
-    plt.show()
+    fig.savefig(os.path.join(reports_dir, "feature_importances.png"), dpi=120)
+    plt.close(fig)
+
+
+def save_model(model, metadata, model_path=MODEL_OUTPUT_PATH, schema_path=SCHEMA_OUTPUT_PATH,
+               flat_model_path=FLAT_MODEL_OUTPUT_PATH):
+    """
+    Write the metadata sidecar, the model and the flattened forest, each via
+    rename so a running app (which hot-reloads rf_model.pkl) never reads a
+    partial file. The flat forest carries the forest's fingerprint, so the app
+    ignores one left over from another model.
+    """
+    _write_json(schema_path, metadata)
+    _atomic_write(model_path, lambda tmp_path: joblib.dump(model, tmp_path))
+    _atomic_write(flat_model_path, lambda tmp_path: export_forest(model).save(tmp_path))
+
+
+def fit_calibration(model, params, X_train, y_train, X_test, y_test, train_hash, n_splits=3, n_jobs=-1):
+    """
+    Temperature for the model's probabilities, fitted on out-of-fold
+    predictions of the training rows (the test rows stay unseen), with the
+    log loss and calibration error before and after on both.
+    """
+    classes = list(model.classes_)
+    index = {c: i for i, c in enumerate(classes)}
+    folds = cached_folds(y_train, train_hash, n_splits, params.get("random_state") or 0)
+    rows, oof = out_of_fold_proba(params, X_train, y_train, folds, classes, n_jobs)
+    y_oof = np.array([index[c] for c in y_train[rows]])
+    temperature = fit_temperature(oof, y_oof)
+
+    known = np.isin(y_test, classes)
+    test = model.predict_proba(np.asarray(X_test)[known])
+    y_test_index = np.array([index[c] for c in y_test[known]])
+
+    def scores(probabilities, y_index):
+        calibrated = apply_temperature(probabilities, temperature)
+        return {
+            "log_loss_before": log_loss(probabilities, y_index),
+            "log_loss_after": log_loss(calibrated, y_index),
+            "ece_before": expected_calibration_error(probabilities, y_index),
+            "ece_after": expected_calibration_error(calibrated, y_index),
+        }
+
+    return {
+        "method": "temperature",
+        "temperature": temperature,
+        "folds": n_splits,
+        "out_of_fold": {"n_rows": int(len(rows)), **scores(oof, y_oof)},
+        "test": {"n_rows": int(known.sum()), **scores(test, y_test_index)},
+    }
+
+
+def train_and_save_model(train_path=TRAIN_PATH, test_path=TEST_PATH, n_estimators=200, n_jobs=-1,
+                         random_state=42, max_depth=None, min_samples_leaf=1, include_feedback=False, plots=True,
+                         reports_dir=REPORTS_DIR, model_path=MODEL_OUTPUT_PATH,
+                         schema_path=SCHEMA_OUTPUT_PATH, flat_model_path=FLAT_MODEL_OUTPUT_PATH,
+                         calibrate=False, calibration_folds=3):
+    timings = {}
+    start = time.perf_counter()
+    (X_train, y_train, schema), (X_test, y_test, _) = load_data(train_path, test_path, include_feedback)
+    data_hashes = {"train": dataset_hash(X_train, y_train), "test": dataset_hash(X_test, y_test)}
+    timings["load_s"] = time.perf_counter() - start
+
+    # Train model (n_jobs does not change the result for a fixed random_state)
+    params = {"n_estimators": n_estimators, "max_depth": max_depth, "min_samples_leaf": min_samples_leaf,
+              "random_state": random_state}
+    model = RandomForestClassifier(n_jobs=n_jobs, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    timings["fit_s"] = time.perf_counter() - start
+
+    # Predictions
+    start = time.perf_counter()
+    preds = model.predict(X_test)
+
+    # Metrics
+    acc = accuracy_score(y_test, preds)
+    f1 = f1_score(y_test, preds, average="weighted")
+    report = classification_report(y_test, preds, zero_division=0)
+    cm = confusion_matrix(y_test, preds, labels=model.classes_)
+    timings["evaluate_s"] = time.perf_counter() - start
+
+    print(f"\n✅ Accuracy: {acc:.4f}")
+    print(f"✅ F1 Score (weighted): {f1:.4f}")
+    print("\n📊 Classification Report:\n", report)
+
+    metrics = {
+        "accuracy": acc,
+        "f1_weighted": f1,
+        "per_class": classification_report(y_test, preds, zero_division=0, output_dict=True),
+    }
+
+    calibration = None
+    if calibrate:
+        start = time.perf_counter()
+        calibration = fit_calibration(model, params, X_train, y_train, X_test, y_test, data_hashes["train"],
+                                      calibration_folds, n_jobs)
+        timings["calibrate_s"] = time.perf_counter() - start
+        metrics["calibration"] = calibration
+        test_scores = calibration["test"]
+        print(f"✅ Temperature {calibration['temperature']:.3f}: test log loss "
+              f"{test_scores['log_loss_before']:.4f} -> {test_scores['log_loss_after']:.4f}, "
+              f"ECE {test_scores['ece_before']:.4f} -> {test_scores['ece_after']:.4f}")
+
+    # Save model; the feature order and labels let the app run without the training data
+    start = time.perf_counter()
+    import sklearn
+
+    metadata = {
+        "metadata_version": METADATA_VERSION,
+        "feature_columns": schema["feature_columns"],
+        "classes": [str(c) for c in model.classes_],
+        "data_hash": data_hashes,
+        "n_train": int(len(y_train)),
+        "n_test": int(len(y_test)),
+        "params": params,
+        "n_trees": len(model.estimators_),
+        "metrics": {"accuracy": acc, "f1_weighted": f1},
+        "timings": timings,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sklearn_version": sklearn.__version__,
+    }
+    if calibration is not None:
+        metadata["calibration"] = calibration
+    save_model(model, metadata, model_path, schema_path, flat_model_path)
+    timings["save_s"] = time.perf_counter() - start
+    # Rewrite the sidecar with the final timings (the model is already in place)
+    _write_json(schema_path, metadata)
+    print(f"\n✅ Model saved to {model_path}")
+
+    start = time.perf_counter()
+    save_reports(reports_dir, model, schema["feature_columns"], metrics, report, cm, plots=plots)
+    timings["reports_s"] = time.perf_counter() - start
+    print(f"📁 Reports written to {reports_dir}")
+    print("⏱️ " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return model, metadata
+
+
+def update_and_save_model(train_path=TRAIN_PATH, test_path=TEST_PATH, n_trees=20, replace_oldest=False,
+                          replay_per_class=5, include_feedback=False, plots=True, reports_dir=REPORTS_DIR,
+                          model_path=MODEL_OUTPUT_PATH, schema_path=SCHEMA_OUTPUT_PATH,
+                          flat_model_path=FLAT_MODEL_OUTPUT_PATH, predictor=None):
+    """
+    Fold rows appended since the last training run into the saved model by
+    growing `n_trees` trees on them (see model.incremental). Falls back to
+    a full retrain when the data changed in other ways or has new labels.
+    Pass the app's `predictor` to swap the result in without waiting for
+    its file check; other processes pick it up when rf_model.pkl changes.
+    """
+    def retrain(**params):
+        model, metadata = train_and_save_model(
+            train_path, test_path, include_feedback=include_feedback, plots=plots, reports_dir=reports_dir,
+            model_path=model_path, schema_path=schema_path, flat_model_path=flat_model_path, **params)
+        if predictor is not None:
+            predictor.swap(model, metadata["feature_columns"])
+        return model, metadata
+
+    timings = {}
+    start = time.perf_counter()
+    try:
+        with open(schema_path) as f:
+            metadata = json.load(f)
+        model = joblib.load(model_path)
+    except (OSError, ValueError) as e:
+        print(f"Error loading model for update: {str(e)}")
+        return retrain()
+    (X_train, y_train, schema), (X_test, y_test, _) = load_data(train_path, test_path, include_feedback)
+    timings["load_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        if schema["feature_columns"] != metadata["feature_columns"]:
+            raise FullRetrainRequired("Feature columns changed")
+        n_seen = new_rows_since(metadata, X_train, y_train)
+        if n_seen == len(y_train):
+            print("✅ Model is up to date, nothing to add")
+            return model, metadata
+        X_new, y_new = np.asarray(X_train[n_seen:]), y_train[n_seen:]
+        replay = replay_sample(y_train[:n_seen], model.classes_, replay_per_class, seed=n_seen)
+        warm_update(model, X_new, y_new, np.asarray(X_train[replay]), y_train[replay],
+                    n_trees=n_trees, replace_oldest=replace_oldest)
+    except FullRetrainRequired as e:
+        print(f"⚠️ {str(e)}: running a full retrain")
+        # Keep the model calibrated if it was
+        return retrain(calibrate="calibration" in metadata, **metadata.get("params", {}))
+    timings["update_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preds = model.predict(X_test)
+    acc = accuracy_score(y_test, preds)
+    f1 = f1_score(y_test, preds, average="weighted")
+    timings["evaluate_s"] = time.perf_counter() - start
+    print(f"\n✅ Added {len(y_new)} rows with {n_trees} trees"
+          f"{' (replacing the oldest)' if replace_oldest else ''}: {len(model.estimators_)} trees")
+    print(f"✅ Accuracy: {acc:.4f}  F1 Score (weighted): {f1:.4f}")
+
+    start = time.perf_counter()
+    metadata.update({
+        "data_hash": {"train": dataset_hash(X_train, y_train), "test": dataset_hash(X_test, y_test)},
+        "n_train": int(len(y_train)),
+        "n_test": int(len(y_test)),
+        "metrics": {"accuracy": acc, "f1_weighted": f1},
+    })
+    # "params" stay the base training params a full retrain starts from
+    metadata["n_trees"] = len(model.estimators_)
+    metadata.setdefault("updates", []).append({
+        "rows_added": int(len(y_new)),
+        "trees_added": n_trees,
+        "replace_oldest": replace_oldest,
+        "timings": timings,
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    save_model(model, metadata, model_path, schema_path, flat_model_path)
+    timings["save_s"] = time.perf_counter() - start
+    _write_json(schema_path, metadata)
+    if predictor is not None:
+        predictor.swap(model, metadata["feature_columns"])
+    print(f"✅ Model saved to {model_path}")
+    print("⏱️ " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return model, metadata
+
+
+def search_models(train_path=TRAIN_PATH, grid=DEFAULT_GRID, n_splits=3, n_jobs=-1, random_state=42,
+                  include_feedback=False, reports_dir=REPORTS_DIR):
+    """Run the hyperparameter search on the training rows and write its report."""
+    start = time.perf_counter()
+    if include_feedback:
+        train_path = compact_feedback(train_path=train_path)
+    X_train, y_train, _ = load_dataset(train_path)
+    results = search(X_train, y_train, dataset_hash(X_train, y_train), grid, n_splits, n_jobs, random_state)
+    results.sort(key=lambda r: (not r["pareto"], -r["f1_weighted"], r["model_bytes"]))
+
+    os.makedirs(reports_dir, exist_ok=True)
+    _write_json(os.path.join(reports_dir, "search.json"), results)
+    table = pd.DataFrame([{**r["params"], **{k: v for k, v in r.items() if k != "params"}} for r in results])
+    table.to_csv(os.path.join(reports_dir, "search.csv"), index=False)
+
+    print(f"\n🔎 {len(results)} configs, {n_splits}-fold CV, {time.perf_counter() - start:.1f}s")
+    print(f"{'trees':>5} {'depth':>5} {'leaf':>4} {'F1':>7} {'size KB':>9} {'load ms':>8} {'p50 ms':>7}  pareto")
+    for r in results:
+        params = r["params"]
+        print(f"{params['n_estimators']:>5} {str(params['max_depth']):>5} {params['min_samples_leaf']:>4} "
+              f"{r['f1_weighted']:>7.4f} {r['model_bytes'] / 1024:>9.0f} {r['load_ms']:>8.1f} "
+              f"{r['predict_p50_ms']:>7.3f}  {'*' if r['pareto'] else ''}")
+    print(f"📁 Report written to {os.path.join(reports_dir, 'search.csv')}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--train", default=TRAIN_PATH, help="training workbook or CSV")
+    parser.add_argument("--test", default=TEST_PATH, help="held-out workbook or CSV")
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--min-samples-leaf", type=int, default=1, help="as swept by --search --grid-leaf")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="worker processes for fitting (-1: all cores)")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--feedback", action="store_true",
+                        help="also train on the feedback rows recorded by the chat path (not reviewed)")
+    parser.add_argument("--no-plots", action="store_true", help="skip the PNG plots")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    parser.add_argument("--output", default=MODEL_OUTPUT_PATH, help="model path; sidecars are written next to it")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="fit a probability temperature on out-of-fold predictions")
+    parser.add_argument("--calibration-folds", type=int, default=3)
+    parser.add_argument("--update", action="store_true", help="add trees for new rows instead of retraining")
+    parser.add_argument("--new-trees", type=int, default=20, help="trees grown per --update")
+    parser.add_argument("--replace-oldest", action="store_true",
+                        help="drop as many of the oldest trees as are added (fixed forest size)")
+    parser.add_argument("--replay-per-class", type=int, default=5,
+                        help="already-seen rows per class mixed into an --update")
+    parser.add_argument("--search", action="store_true", help="hyperparameter search report instead of training")
+    parser.add_argument("--folds", type=int, default=3, help="cross-validation folds for --search")
+    parser.add_argument("--grid-trees", type=int, nargs="+", default=DEFAULT_GRID["n_estimators"])
+    parser.add_argument("--grid-depth", type=int, nargs="+", default=[d or 0 for d in DEFAULT_GRID["max_depth"]],
+                        help="max_depth values, 0 for unlimited")
+    parser.add_argument("--grid-leaf", type=int, nargs="+", default=DEFAULT_GRID["min_samples_leaf"])
+    args = parser.parse_args()
+
+    if args.search:
+        grid = {
+            "n_estimators": args.grid_trees,
+            "max_depth": [d or None for d in args.grid_depth],
+            "min_samples_leaf": args.grid_leaf,
+        }
+        search_models(train_path=args.train, grid=grid, n_splits=args.folds, n_jobs=args.n_jobs,
+                      random_state=args.random_state, include_feedback=args.feedback,
+                      reports_dir=args.reports_dir)
+        return
+
+    root = os.path.splitext(args.output)[0]
+    if args.update:
+        update_and_save_model(
+            train_path=args.train, test_path=args.test, n_trees=args.new_trees,
+            replace_oldest=args.replace_oldest, replay_per_class=args.replay_per_class,
+            include_feedback=args.feedback, plots=not args.no_plots,
+            reports_dir=args.reports_dir, model_path=args.output,
+            schema_path=f"{root}.json", flat_model_path=f"{root}.flat.npz",
+        )
+        return
+    train_and_save_model(
+        train_path=args.train, test_path=args.test, n_estimators=args.n_estimators, n_jobs=args.n_jobs,
+        random_state=args.random_state, max_depth=args.max_depth, min_samples_leaf=args.min_samples_leaf,
+        include_feedback=args.feedback,
+        plots=not args.no_plots, reports_dir=args.reports_dir, model_path=args.output,
+        schema_path=f"{root}.json", flat_model_path=f"{root}.flat.npz",
+        calibrate=args.calibrate, calibration_folds=args.calibration_folds,
+    )
+
 
 if __name__ == "__main__":
-    train_and_save_model()
+    main()
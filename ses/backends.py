@@ -0,0 +1,219 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+SESSION_DB_PATH = "data/cache/sessions.sqlite3"
+DEFAULT_IDLE_TTL = 3600
+
+
+def encode_state(state):
+    """Compact wire format for a session: minified JSON, zlib-compressed."""
+    return zlib.compress(json.dumps(state, separators=(",", ":"), default=str).encode("utf-8"), 6)
+
+
+def decode_state(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class SessionBackend(ABC):
+    """
+    Key/value byte store shared by the app's worker processes.
+
+    Values expire `idle_ttl` seconds after they were last written or
+    touched. Every method takes a batch so one request costs one round trip
+    per direction. A backend missing one of them can't be instantiated.
+    """
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+
+    @abstractmethod
+    def get_many(self, keys):
+        """Values for `keys` in order, None where missing or expired."""
+
+    @abstractmethod
+    def set_many(self, items, touch=()):
+        """Write `items` ({key: bytes}) and refresh the expiry of `touch` keys."""
+
+    @abstractmethod
+    def delete_many(self, keys):
+        """Remove `keys`; missing ones are ignored."""
+
+    def stats(self):
+        return {}
+
+
+class InProcessBackend(SessionBackend):
+    """Dict-backed store; only shared by threads of this process."""
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL, max_items=10000):
+        super().__init__(idle_ttl)
+        self.max_items = max_items
+        self._items = OrderedDict()  # key -> (value, expires_at), least recently written first
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                entry = self._items.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._items[key]
+                    entry = None
+                values.append(None if entry is None else entry[0])
+            return values
+
+    def set_many(self, items, touch=()):
+        expires_at = time.monotonic() + self.idle_ttl
+        with self._lock:
+            for key, value in items.items():
+                self._items[key] = (value, expires_at)
+                self._items.move_to_end(key)
+            for key in touch:
+                entry = self._items.get(key)
+                if entry is not None:
+                    self._items[key] = (entry[0], expires_at)
+                    self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "bytes": sum(len(v) for v, _ in self._items.values())}
+
+
+class SqliteBackend(SessionBackend):
+    """
+    Single sqlite file in WAL mode, so worker processes on one host share
+    sessions without a server. Expired rows are swept every `sweep_interval`.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH, idle_ttl=DEFAULT_IDLE_TTL, sweep_interval=60):
+        super().__init__(idle_ttl)
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._next_sweep = 0.0
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return []
+        rows = self._db().execute(
+            f"SELECT key, value FROM sessions WHERE key IN ({','.join('?' * len(keys))}) AND expires_at > ?",
+            (*keys, time.time()),
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items, touch=()):
+        now = time.time()
+        expires_at = now + self.idle_ttl
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+            if touch:
+                conn.executemany(
+                    "UPDATE sessions SET expires_at = ? WHERE key = ?",
+                    [(expires_at, key) for key in touch],
+                )
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete_many(self, keys):
+        with self._db() as conn:
+            conn.executemany("DELETE FROM sessions WHERE key = ?", [(key,) for key in keys])
+
+    def stats(self):
+        items, size = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM sessions WHERE expires_at > ?",
+            (time.time(),),
+        ).fetchone()
+        return {"items": items, "bytes": size}
+
+
+class RedisBackend(SessionBackend):
+    """
+    Redis (or anything speaking its protocol) for workers spread across
+    hosts. Expiry is native (SET ... EX); batches go through one pipeline.
+    Pass `client` to use an existing connection, e.g. a fakeredis instance.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", idle_ttl=DEFAULT_IDLE_TTL,
+                 prefix="ai4health:", client=None):
+        super().__init__(idle_ttl)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return []
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def set_many(self, items, touch=()):
+        ttl = max(1, int(self.idle_ttl))
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self.prefix + key, value, ex=ttl)
+        for key in touch:
+            pipe.expire(self.prefix + key, ttl)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {"items": sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=500))}
+
+
+def backend_from_env():
+    """
+    Backend named by SESSION_BACKEND ("sqlite", "redis"), or None to keep
+    sessions in this process only. SESSION_BACKEND_URL is the sqlite path or
+    redis URL.
+    """
+    kind = (os.getenv("SESSION_BACKEND") or "").lower()
+    url = os.getenv("SESSION_BACKEND_URL")
+    if kind == "sqlite":
+        return SqliteBackend(url or SESSION_DB_PATH)
+    if kind == "redis":
+        return RedisBackend(url or "redis://localhost:6379/0")
+    if kind == "memory":
+        return InProcessBackend()
+    return None
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from ses.spill import SpillStore
+
+DISPLAY_WIDTH = 300
+MODEL_MAX_SIDE = 1024
+
+
+class _StoredImage:
+    __slots__ = ("data", "mime_type", "refcount", "size", "on_disk")
+
+    def __init__(self, data, mime_type):
+        self.data = data
+        self.mime_type = mime_type
+        self.refcount = 1
+        self.size = len(data)
+        self.on_disk = False
+
+
+class ImageStore:
+    """
+    Content-addressed store for uploaded images.
+
+    Each distinct upload is kept once as its encoded bytes, keyed by SHA-256
+    (the handle). Sessions hold handles and release them on reset. Decoded
+    and resized variants (display thumbnail, model input) are produced at
+    most once per image and kept in a small LRU. Once the encoded bytes in
+    memory exceed `max_memory_bytes`, the least recently used images are
+    spilled to disk and read back on demand.
+    """
+
+    def __init__(self, max_variants=128, max_memory_bytes=64 * 1024 * 1024, spill=None):
+        self.max_variants = max_variants
+        self.max_memory_bytes = max_memory_bytes
+        self._spill = spill
+        self._images = OrderedDict()    # handle -> _StoredImage, least recently used first
+        self._variants = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def spill(self):
+        if self._spill is None:
+            self._spill = SpillStore()
+        return self._spill
+
+    def put(self, data, mime_type="image/jpeg"):
+        """Store encoded image bytes and return the handle. Identical uploads share one copy."""
+        handle = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._images.get(handle)
+            if entry is None:
+                self._images[handle] = _StoredImage(bytes(data), mime_type)
+                self._memory_bytes += len(data)
+                self._enforce_memory(keep=handle)
+            else:
+                entry.refcount += 1
+        return handle
+
+    def acquire(self, handle):
+        """Take another reference to a stored image; False if the handle is unknown here."""
+        with self._lock:
+            entry = self._images.get(handle)
+            if entry is None:
+                return False
+            entry.refcount += 1
+            return True
+
+    def release(self, handle):
+        """Drop one reference; the bytes and variants go when nobody holds the image."""
+        with self._lock:
+            entry = self._images.get(handle)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount > 0:
+                return
+            del self._images[handle]
+            if entry.data is not None:
+                self._memory_bytes -= entry.size
+            if entry.on_disk:
+                self.spill.delete(handle)
+            for key in [k for k in self._variants if k[0] == handle]:
+                del self._variants[key]
+
+    def __contains__(self, handle):
+        return handle in self._images
+
+    def get_bytes(self, handle):
+        with self._lock:
+            entry = self._images[handle]
+            self._images.move_to_end(handle)
+            if entry.data is None:
+                entry.data = self.spill.get(handle)
+                self._memory_bytes += entry.size
+                self._enforce_memory(keep=handle)
+            return entry.data, entry.mime_type
+
+    def _enforce_memory(self, keep):
+        for handle, entry in self._images.items():
+            if self._memory_bytes <= self.max_memory_bytes:
+                break
+            if handle == keep or entry.data is None:
+                continue
+            if not entry.on_disk:
+                self.spill.put(entry.data, key=handle)
+                entry.on_disk = True
+            entry.data = None
+            self._memory_bytes -= entry.size
+
+    def _variant(self, key, build):
+        with self._lock:
+            value = self._variants.get(key)
+            if value is not None:
+                self._variants.move_to_end(key)
+                return value
+        value = build()
+        with self._lock:
+            self._variants[key] = value
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+        return value
+
+    def _resized(self, handle, max_width, max_height):
+        """Downscaled JPEG blob, or False if the original already fits."""
+        from PIL import Image
+
+        data, mime_type = self.get_bytes(handle)
+        img = Image.open(BytesIO(data))
+        if img.width <= max_width and img.height <= max_height:
+            return False
+        img.thumbnail((max_width, max_height))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=90)
+        return {"mime_type": "image/jpeg", "data": out.getvalue()}
+
+    def _fitted(self, handle, kind, max_width, max_height):
+        blob = self._variant((handle, kind, max_width, max_height),
+                             lambda: self._resized(handle, max_width, max_height))
+        if blob is False:
+            # The original is small enough; it is not duplicated into the variant cache
+            data, mime_type = self.get_bytes(handle)
+            return {"mime_type": mime_type, "data": data}
+        return blob
+
+    def display_image(self, handle, width=DISPLAY_WIDTH):
+        """Encoded thumbnail bytes for st.image."""
+        return self._fitted(handle, "display", width, width * 4)["data"]
+
+    def model_input(self, handle, max_side=MODEL_MAX_SIDE):
+        """{"mime_type", "data"} blob for the vision model, downscaled to `max_side` if larger."""
+        return self._fitted(handle, "model", max_side, max_side)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": sum(entry.size for entry in self._images.values()),
+                "memory_bytes": self._memory_bytes,
+                "spilled": sum(entry.data is None for entry in self._images.values()),
+                "variants": len(self._variants),
+            }
+
+
+# Singleton instance used across the app
+image_store = ImageStore()
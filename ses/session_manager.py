@@ -1,50 +1,393 @@
-from collections import defaultdict, deque
+import importlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from ses.backends import backend_from_env, decode_state, encode_state
+from ses.image_store import image_store
+from ses.spill import SpillStore, SpilledValue
+
+
+def _new_context():
+    return {
+        "last_diagnosis": None,
+        "symptoms": None,
+        "image_uploaded": False,
+        "image_description": None,
+        "image_disease_list": [],
+        "image_handle": None,  # key into ses.image_store
+        "chat_bot": None  # Added for Gemini chat instance
+    }
+
+
+def estimate_bytes(value):
+    """Rough payload size of a session value (text/bytes lengths, not Python object overhead)."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, SpilledValue):
+        return 0
+    if isinstance(value, dict):
+        return sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, deque, set)):
+        return sum(estimate_bytes(v) for v in value)
+    if hasattr(value, "approx_bytes"):
+        return value.approx_bytes()
+    return 64
+
 
 class SessionManager:
-    def __init__(self, max_history=20):  # Increased history size
-        self.sessions = defaultdict(lambda: {
-            "history": deque(maxlen=max_history),
-            "context": {
-                "last_diagnosis": None,
-                "symptoms": None,
-                "image_uploaded": False,
-                "image_description": None,
-                "image_disease_list": [],
-                "base64_image": None,
-                "chat_bot": None  # Added for Gemini chat instance
+    """
+    In-process conversation store.
+
+    Sessions expire after `idle_ttl` seconds without access, and at most
+    `max_sessions` are kept (least recently used are evicted). Each session
+    has a soft byte budget: large str/bytes context values are spilled to
+    disk first, then the oldest messages and chat-bot turns are trimmed.
+
+    With a `backend` (see ses.backends) the sessions above are only a local
+    cache: state is pulled from the backend when a session is accessed and
+    pushed back after it changes, so any worker process can serve any
+    session. Inside `with session_manager.request(session_id):` the session
+    is pulled once on entry and pushed once on exit. Pushes are snapshotted
+    under the lock but written to the backend after it is released, so a
+    slow backend only delays the request that changed the session.
+    """
+
+    def __init__(self, max_history=20, max_sessions=1000, idle_ttl=3600,
+                 session_byte_budget=512 * 1024, spill_threshold=32 * 1024,
+                 sweep_interval=30, spill=None, backend=None):  # Increased history size
+        self.max_history = max_history
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.session_byte_budget = session_byte_budget
+        self.spill_threshold = spill_threshold
+        self.sweep_interval = sweep_interval
+        self.sessions = OrderedDict()  # least recently used first
+        self._spill = spill
+        self.backend = backend
+        self._active = {}  # session_id -> nesting depth of open request() scopes
+        self._exported_images = set()
+        self._lock = threading.RLock()
+        self._depth = 0  # nesting of _locked() scopes held by the lock's owner
+        self._outbox = []  # snapshots to write once the lock is released
+        self._send_locks = {}  # session_id -> lock ordering its backend writes
+        self._next_sweep = 0.0
+        self.expired = 0
+        self.evicted = 0
+        self.spilled_values = 0
+        self.pulls = 0
+        self.pushes = 0
+
+    @property
+    def spill(self):
+        if self._spill is None:
+            self._spill = SpillStore()
+        return self._spill
+
+    @contextmanager
+    def _locked(self):
+        """Hold the session lock; pushes queued meanwhile are written after it is released."""
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                outbox = []
+                if not self._depth:
+                    outbox, self._outbox = self._outbox, []
+        for snapshot in outbox:
+            self._send(snapshot)
+
+    def _evict_one(self):
+        """Drop the least recently used idle session, or the oldest active one (pushed first) if all are in use."""
+        victim = next((sid for sid in self.sessions if sid not in self._active), None)
+        if victim is None:
+            victim = next(iter(self.sessions))
+            if self.backend is not None:
+                self._push(victim)
+        self._drop(victim)
+        self.evicted += 1
+
+    def _session(self, session_id):
+        """Fetch (or create) a session and mark it as just used."""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._expire_idle(now)
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = {
+                "history": deque(maxlen=self.max_history),
+                "context": _new_context(),
+                "last_access": now,
+                "bytes": 0,
             }
-        })
+            while len(self.sessions) > self.max_sessions:
+                self._evict_one()
+        else:
+            session["last_access"] = now
+            self.sessions.move_to_end(session_id)
+        # While our own push is in flight the local copy is the newest one
+        if self.backend is not None and session_id not in self._active and not session.get("pushing"):
+            self._pull(session_id, session)
+        return session
+
+    def _expire_idle(self, now):
+        self._next_sweep = now + self.sweep_interval
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session["last_access"] + self.idle_ttl > now:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _drop(self, session_id):
+        session = self.sessions.pop(session_id)
+        self._send_locks.pop(session_id, None)
+        for value in session["context"].values():
+            if isinstance(value, SpilledValue):
+                self.spill.delete(value.key)
+        image_handle = session["context"].get("image_handle")
+        if image_handle:
+            image_store.release(image_handle)
+            self._exported_images.discard(image_handle)
+
+    def _load(self, value):
+        if isinstance(value, SpilledValue):
+            data = self.spill.get(value.key)
+            return data.decode("utf-8") if value.is_text else data
+        return value
+
+    def _enforce_budget(self, session):
+        context = session["context"]
+        size = estimate_bytes(session["history"]) + estimate_bytes(context)
+        if size > self.session_byte_budget:
+            # 1. Move large blobs out of the hot dict
+            for key, value in context.items():
+                if isinstance(value, (str, bytes, bytearray)) and len(value) >= self.spill_threshold:
+                    is_text = isinstance(value, str)
+                    data = value.encode("utf-8") if is_text else bytes(value)
+                    context[key] = SpilledValue(self.spill.put(data), len(data), is_text)
+                    self.spilled_values += 1
+                    size -= len(value)
+            # 2. Drop the oldest messages, keeping the latest exchange
+            history = session["history"]
+            while size > self.session_byte_budget and len(history) > 2:
+                size -= estimate_bytes(history.popleft())
+            # 3. Let the chat bot forget its oldest turns
+            chat_bot = context.get("chat_bot")
+            if size > self.session_byte_budget and hasattr(chat_bot, "trim_history"):
+                chat_bot.trim_history(max(0, self.session_byte_budget - (size - chat_bot.approx_bytes())))
+                size = estimate_bytes(history) + estimate_bytes(context)
+        session["bytes"] = size
+
+    def _encode_value(self, value):
+        if isinstance(value, SpilledValue):
+            return self._load(value)
+        if hasattr(value, "to_state"):
+            # Live objects (the chat bot) travel as the state they can be rebuilt from
+            cls = type(value)
+            return {"__object__": f"{cls.__module__}:{cls.__qualname__}", "state": value.to_state()}
+        return value
+
+    def _decode_value(self, value):
+        if isinstance(value, dict) and "__object__" in value:
+            module_name, class_name = value["__object__"].split(":")
+            try:
+                cls = getattr(importlib.import_module(module_name), class_name)
+                return cls.from_state(value["state"])
+            except Exception as e:
+                print(f"Error restoring {value['__object__']}: {str(e)}")
+                return None
+        return value
+
+    def _pull(self, session_id, session):
+        """Replace the local copy with the backend's if another worker changed it."""
+        try:
+            blob = self.backend.get_many([f"session:{session_id}"])[0]
+            if blob is None:
+                return
+            state = decode_state(blob)
+            if state["etag"] == session.get("etag"):
+                return
+            self.pulls += 1
+            context = _new_context()
+            context.update({key: self._decode_value(value) for key, value in state["context"].items()})
+            self._adopt_image(session, context)
+        except Exception as e:
+            print(f"Error loading session {session_id}: {str(e)}")
+            return
+        for value in session["context"].values():
+            if isinstance(value, SpilledValue):
+                self.spill.delete(value.key)
+        session["history"] = deque(
+            ({"role": role, "content": content} for role, content in state["history"]),
+            maxlen=self.max_history,
+        )
+        session["context"] = context
+        session["etag"] = state["etag"]
+        self._enforce_budget(session)
+
+    def _adopt_image(self, session, context):
+        """Hold a local reference to the image in `context`, fetching it from the backend if needed."""
+        old_handle = session["context"].get("image_handle")
+        handle = context.get("image_handle")
+        if handle == old_handle:
+            return
+        if handle and not image_store.acquire(handle):
+            blob = self.backend.get_many([f"image:{handle}"])[0]
+            if blob is None:
+                context["image_handle"] = None
+                context["image_uploaded"] = False
+            else:
+                mime_type, data = blob.split(b"\0", 1)
+                image_store.put(data, mime_type.decode())
+                self._exported_images.add(handle)
+        if old_handle:
+            image_store.release(old_handle)
+
+    def _push(self, session_id):
+        """Snapshot the session for the backend; the write happens in _send once the lock is released."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        etag = uuid.uuid4().hex
+        state = {
+            "etag": etag,
+            "history": [[message["role"], message["content"]] for message in session["history"]],
+            "context": {key: self._encode_value(value) for key, value in session["context"].items()},
+        }
+        items = {f"session:{session_id}": encode_state(state)}
+        touch = []
+        image_handle = session["context"].get("image_handle")
+        if image_handle:
+            if image_handle in self._exported_images:
+                touch.append(f"image:{image_handle}")
+            else:
+                data, mime_type = image_store.get_bytes(image_handle)
+                items[f"image:{image_handle}"] = mime_type.encode() + b"\0" + data
+        session["pushing"] = session.get("pushing", 0) + 1
+        session["push_seq"] = seq = session.get("push_seq", 0) + 1
+        send_lock = self._send_locks.setdefault(session_id, threading.Lock())
+        self._outbox.append((session_id, session, seq, etag, items, touch, image_handle, send_lock))
+
+    def _send(self, snapshot):
+        session_id, session, seq, etag, items, touch, image_handle, send_lock = snapshot
+        ok = False
+        with send_lock:
+            # A newer snapshot of this session was already written
+            if seq > session.get("sent_seq", 0):
+                try:
+                    self.backend.set_many(items, touch=touch)
+                    ok = True
+                except Exception as e:
+                    print(f"Error saving session {session_id}: {str(e)}")
+                if ok:
+                    session["sent_seq"] = seq
+        with self._lock:
+            session["pushing"] -= 1
+            if not ok:
+                return
+            if image_handle:
+                self._exported_images.add(image_handle)
+            if seq == session["push_seq"]:
+                session["etag"] = etag
+            self.pushes += 1
+
+    def _changed(self, session_id):
+        if self.backend is not None and session_id not in self._active:
+            self._push(session_id)
+
+    @contextmanager
+    def request(self, session_id):
+        """
+        Scope one request: pull the session once, serve every read and write
+        from the local copy, push it once at the end (the chat bot mutates
+        its history in place, so the push is unconditional).
+        """
+        with self._locked():
+            if session_id not in self._active:
+                self._session(session_id)
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._locked():
+                depth = self._active.pop(session_id) - 1
+                if depth:
+                    self._active[session_id] = depth
+                elif self.backend is not None:
+                    self._push(session_id)
 
     def add_message(self, session_id, role, content):
         """Add a message to the conversation history."""
-        self.sessions[session_id]["history"].append({
-            "role": role,
-            "content": content
-        })
+        with self._locked():
+            session = self._session(session_id)
+            session["history"].append({
+                "role": role,
+                "content": content
+            })
+            self._enforce_budget(session)
+            self._changed(session_id)
 
     def get_conversation(self, session_id):
         """Return full conversation history."""
-        return list(self.sessions[session_id]["history"])
+        with self._locked():
+            return list(self._session(session_id)["history"])
 
     def clear_session(self, session_id):
         """Reset entire session history + context."""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        with self._locked():
+            if session_id in self.sessions:
+                self._drop(session_id)
+            if self.backend is not None:
+                try:
+                    self.backend.delete_many([f"session:{session_id}"])
+                except Exception as e:
+                    print(f"Error deleting session {session_id}: {str(e)}")
 
     def update_context(self, session_id, key, value):
         """Update any context variable (e.g., image_uploaded)."""
-        self.sessions[session_id]["context"][key] = value
+        with self._locked():
+            session = self._session(session_id)
+            old = session["context"].get(key)
+            if isinstance(old, SpilledValue):
+                self.spill.delete(old.key)
+            session["context"][key] = value
+            self._enforce_budget(session)
+            self._changed(session_id)
 
     def get_context(self, session_id, key):
         """Fetch a specific context variable."""
-        return self.sessions[session_id]["context"].get(key)
+        with self._locked():
+            return self._load(self._session(session_id)["context"].get(key))
 
     def get_full_context(self, session_id):
         """Return all session context as a dictionary."""
-        return self.sessions[session_id]["context"]
+        with self._locked():
+            context = self._session(session_id)["context"]
+            return {key: self._load(value) for key, value in context.items()}
+
+    def stats(self):
+        """Live-session and byte counters."""
+        with self._lock:
+            return {
+                "live_sessions": len(self.sessions),
+                "session_bytes": sum(s["bytes"] for s in self.sessions.values()),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "spilled_values": self.spilled_values,
+                "backend_pulls": self.pulls,
+                "backend_pushes": self.pushes,
+                "images": image_store.stats(),
+            }
 
-# Singleton instance used across the app
-session_manager = SessionManager()
+# Singleton instance used across the app (SESSION_BACKEND picks a shared backend)
+session_manager = SessionManager(backend=backend_from_env())
 
 # Legacy compatibility helpers
 def add_message(session_id, role, content):
@@ -54,4 +397,4 @@ def get_conversation(session_id):
     return session_manager.get_conversation(session_id)
 
 def clear_session(session_id):
-    session_manager.clear_session(session_id)
\ No newline at end of file
+    session_manager.clear_session(session_id)
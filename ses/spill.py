@@ -0,0 +1,52 @@
+import atexit
+import os
+import shutil
+import tempfile
+import uuid
+
+
+class SpillStore:
+    """
+    Large blobs kept on local disk instead of in process memory.
+    Without an explicit `directory` a private temp dir is used and removed
+    when the process exits.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="ai4health-spill-")
+            atexit.register(shutil.rmtree, directory, True)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def put(self, data, key=None):
+        key = key or uuid.uuid4().hex
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        return key
+
+    def get(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class SpilledValue:
+    """Placeholder left in a session context for a value moved to a SpillStore."""
+
+    __slots__ = ("key", "size", "is_text")
+
+    def __init__(self, key, size, is_text):
+        self.key = key
+        self.size = size
+        self.is_text = is_text
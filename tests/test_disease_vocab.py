@@ -0,0 +1,37 @@
+import numpy as np
+
+from model.disease_vocab import DiseaseVocabulary, parse_disease_list
+from model.fuzzy_index import MIN_SCORE, FuzzyIndex
+
+LABELS = ["Acne", "Chicken pox", "Fungal infection", "Hepatitis B", "Hypertension ", "Migraine",
+          "Urinary tract infection", "Based on the image showing what appears to be a cataract", "Cataract"]
+
+
+def test_vocabulary_scores_are_the_fuzzy_index_scores():
+    vocabulary = DiseaseVocabulary(LABELS)
+    index = FuzzyIndex(["Migraine", "Acne"])
+    names = ["migrane", "acne vulgaris"]
+    expected = index.scores(names)
+    scores = vocabulary.scores(names)
+    for column, label in enumerate(["Migraine", "Acne"]):
+        np.testing.assert_allclose(scores[:, vocabulary.labels.index(label)], expected[:, column])
+
+
+def test_typos_aliases_and_noisy_labels_resolve():
+    vocabulary = DiseaseVocabulary(LABELS)
+    assert vocabulary.resolve("Migrane") == "Migraine"
+    assert vocabulary.resolve("hepatits b") == "Hepatitis B"
+    assert vocabulary.resolve("UTI") == "Urinary tract infection"
+    assert vocabulary.resolve("hypertension") == "Hypertension "
+    assert vocabulary.resolve("glaucoma") is None
+    assert vocabulary.canonical("Based on the image showing what appears to be a cataract") == "Cataract"
+    assert "Based on the image showing what appears to be a cataract" not in vocabulary.labels
+
+
+def test_reconcile_uses_the_shared_threshold():
+    vocabulary = DiseaseVocabulary(LABELS)
+    confirmed, matches = vocabulary.reconcile("Chicken pox", parse_disease_list("1. Varicella\n2. Measles"))
+    assert confirmed
+    assert matches[0][1] == "Chicken pox"
+    assert matches[1][1] is None and matches[1][2] < MIN_SCORE
+    assert vocabulary.reconcile("Acne", ["Rosacea"])[0] is False
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from model.dataset import LABEL_COLUMN, read_table
+from model.fast_forest import FlatForest, export_forest, forest_fingerprint
+from model.model import Predictor
+
+TRAIN_PATH = "data/train_data.xlsx"
+TEST_PATH = "data/test_data.xlsx"
+
+sklearn = pytest.importorskip("sklearn.ensemble")
+
+
+@pytest.fixture(scope="module")
+def workbooks():
+    if not (os.path.exists(TRAIN_PATH) and os.path.exists(TEST_PATH)):
+        pytest.skip("training and test workbooks not present")
+    train, test = read_table(TRAIN_PATH), read_table(TEST_PATH)
+    features = [c for c in train.columns if c != LABEL_COLUMN]
+    return train[features].to_numpy(), train[LABEL_COLUMN].to_numpy(), test[features].to_numpy()
+
+
+@pytest.fixture(scope="module")
+def forest(workbooks):
+    X, y, _ = workbooks
+    return sklearn.RandomForestClassifier(n_estimators=25, random_state=42).fit(X, y)
+
+
+def test_flat_forest_matches_sklearn_on_test_workbook(forest, workbooks):
+    X_test = workbooks[2]
+    flat = export_forest(forest)
+    assert flat.binary
+    np.testing.assert_allclose(flat.predict_proba(X_test), forest.predict_proba(X_test), atol=1e-12)
+    assert (flat.predict(X_test) == forest.predict(X_test)).all()
+
+
+def test_saved_flat_forest_matches_sklearn(forest, workbooks, tmp_path):
+    X_test = workbooks[2]
+    path = str(tmp_path / "forest.npz")
+    export_forest(forest).save(path)
+    flat = FlatForest.load(path)
+    np.testing.assert_allclose(flat.predict_proba(X_test), forest.predict_proba(X_test), atol=1e-12)
+    assert list(flat.classes_) == list(forest.classes_)
+
+
+def test_flat_forest_matches_sklearn_on_continuous_features():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6))
+    y = np.where(X[:, 0] + X[:, 1] * X[:, 2] > 0, "a", np.where(X[:, 3] > 0.5, "b", "c"))
+    model = sklearn.RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    flat = export_forest(model)
+    assert not flat.binary
+    X_new = rng.normal(size=(300, 6))
+    np.testing.assert_allclose(flat.predict_proba(X_new, chunk_size=64), model.predict_proba(X_new), atol=1e-12)
+
+
+def test_predictor_ignores_a_flat_forest_of_another_model(forest, workbooks, tmp_path):
+    import joblib
+
+    X, y, X_test = workbooks
+    other = sklearn.RandomForestClassifier(n_estimators=5, random_state=1).fit(X, y)
+    model_path, flat_path = str(tmp_path / "model.pkl"), str(tmp_path / "model.flat.npz")
+    joblib.dump(forest, model_path)
+    # Newer than the pkl, but flattened from another forest
+    export_forest(other).save(flat_path)
+
+    predictor = Predictor(model_path, str(tmp_path / "missing.json"), flat_path)
+    flat = predictor.load().flat_forest
+    assert flat.fingerprint == forest_fingerprint(forest) != forest_fingerprint(other)
+    np.testing.assert_allclose(flat.predict_proba(X_test), forest.predict_proba(X_test), atol=1e-12)
+
+
+def test_predictor_uses_the_saved_flat_forest_when_it_matches(forest, tmp_path, monkeypatch):
+    import joblib
+
+    from model import fast_forest
+
+    model_path, flat_path = str(tmp_path / "model.pkl"), str(tmp_path / "model.flat.npz")
+    joblib.dump(forest, model_path)
+    export_forest(forest).save(flat_path)
+    monkeypatch.setattr(fast_forest, "export_forest", lambda model: pytest.fail("flattened again"))
+    predictor = Predictor(model_path, str(tmp_path / "missing.json"), flat_path)
+    assert predictor.load().flat_forest.fingerprint == forest_fingerprint(forest)
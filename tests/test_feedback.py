@@ -0,0 +1,192 @@
+import csv
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from model import feedback
+from model.feedback import FeedbackLog, compact_feedback
+
+COLUMNS = ["itching", "skin_rash", "high_fever", "prognosis"]
+# Sharing the log between processes relies on flock
+needs_flock = pytest.mark.skipif(feedback.fcntl is None, reason="no fcntl.flock on this platform")
+
+TRAIN_ROWS = [[1, 1, 0, "Fungal infection"], [0, 0, 1, "Malaria"], [1, 0, 0, "Allergy"]]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    train_path = str(tmp_path / "train.csv")
+    pd.DataFrame(TRAIN_ROWS, columns=COLUMNS).to_csv(train_path, index=False)
+    return {
+        "train_path": train_path,
+        "log_path": str(tmp_path / "feedback_log.csv"),
+        "archive_dir": str(tmp_path / "archive"),
+        "out_path": str(tmp_path / "train.compacted.csv"),
+    }
+
+
+def log_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def archived_rows(archive_dir):
+    rows = []
+    for name in sorted(os.listdir(archive_dir)):
+        rows += log_rows(os.path.join(archive_dir, name))
+    return rows
+
+
+def manifest(paths):
+    with open(f"{paths['out_path']}.json") as f:
+        return json.load(f)
+
+
+def _append_from_process(log_path, writer, n_rows):
+    log = FeedbackLog(log_path, flush_interval=0.01, max_buffer=7)
+    for i in range(n_rows):
+        log.record([writer % 2, i % 2, 1], f"disease {writer}-{i}")
+    log.close()
+
+
+def test_background_thread_flushes_without_close(paths):
+    log = FeedbackLog(paths["log_path"], flush_interval=0.05)
+    log.record([1, 0, 1], "Malaria")
+    deadline = time.monotonic() + 5
+    while not os.path.exists(paths["log_path"]) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log_rows(paths["log_path"]) == [["1", "0", "1", "Malaria"]]
+    assert log.pending() == 0
+    log.close()
+
+
+@needs_flock
+def test_concurrent_appends_from_threads_and_processes(paths):
+    logs = [FeedbackLog(paths["log_path"], flush_interval=0.01, max_buffer=5) for _ in range(4)]
+
+    def append(writer):
+        for i in range(200):
+            logs[writer].record([writer % 2, i % 2, 0], f"disease {writer}-{i}")
+
+    threads = [threading.Thread(target=append, args=(w,)) for w in range(4)]
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_append_from_process, args=(paths["log_path"], w, 200))
+                 for w in range(4, 7)]
+    for worker in threads + processes:
+        worker.start()
+    for worker in threads + processes:
+        worker.join()
+    for log in logs:
+        log.close()
+
+    rows = log_rows(paths["log_path"])
+    assert len(rows) == 7 * 200
+    assert all(len(row) == 4 for row in rows)
+    assert {row[3] for row in rows} == {f"disease {w}-{i}" for w in range(7) for i in range(200)}
+
+
+@needs_flock
+def test_rows_appended_during_compaction_are_kept_once(paths):
+    log = FeedbackLog(paths["log_path"], flush_interval=60)
+    stop = threading.Event()
+    written = []
+
+    def append():
+        i = 0
+        while not stop.is_set():
+            log.record([1, 1, 1], f"row {i}")
+            written.append(f"row {i}")
+            if i % 10 == 9:
+                log.flush()
+            i += 1
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    for _ in range(5):
+        compact_feedback(**paths)
+        time.sleep(0.01)
+    stop.set()
+    writer.join()
+    log.close()
+    compact_feedback(**paths)
+
+    labels = [row[3] for row in archived_rows(paths["archive_dir"])]
+    assert sorted(labels) == sorted(written)
+    assert not os.path.exists(paths["log_path"])
+
+
+def test_compaction_is_idempotent(paths, monkeypatch):
+    log = FeedbackLog(paths["log_path"])
+    log.record([0, 1, 1], "Dengue")
+    log.close()
+    out_path = compact_feedback(**paths)
+    first = pd.read_csv(out_path)
+    stat, before = os.stat(out_path), manifest(paths)
+
+    def rebuild(*args):
+        raise AssertionError("rebuilt although nothing changed")
+
+    monkeypatch.setattr(feedback, "_rebuild_compacted", rebuild)
+    compact_feedback(**paths)
+    assert os.stat(out_path).st_mtime_ns == stat.st_mtime_ns
+    assert manifest(paths) == before
+    pd.testing.assert_frame_equal(pd.read_csv(out_path), first)
+    assert len(first) == len(TRAIN_ROWS) + 1
+
+
+def test_manifest_triggers_a_rebuild_only_when_inputs_change(paths):
+    out_path = compact_feedback(**paths)
+    assert manifest(paths)["feedback_rows"] == 0
+
+    # New segment
+    log = FeedbackLog(paths["log_path"])
+    log.record([0, 1, 1], "Dengue")
+    log.close()
+    compact_feedback(**paths)
+    assert manifest(paths)["feedback_rows"] == 1
+    assert len(manifest(paths)["segments"]) == 1
+
+    # Same size, different content: caught by the hash, not by size or mtime
+    pd.DataFrame([[0, 1, 0, "Fungal infection"]] + TRAIN_ROWS[1:], columns=COLUMNS) \
+        .to_csv(paths["train_path"], index=False)
+    compact_feedback(**paths)
+    assert pd.read_csv(out_path).iloc[0].tolist() == [0, 1, 0, "Fungal infection"]
+
+    # A lost manifest rebuilds the same table
+    table = pd.read_csv(out_path)
+    os.remove(f"{out_path}.json")
+    compact_feedback(**paths)
+    pd.testing.assert_frame_equal(pd.read_csv(out_path), table)
+
+
+def test_interrupted_rotation_is_archived_once(paths):
+    with open(f"{paths['log_path']}.compacting", "w") as f:
+        f.write("1,0,0,Allergy extra\n")
+    log = FeedbackLog(paths["log_path"])
+    log.record([0, 0, 1], "Malaria extra")
+    log.close()
+    compact_feedback(**paths)
+    compact_feedback(**paths)
+    labels = [row[3] for row in archived_rows(paths["archive_dir"])]
+    assert labels == ["Allergy extra", "Malaria extra"]
+    assert list(pd.read_csv(paths["out_path"])["prognosis"][-2:]) == ["Allergy extra", "Malaria extra"]
+
+
+def test_duplicate_feedback_rows_are_dropped(paths):
+    log = FeedbackLog(paths["log_path"])
+    log.record([0, 0, 1], "Malaria")      # same as a training row
+    log.record([0, 1, 1], "Dengue")
+    log.record([0, 1, 1], "Dengue")       # same as the row before
+    log.record([0, 1, 1], "Typhoid")      # same symptoms, another label
+    log.close()
+    out_path = compact_feedback(**paths)
+
+    table = pd.read_csv(out_path)
+    assert table.values.tolist() == TRAIN_ROWS + [[0, 1, 1, "Dengue"], [0, 1, 1, "Typhoid"]]
+    assert manifest(paths)["feedback_rows"] == 2
+    assert manifest(paths)["duplicates_dropped"] == 2
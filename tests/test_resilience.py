@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm import resilience
+from llm.resilience import CircuitOpen, ProviderPolicy
+
+groq = pytest.importorskip("groq")
+
+REPLY = '{"present": ["itching"], "absent": []}'
+
+
+class StubGroq:
+    """Chat-completions endpoint answering with scripted statuses, then 200s."""
+
+    def __init__(self, statuses=(), retry_after=None, latency=0.0):
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                try:
+                    time.sleep(stub.latency)
+                    if status != 200:
+                        headers = {"retry-after": str(stub.retry_after)} if stub.retry_after is not None else {}
+                        self._send(status, {"error": {"message": "stub failure", "type": "stub"}}, headers)
+                        return
+                    self._send(200, {
+                        "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": REPLY}}],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                    })
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(stub):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), stub.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(url):
+    return groq.Groq(api_key="stub-key", base_url=url, max_retries=0)
+
+
+def complete(policy, client):
+    response = policy.call(lambda: client.chat.completions.create(
+        messages=[{"role": "user", "content": "itching and skin rash"}], model="stub",
+    ))
+    return response.choices[0].message.content
+
+
+def fast_policy(**settings):
+    defaults = dict(rate=1000, burst=1000, max_retries=3, base_delay=0.01, max_delay=0.05, max_elapsed=5.0,
+                    failure_threshold=5, reset_timeout=30.0, seed=0)
+    return ProviderPolicy("groq", **{**defaults, **settings})
+
+
+def test_rate_limits_are_retried_after_the_servers_delay(serve):
+    stub = StubGroq(statuses=[429, 429], retry_after=0.02)
+    client = make_client(serve(stub))
+    policy = fast_policy(base_delay=5.0, max_delay=5.0)
+    start = time.monotonic()
+    assert complete(policy, client) == REPLY
+    assert time.monotonic() - start < 2.0
+    assert stub.requests == 3
+    assert policy.stats()["retries"] == 2
+    assert policy.breaker.state == "closed"
+
+
+def test_server_errors_give_up_after_max_retries(serve):
+    stub = StubGroq(statuses=[503] * 10)
+    policy = fast_policy(max_retries=2)
+    with pytest.raises(groq.InternalServerError):
+        complete(policy, make_client(serve(stub)))
+    assert stub.requests == 3
+    assert policy.stats()["failures"] == 1
+
+
+def test_bad_requests_are_not_retried_and_keep_the_circuit_closed(serve):
+    stub = StubGroq(statuses=[400] * 10)
+    policy = fast_policy(failure_threshold=1)
+    client = make_client(serve(stub))
+    for _ in range(3):
+        with pytest.raises(groq.BadRequestError):
+            complete(policy, client)
+    assert stub.requests == 3
+    assert policy.breaker.state == "closed"
+
+
+def test_outage_opens_the_circuit_and_a_probe_closes_it(serve):
+    stub = StubGroq(statuses=[503] * 4)
+    policy = fast_policy(max_retries=1, failure_threshold=2, reset_timeout=0.2)
+    client = make_client(serve(stub))
+    for _ in range(2):
+        with pytest.raises(groq.InternalServerError):
+            complete(policy, client)
+    assert policy.breaker.state == "open"
+
+    with pytest.raises(CircuitOpen):
+        complete(policy, client)
+    assert stub.requests == 4
+    assert policy.stats()["rejected"] == 1
+
+    time.sleep(0.25)
+    assert complete(policy, client) == REPLY
+    assert policy.breaker.state == "closed"
+    assert stub.requests == 5
+
+
+def test_failed_probe_reopens_the_circuit(serve):
+    stub = StubGroq(statuses=[503] * 3)
+    policy = fast_policy(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+    client = make_client(serve(stub))
+    for _ in range(2):
+        with pytest.raises(groq.InternalServerError):
+            complete(policy, client)
+    time.sleep(0.25)
+    with pytest.raises(groq.InternalServerError):
+        complete(policy, client)
+    assert policy.breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        complete(policy, client)
+    assert stub.requests == 3
+
+
+def test_concurrency_limit_holds_at_the_server(serve):
+    stub = StubGroq(latency=0.05)
+    policy = fast_policy(max_concurrency=2)
+    client = make_client(serve(stub))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        replies = list(pool.map(lambda _: complete(policy, client), range(12)))
+    assert replies == [REPLY] * 12
+    assert stub.max_in_flight <= 2
+
+
+def test_token_bucket_paces_calls(serve):
+    stub = StubGroq()
+    policy = fast_policy(rate=20, burst=1)
+    client = make_client(serve(stub))
+    start = time.monotonic()
+    for _ in range(5):
+        complete(policy, client)
+    assert time.monotonic() - start >= 0.18
+    assert policy.stats()["throttled_s"] > 0
+
+
+def test_guarded_groq_client_goes_through_the_policy(serve, monkeypatch):
+    from llm import clients
+
+    stub = StubGroq(statuses=[503])
+    monkeypatch.setenv("GROQ_BASE_URL", serve(stub))
+    monkeypatch.setenv("GROQ_API_KEY", "stub-key")
+    monkeypatch.setattr(resilience, "_policies", {})
+    previous = clients._backend
+    clients.use_backend("live")
+    try:
+        policy = resilience.configure("groq", base_delay=0.01, max_delay=0.05)
+        response = clients.get_groq_client().chat.completions.create(
+            messages=[{"role": "user", "content": "itching"}], model="stub",
+        )
+    finally:
+        clients.use_backend(previous)
+    assert response.choices[0].message.content == REPLY
+    assert stub.requests == 2
+    assert policy.stats()["retries"] == 1
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+from llm import response_cache as rc
+from llm.response_cache import ResponseCache, make_key
+
+
+class StubBackend:
+    """Stands in for an LLM API: a canned reply per prompt, and a call counter."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        return f"reply to {prompt}"
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rc.time, "time", clock)
+    return clock
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def ask(cache, backend, prompt):
+    return cache.get_or_call(make_key("model", prompt), lambda: backend(prompt))
+
+
+def test_reply_is_cached_on_disk_across_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = StubBackend()
+    assert ask(ResponseCache(path), backend, "cough") == "reply to cough"
+    assert ask(ResponseCache(path), backend, "cough") == "reply to cough"
+    assert backend.calls == 1
+
+
+def test_expired_reply_is_not_served(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = StubBackend()
+    ask(ResponseCache(path, ttl=60), backend, "cough")
+    clock.now += 61
+    ask(ResponseCache(path, ttl=60), backend, "cough")
+    assert backend.calls == 2
+
+
+def test_expired_rows_are_deleted_on_open(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = StubBackend()
+    cache = ResponseCache(path, ttl=60)
+    for prompt in ("cough", "fever", "rash"):
+        ask(cache, backend, prompt)
+    clock.now += 61
+    ask(cache, backend, "headache")
+    assert rows(path) == 4
+
+    reopened = ResponseCache(path, ttl=60)
+    assert reopened.get(make_key("model", "headache")) == "reply to headache"
+    assert rows(path) == 1
+    assert reopened.purged == 3
+
+
+def test_expired_rows_are_deleted_every_n_writes(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(rc, "PURGE_EVERY", 4)
+    path = str(tmp_path / "cache.sqlite3")
+    backend = StubBackend()
+    cache = ResponseCache(path, ttl=60)
+    for prompt in ("a", "b", "c"):
+        ask(cache, backend, prompt)
+    clock.now += 61
+    ask(cache, backend, "d")
+    assert rows(path) == 1
+
+
+def test_size_cap_keeps_the_newest_rows(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(rc, "PURGE_EVERY", 5)
+    path = str(tmp_path / "cache.sqlite3")
+    backend = StubBackend()
+    cache = ResponseCache(path, max_rows=3)
+    for i in range(10):
+        clock.now += 1
+        ask(cache, backend, f"prompt {i}")
+    assert rows(path) == 3
+
+    cache.memory.clear()
+    assert cache.get(make_key("model", "prompt 9")) == "reply to prompt 9"
+    assert cache.get(make_key("model", "prompt 0")) is None
+
+
+def test_failed_calls_are_not_cached(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path)
+
+    def fail():
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_call(make_key("model", "cough"), fail)
+    assert cache.get(make_key("model", "cough")) is None
+
+
+def test_empty_path_keeps_replies_in_memory_only(tmp_path, clock):
+    backend = StubBackend()
+    cache = ResponseCache("")
+    ask(cache, backend, "cough")
+    ask(cache, backend, "cough")
+    assert backend.calls == 1
+    assert cache.purge() == 0
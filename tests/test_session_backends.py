@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from ses import backends
+from ses.backends import (
+    InProcessBackend, RedisBackend, SessionBackend, SqliteBackend, decode_state, encode_state,
+)
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+needs_fakeredis = pytest.mark.skipif(fakeredis is None, reason="fakeredis not installed")
+
+
+@pytest.fixture(params=["memory", "sqlite", pytest.param("redis", marks=needs_fakeredis)])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InProcessBackend(idle_ttl=1)
+    if request.param == "sqlite":
+        return SqliteBackend(str(tmp_path / "sessions.sqlite3"), idle_ttl=1, sweep_interval=0)
+    return RedisBackend(idle_ttl=1, client=fakeredis.FakeRedis())
+
+
+def test_round_trip(backend):
+    state = {"messages": [{"role": "user", "content": "fever and cough"}], "symptoms": [1, 0, 1]}
+    backend.set_many({"a": encode_state(state), "b": b"raw"})
+    a, b, missing = backend.get_many(["a", "b", "missing"])
+    assert decode_state(a) == state
+    assert b == b"raw"
+    assert missing is None
+    assert backend.get_many([]) == []
+
+
+def test_overwrite_and_delete(backend):
+    backend.set_many({"a": b"1", "b": b"2"})
+    backend.set_many({"a": b"3"})
+    backend.delete_many(["b", "missing"])
+    assert backend.get_many(["a", "b"]) == [b"3", None]
+
+
+def test_values_expire_after_idle_ttl(backend):
+    backend.set_many({"a": b"1"})
+    time.sleep(1.1)
+    assert backend.get_many(["a"]) == [None]
+
+
+def test_touch_refreshes_expiry(backend):
+    backend.set_many({"a": b"1", "b": b"2"})
+    time.sleep(0.6)
+    backend.set_many({}, touch=["a", "missing"])
+    time.sleep(0.6)
+    assert backend.get_many(["a", "b"]) == [b"1", None]
+    assert backend.get_many(["missing"]) == [None]
+
+
+@needs_fakeredis
+def test_redis_keys_are_prefixed_and_expire_natively():
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(idle_ttl=60, client=client, prefix="test:")
+    backend.set_many({"a": b"1"})
+    assert client.get("test:a") == b"1"
+    assert 0 < client.ttl("test:a") <= 60
+    assert backend.stats() == {"items": 1}
+
+
+def test_sqlite_sweeps_expired_rows(tmp_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(backends.time, "time", lambda: clock[0])
+    backend = SqliteBackend(str(tmp_path / "sessions.sqlite3"), idle_ttl=60, sweep_interval=0)
+    backend.set_many({"a": b"1", "b": b"2"})
+    clock[0] += 61
+    backend.set_many({"c": b"3"})
+    count = backend._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    assert count == 1
+    assert backend.stats()["items"] == 1
+
+
+def test_sqlite_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SqliteBackend(path).set_many({"a": b"1"})
+    assert SqliteBackend(path).get_many(["a"]) == [b"1"]
+
+
+def test_backend_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    assert backends.backend_from_env() is None
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_BACKEND_URL", str(tmp_path / "s.sqlite3"))
+    backend = backends.backend_from_env()
+    assert isinstance(backend, SqliteBackend) and backend.db_path == str(tmp_path / "s.sqlite3")
+
+
+def test_incomplete_backend_fails_when_instantiated():
+    class NoDelete(SessionBackend):
+        def get_many(self, keys):
+            return [None for _ in keys]
+
+        def set_many(self, items, touch=()):
+            pass
+
+    with pytest.raises(TypeError):
+        NoDelete()
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from llm.llm_handler import get_all_symptoms
+from llm.symptom_extractor import SymptomExtractor
+
+HELDOUT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "fixtures",
+                            "symptom_heldout.jsonl")
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return SymptomExtractor(get_all_symptoms())
+
+
+@pytest.mark.parametrize("text, symptom", [
+    ("Alcohol wipes were used on the cut.", "history_of_alcohol_consumption"),
+    ("I'm confused about which tablets to take.", "altered_sensorium"),
+    ("Some stiffness in my fingers when I type.", "movement_stiffness"),
+    ("The wound had some pus yesterday.", "pus_filled_pimples"),
+    ("A tearing pain in my back.", "watering_from_eyes"),
+    ("The blister is oozing clear fluid.", "yellow_crust_ooze"),
+    ("I have scars from an old surgery.", "scurring"),
+    ("My hands are shaking from too much coffee.", "shivering"),
+    ("It's chilly outside today.", "chills"),
+    ("I blow my nose and there is a lot of mucus.", "phlegm"),
+])
+def test_broad_words_alone_are_not_symptoms(extractor, text, symptom):
+    assert symptom not in extractor.extract(text).present
+
+
+@pytest.mark.parametrize("text, symptom", [
+    ("I drink alcohol every day.", "history_of_alcohol_consumption"),
+    ("He is confused and disoriented.", "altered_sensorium"),
+    ("Morning stiffness in my hips.", "movement_stiffness"),
+    ("Pimples filled with pus on my back.", "pus_filled_pimples"),
+    ("My eyes keep tearing.", "watering_from_eyes"),
+    ("Sores around the nose oozing yellow fluid.", "yellow_crust_ooze"),
+    ("Acne scars on both cheeks.", "scurring"),
+    ("I get the chills at night.", "chills"),
+    ("I cough up mucus every morning.", "phlegm"),
+])
+def test_qualified_phrases_are_symptoms(extractor, text, symptom):
+    assert symptom in extractor.extract(text).present
+
+
+def test_heldout_phrasing(extractor):
+    with open(HELDOUT_PATH) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    true_positives = predicted = expected = 0
+    for case in corpus:
+        found, truth = set(extractor.extract(case["text"]).present), set(case["present"])
+        true_positives += len(found & truth)
+        predicted += len(found)
+        expected += len(truth)
+    assert true_positives / predicted >= 0.95
+    assert true_positives / expected >= 0.8
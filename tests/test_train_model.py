@@ -0,0 +1,42 @@
+import functools
+import importlib
+import os
+import sys
+
+import pytest
+
+from model import dataset, train_model
+
+
+def test_import_leaves_sys_path_alone(monkeypatch):
+    monkeypatch.setattr(sys, "path", ["sentinel"] + sys.path)
+    before = list(sys.path)
+    monkeypatch.delitem(sys.modules, "model.train_model", raising=False)
+    importlib.import_module("model.train_model")
+    assert sys.path == before
+
+
+def test_updates_keep_the_base_params_for_a_full_retrain(tmp_path, monkeypatch):
+    if not (os.path.exists(train_model.TRAIN_PATH) and os.path.exists(train_model.TEST_PATH)):
+        pytest.skip("training and test workbooks not present")
+    monkeypatch.setattr(train_model, "load_dataset",
+                        functools.partial(dataset.load_dataset, bin_dir=str(tmp_path / "bin")))
+    train = dataset.read_table(train_model.TRAIN_PATH).sample(frac=1, random_state=0)
+    train_path, test_path = str(tmp_path / "train.csv"), str(tmp_path / "test.csv")
+    dataset.read_table(train_model.TEST_PATH).head(200).to_csv(test_path, index=False)
+    paths = dict(plots=False, reports_dir=str(tmp_path / "reports"), model_path=str(tmp_path / "rf.pkl"),
+                 schema_path=str(tmp_path / "rf.json"), flat_model_path=str(tmp_path / "rf.flat.npz"))
+
+    train.head(1000).to_csv(train_path, index=False)
+    _, metadata = train_model.train_and_save_model(train_path, test_path, n_estimators=10, n_jobs=1, **paths)
+    assert metadata["n_trees"] == 10
+    for n_rows, n_trees in ((1100, 15), (1200, 20)):
+        train.head(n_rows).to_csv(train_path, index=False)
+        model, metadata = train_model.update_and_save_model(train_path, test_path, n_trees=5, **paths)
+        assert len(model.estimators_) == metadata["n_trees"] == n_trees
+        assert metadata["params"]["n_estimators"] == 10
+
+    # Rows changed in place: the full retrain starts from the base params again
+    train.iloc[::-1].head(1200).to_csv(train_path, index=False)
+    model, metadata = train_model.update_and_save_model(train_path, test_path, n_trees=5, **paths)
+    assert len(model.estimators_) == metadata["n_trees"] == 10
@@ -0,0 +1,43 @@
+import pytest
+
+from llm import llm_handler
+from llm.llm_handler import fuse_rankings, verify_predicted_disease
+from model.disease_vocab import DiseaseVocabulary
+
+NOISY = "Based on the image showing what appears to be a cataract"
+LABELS = ["Acne", "Cataract", NOISY, "Chicken pox", "Fungal infection", "Psoriasis"]
+
+
+@pytest.fixture(autouse=True)
+def vocabulary(monkeypatch):
+    vocabulary = DiseaseVocabulary(LABELS)
+    monkeypatch.setattr(llm_handler, "get_disease_vocabulary", lambda: vocabulary)
+    llm_handler.verification_cache.clear()
+    return vocabulary
+
+
+def test_noisy_training_label_is_never_returned():
+    assert verify_predicted_disease([(NOISY, 0.6), ("Acne", 0.3)], []) == "Cataract"
+    assert verify_predicted_disease(NOISY, ["Cataract"]) == "Cataract"
+    fused = verify_predicted_disease([("Acne", 0.5), (NOISY, 0.3)], ["Glaucoma", "Rosacea"])
+    assert NOISY not in fused
+
+
+def test_merged_labels_add_up():
+    # 0.3 + 0.25 for Cataract outranks Acne's 0.45
+    assert verify_predicted_disease([("Acne", 0.45), (NOISY, 0.3), ("Cataract", 0.25)], []) == "Cataract"
+
+
+def test_unparseable_image_answer_keeps_the_prediction():
+    assert verify_predicted_disease([("Acne", 0.5), ("Psoriasis", 0.3)], ["Possible conditions:"]) == "Acne"
+
+
+def test_agreement_confirms_and_disagreement_fuses():
+    assert verify_predicted_disease([("Chicken pox", 0.7)], ["1. Varicella", "2. Measles"]) == "Chicken pox"
+    fused = verify_predicted_disease([("Acne", 0.7), ("Psoriasis", 0.2)], ["Rosacea", "Eczema"])
+    assert isinstance(fused, list) and len(fused) <= 3 and fused[0] == "Acne"
+
+
+def test_fuse_rankings_returns_a_label_both_rankings_agree_on():
+    matches = [("psoriasis vulgaris", "Psoriasis", 0.8), ("eczema", None, 0.1)]
+    assert fuse_rankings((("Acne", 0.5), ("Psoriasis", 0.4)), matches) == "Psoriasis"